@@ -0,0 +1,45 @@
+"""
+Start up time of the command line scripts with the lightweight database bootstrap (src/seqbox_db.py) vs with the
+whole Flask web app.
+
+Each run is a fresh python process that imports seqbox_utils and app.models, which is what every seqbox_cmd.py and
+seqbox_filehandling.py invocation pays before it reads its first row. The 'flask app' runs import `app.web` first, so
+seqbox_db re-uses the flask_sqlalchemy db, as it was before the bootstrap.
+
+DATABASE_URL=sqlite:////tmp/test_seqbox.db python benchmarks/bench_cli_startup.py -r 20
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+src_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+startups = {'seqbox_db': 'import seqbox_utils, app.models',
+            'flask app': 'import app.web; import seqbox_utils, app.models'}
+
+
+def time_startup(code):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([src_directory, os.path.join(src_directory, 'scripts')]))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_cli_startup')
+    parser.add_argument('-r', dest='repeats', type=int, default=10, help='Number of times to start each one.')
+    args = parser.parse_args()
+    # one untimed run of each, so that both are timed with the .pyc files already written
+    for code in startups.values():
+        time_startup(code)
+    print(f"{'startup':<15}{'mean ms':>10}{'min ms':>10}{'max ms':>10}")
+    for name, code in startups.items():
+        timings = [time_startup(code) for _ in range(args.repeats)]
+        print(f"{name:<15}{statistics.mean(timings) * 1000:>10.1f}{min(timings) * 1000:>10.1f}"
+              f"{max(timings) * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Times every seqbox_cmd.py stage, and the main seqbox_queries.py outputs, on synthetic data (generate_synthetic_data.py)
+at one or more scales, and writes the timings, rows per second and peak memory of each stage to a JSON report.
+
+Each scale starts from an empty database. Each stage is run the way it is in production, as its own
+`seqbox_cmd.py ingest` process on a manifest with just that stage in it (the artic results are one file per readset
+batch, so they need the manifest to run in one process), so the timings include start up, validation and the
+covid_sample_status/readset_summary refresh.
+
+DATABASE_URL=postgresql://localhost/test_seqbox python benchmarks/bench_ingest_scale.py -n 1000 -n 100000 -o report.json
+DATABASE_URL=postgresql://localhost/test_seqbox python benchmarks/bench_ingest_scale.py -n 1000 --baseline report.json
+
+With --baseline, any stage more than --tolerance slower than the same stage at the same scale in the baseline report
+is listed, and the script exits 1.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+import yaml
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from seqbox_db import db
+# so that create_all knows about all the tables
+import app.models
+from generate_synthetic_data import generate, get_project_names
+
+src_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+seqbox_cmd = os.path.join(src_directory, 'scripts', 'seqbox_cmd.py')
+seqbox_queries = os.path.join(src_directory, 'scripts', 'seqbox_queries.py')
+
+
+def reset_database():
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    db.session.commit()
+    # so that nothing in this process holds a connection (or, on sqlite, a lock) while the stages run
+    db.session.remove()
+    db.engine.dispose()
+
+
+def run_stage(command, log_handle):
+    # runs command, with its output going to log_handle, and returns its wall clock time, peak memory in MB and
+    # return code.
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([src_directory, os.path.join(src_directory, 'scripts')]))
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=log_handle, stderr=subprocess.STDOUT)
+    _, status, rusage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KB on linux, bytes on mac
+    max_rss_mb = rusage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return seconds, max_rss_mb, process.returncode
+
+
+def get_stage_commands(data_dir, cmd_options, copy, num_projects):
+    # (stage name, command) for every seqbox_cmd stage in the generated manifest, in ingest order, then the queries.
+    with open(os.path.join(data_dir, 'manifest.yaml')) as fi:
+        manifest = yaml.safe_load(fi)
+    commands = []
+    for stage_name, stage_inputs in manifest.items():
+        if copy and stage_name in ('artic_covid_results', 'pangolin_results'):
+            for stage_input in (stage_inputs if isinstance(stage_inputs, list) else [stage_inputs]):
+                stage_input['copy'] = True
+        stage_manifest = os.path.join(data_dir, f"{stage_name}.yaml")
+        with open(stage_manifest, 'w') as fo:
+            yaml.safe_dump({stage_name: stage_inputs}, fo)
+        commands.append((stage_name, [sys.executable, seqbox_cmd] + cmd_options + ['ingest', '-m', stage_manifest]))
+    projects = ','.join(get_project_names(num_projects))
+    commands += [('get_covid_todo_list', [sys.executable, seqbox_queries, 'get_covid_todo_list', '-o', os.devnull]),
+                 ('get_readset_summary', [sys.executable, seqbox_queries, 'get_readset_summary', '-o', os.devnull]),
+                 ('report aap_sequenced', [sys.executable, seqbox_queries, 'report', 'aap_sequenced',
+                                           '-P', f"projects={projects}", '-P', 'protocols=ARTIC v3',
+                                           '-o', os.devnull])]
+    return commands
+
+
+def run_scale(num_samples, num_projects, data_dir, cmd_options, copy):
+    # the progress goes to stderr, so that stdout is just the JSON report when there's no -o
+    print(f"Generating {num_samples} samples in {data_dir}", file=sys.stderr)
+    start = time.perf_counter()
+    row_counts = generate(data_dir, num_samples, num_projects)
+    generate_seconds = time.perf_counter() - start
+    reset_database()
+    stages = []
+    with open(os.path.join(data_dir, 'stages.log'), 'w') as log_handle:
+        for stage_name, command in get_stage_commands(data_dir, cmd_options, copy, num_projects):
+            seconds, max_rss_mb, returncode = run_stage(command, log_handle)
+            num_rows = row_counts.get(stage_name)
+            stage = {'stage': stage_name, 'rows': num_rows, 'seconds': round(seconds, 3),
+                     'rows_per_second': round(num_rows / seconds, 1) if num_rows else None,
+                     'max_rss_mb': round(max_rss_mb, 1), 'returncode': returncode}
+            stages.append(stage)
+            print(f"{num_samples:>10}  {stage_name:<25}{str(num_rows or ''):>10}{seconds:>10.2f}s"
+                  f"{max_rss_mb:>10.1f}MB", file=sys.stderr)
+            if returncode != 0:
+                print(f"{stage_name} exited with {returncode}, see {log_handle.name} (use --data-dir to keep it). Not "
+                      f"running the rest of the stages at this scale.", file=sys.stderr)
+                break
+    return {'num_samples': num_samples, 'generate_seconds': round(generate_seconds, 3), 'stages': stages}
+
+
+def find_regressions(report, baseline, tolerance):
+    # the stages which are more than tolerance (a fraction) slower than the same stage at the same scale in baseline
+    baseline_seconds = {(scale['num_samples'], stage['stage']): stage['seconds'] for scale in baseline['scales']
+                        for stage in scale['stages'] if stage['returncode'] == 0}
+    regressions = []
+    for scale in report['scales']:
+        for stage in scale['stages']:
+            before = baseline_seconds.get((scale['num_samples'], stage['stage']))
+            if stage['returncode'] != 0:
+                regressions.append(f"{scale['num_samples']} samples {stage['stage']} failed")
+            elif before is not None and stage['seconds'] > before * (1 + tolerance):
+                regressions.append(f"{scale['num_samples']} samples {stage['stage']} took {stage['seconds']}s, "
+                                   f"was {before}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_ingest_scale')
+    parser.add_argument('-n', dest='scales', type=int, action='append',
+                        help='Number of samples, can be given more than once e.g. -n 1000 -n 100000 -n 1000000. '
+                             'Default 1000.')
+    parser.add_argument('--projects', dest='num_projects', type=int, default=4,
+                        help='Number of projects in the synthetic data. Default 4.')
+    parser.add_argument('-o', dest='report_outhandle', default=None,
+                        help='Write the JSON report to this file. Default stdout.')
+    parser.add_argument('--data-dir', dest='data_dir', default=None,
+                        help='Write the synthetic data here (one sub-directory per scale) and keep it. By default it '
+                             'goes in a temporary directory which is deleted afterwards.')
+    parser.add_argument('--copy', dest='copy', action='store_true', default=False,
+                        help='Load the artic and pangolin results with the COPY fast path (postgres only).')
+    parser.add_argument('--cmd-option', dest='cmd_options', action='append', default=[],
+                        help='Extra seqbox_cmd.py option for every stage, e.g. --cmd-option=--commit=batch. Can be '
+                             'given more than once.')
+    parser.add_argument('--baseline', dest='baseline_inhandle', default=None,
+                        help='A previous JSON report to compare against.')
+    parser.add_argument('--tolerance', dest='tolerance', type=float, default=0.25,
+                        help='How much slower (as a fraction) than the baseline a stage can be before it is a '
+                             'regression. Default 0.25.')
+    args = parser.parse_args()
+    # putting this assertion here to stop me from wiping the non-test database
+    assert os.environ['DATABASE_URL'].split('/')[-1].startswith('test')
+    scales = args.scales or [1000]
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='seqbox_bench_')
+    report = {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'database': db.engine.dialect.name,
+              'python': platform.python_version(), 'platform': platform.platform(), 'copy': args.copy,
+              'num_projects': args.num_projects, 'cmd_options': args.cmd_options, 'scales': []}
+    try:
+        for num_samples in scales:
+            report['scales'].append(run_scale(num_samples, args.num_projects,
+                                              os.path.join(data_dir, str(num_samples)), args.cmd_options, args.copy))
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir)
+    if args.report_outhandle is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.report_outhandle, 'w') as fo:
+            json.dump(report, fo, indent=2)
+    if args.baseline_inhandle is not None:
+        with open(args.baseline_inhandle) as fi:
+            baseline = json.load(fi)
+        if baseline['database'] != report['database']:
+            print(f"The baseline is from a {baseline['database']} database, this run is {report['database']}, so "
+                  f"they can't be compared. Exiting.", file=sys.stderr)
+            sys.exit(1)
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
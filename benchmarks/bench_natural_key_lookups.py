@@ -0,0 +1,145 @@
+"""
+Lookup latency benchmark for the natural key indexes (migration 5a1f3e9b2c7d).
+
+Fills a test database with a synthetic group -> project -> sample_source -> sample -> extraction -> tiling_pcr ->
+raw_sequencing -> readset chain, one of each per readset, then times the seqbox_utils get_* lookups for a random
+selection of those readsets.
+
+DATABASE_URL=postgresql://localhost/test_seqbox python benchmarks/bench_natural_key_lookups.py -n 1000000
+DATABASE_URL=postgresql://localhost/test_seqbox python benchmarks/bench_natural_key_lookups.py --skip-populate --drop-indexes
+
+The second run re-uses the data from the first one and gives the numbers without the indexes.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+import statistics
+from sqlalchemy import text
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'scripts'))
+from seqbox_db import db
+from app.models import Groups, Project, SampleSource, Sample, Extraction, TilingPcr, RawSequencing, \
+    RawSequencingBatch, ReadSetBatch, ReadSet, ReadSetNanopore, sample_source_project
+from seqbox_utils import get_sample, get_extraction, get_tiling_pcr, get_readset, \
+    get_nanopore_readset_from_batch_and_barcode
+
+
+barcodes_per_batch = 96
+first_date = datetime.datetime(2020, 1, 1)
+
+
+def batch_name(i):
+    return f"bench_batch_{i // barcodes_per_batch}"
+
+
+def barcode(i):
+    return f"barcode{(i % barcodes_per_batch) + 1:02d}"
+
+
+def date_done(i):
+    return first_date + datetime.timedelta(days=i % 1000)
+
+
+def populate(num_readsets, chunk_size):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Groups.__table__.insert(), [{'id': 1, 'group_name': 'bench', 'institution': 'bench'}])
+    db.session.execute(Project.__table__.insert(), [{'id': 1, 'groups_id': 1, 'project_name': 'bench'}])
+    num_batches = (num_readsets // barcodes_per_batch) + 1
+    db.session.execute(RawSequencingBatch.__table__.insert(),
+                       [{'id': b + 1, 'name': f"bench_batch_{b}", 'sequencing_type': 'nanopore'}
+                        for b in range(num_batches)])
+    db.session.execute(ReadSetBatch.__table__.insert(),
+                       [{'id': b + 1, 'name': f"bench_batch_{b}", 'raw_sequencing_batch_id': b + 1}
+                        for b in range(num_batches)])
+    db.session.commit()
+    for start in range(0, num_readsets, chunk_size):
+        ids = range(start, min(start + chunk_size, num_readsets))
+        db.session.execute(SampleSource.__table__.insert(),
+                           [{'id': i + 1, 'sample_source_identifier': f"SS{i}"} for i in ids])
+        db.session.execute(sample_source_project.insert(), [{'sample_source_id': i + 1, 'project_id': 1} for i in ids])
+        db.session.execute(Sample.__table__.insert(),
+                           [{'id': i + 1, 'sample_identifier': f"S{i}", 'sample_source_id': i + 1} for i in ids])
+        db.session.execute(Extraction.__table__.insert(),
+                           [{'id': i + 1, 'sample_id': i + 1, 'extraction_identifier': 1, 'date_extracted': date_done(i)}
+                            for i in ids])
+        db.session.execute(TilingPcr.__table__.insert(),
+                           [{'id': i + 1, 'extraction_id': i + 1, 'pcr_identifier': 1, 'date_pcred': date_done(i)}
+                            for i in ids])
+        db.session.execute(RawSequencing.__table__.insert(),
+                           [{'id': i + 1, 'extraction_id': i + 1, 'tiling_pcr_id': i + 1,
+                             'raw_sequencing_batch_id': (i // barcodes_per_batch) + 1} for i in ids])
+        db.session.execute(ReadSet.__table__.insert(),
+                           [{'id': i + 1, 'raw_sequencing_id': i + 1, 'readset_batch_id': (i // barcodes_per_batch) + 1,
+                             'readset_identifier': i + 1} for i in ids])
+        db.session.execute(ReadSetNanopore.__table__.insert(),
+                           [{'id': i + 1, 'readset_id': i + 1, 'barcode': barcode(i)} for i in ids])
+        db.session.commit()
+        print(f"Added {ids[-1] + 1} of {num_readsets} readsets.")
+
+
+def set_indexes(drop):
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if drop is True:
+                index.drop(bind=db.engine, checkfirst=True)
+            else:
+                index.create(bind=db.engine, checkfirst=True)
+
+
+def time_lookups(num_readsets, num_lookups):
+    lookups = {'get_sample': [], 'get_extraction': [], 'get_tiling_pcr': [], 'get_readset': [],
+               'get_nanopore_readset_from_batch_and_barcode': []}
+    for i in random.sample(range(num_readsets), min(num_lookups, num_readsets)):
+        # converted, as a ReadsetRecord would be
+        info = {'sample_identifier': f"S{i}", 'group_name': 'bench', 'extraction_identifier': 1,
+                'date_extracted': date_done(i), 'tiling_pcr_identifier': 1, 'date_tiling_pcred': date_done(i),
+                'readset_batch_name': batch_name(i), 'barcode': barcode(i)}
+        for name, lookup in (('get_sample', lambda: get_sample(info)),
+                             ('get_extraction', lambda: get_extraction(info)),
+                             ('get_tiling_pcr', lambda: get_tiling_pcr(info)),
+                             ('get_readset', lambda: get_readset(info, True)),
+                             ('get_nanopore_readset_from_batch_and_barcode',
+                              lambda: get_nanopore_readset_from_batch_and_barcode(info))):
+            start = time.perf_counter()
+            result = lookup()
+            lookups[name].append(time.perf_counter() - start)
+            assert result is not False, f"{name} didn't find readset {i}"
+        # so that we're timing the database, not the session identity map
+        db.session.expunge_all()
+    print(f"{'lookup':<45}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, timings in lookups.items():
+        timings = sorted(timings)
+        print(f"{name:<45}{statistics.mean(timings) * 1000:>10.2f}{timings[len(timings) // 2] * 1000:>10.2f}"
+              f"{timings[int(len(timings) * 0.95)] * 1000:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_natural_key_lookups')
+    parser.add_argument('-n', dest='num_readsets', type=int, default=1000000, help='Number of readsets to make.')
+    parser.add_argument('-l', dest='num_lookups', type=int, default=500, help='Number of readsets to look up.')
+    parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=20000)
+    parser.add_argument('--skip-populate', dest='skip_populate', action='store_true', default=False,
+                        help='Re-use the data from a previous run.')
+    parser.add_argument('--drop-indexes', dest='drop_indexes', action='store_true', default=False,
+                        help='Time the lookups without the indexes.')
+    args = parser.parse_args()
+    # putting this assertion here to stop me from wiping the non-test database
+    assert os.environ['DATABASE_URL'].split('/')[-1].startswith('test')
+    if args.skip_populate is False:
+        populate(args.num_readsets, args.chunk_size)
+    else:
+        args.num_readsets = ReadSet.query.count()
+    set_indexes(args.drop_indexes)
+    # give the query planner up to date statistics (works for both postgres and sqlite)
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    print(f"{args.num_readsets} readsets, indexes {'dropped' if args.drop_indexes else 'present'}.")
+    time_lookups(args.num_readsets, args.num_lookups)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Writes an internally consistent set of seqbox_cmd input files for a given number of samples, plus a manifest.yaml
+for `seqbox_cmd.py ingest` (and bench_ingest_scale.py).
+
+Every sample has its own sample source, which is in one of the projects, and a pcr result. The positive ones are
+extracted, and a fraction of those have a confirmatory pcr, a tiling pcr and a nanopore default readset, 96 barcodes
+to a batch, each with an artic result and a pangolin result. The batch directories are made under the output
+directory with an empty fastq for every barcode, so that add_readsets -n finds them.
+
+python benchmarks/generate_synthetic_data.py -n 100000 -o /tmp/synthetic_100k
+"""
+import os
+import sys
+import csv
+import random
+import argparse
+import datetime
+
+barcodes_per_batch = 96
+first_date = datetime.date(2020, 3, 1)
+group_name = 'Bench'
+institution = 'MLW'
+lineages = [('B.1.351', 'Beta (B.1.351-like)'), ('B.1.617.2', 'Delta (B.1.617.2-like)'),
+            ('AY.4', 'Delta (AY.4-like)'), ('BA.1', 'Omicron (BA.1-like)'), ('None', '')]
+
+
+def date_string(date):
+    return date.strftime('%d/%m/%Y')
+
+
+class InputFiles:
+    # the open csv writers for one set of input files, and the number of rows written to each.
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.handles = {}
+        self.writers = {}
+        self.row_counts = {}
+
+    def write(self, name, row):
+        if name not in self.writers:
+            self.handles[name] = open(os.path.join(self.output_dir, f"{name}.csv"), 'w', newline='')
+            self.writers[name] = csv.DictWriter(self.handles[name], fieldnames=list(row))
+            self.writers[name].writeheader()
+            self.row_counts[name] = 0
+        self.writers[name].writerow(row)
+        self.row_counts[name] += 1
+
+    def close(self):
+        for handle in self.handles.values():
+            handle.close()
+
+
+def write_batch(input_files, batches_dir, batch_number, readsets, rng):
+    # readsets is a list of (sample identifier, date tiling pcred), one per barcode
+    batch_name = f"bench_batch_{batch_number:06d}"
+    batch_directory = os.path.join(batches_dir, batch_name)
+    date_run = readsets[-1][1] + datetime.timedelta(days=1)
+    input_files.write('raw_sequencing_batch', {'batch_directory': batch_directory, 'batch_name': batch_name,
+                                               'date_run': date_string(date_run), 'sequencing_type': 'nanopore',
+                                               'instrument_model': 'MinION Mk1c', 'instrument_name': 'bench_mk1c',
+                                               'library_prep_method': 'rapid', 'sequencing_centre': institution,
+                                               'flowcell_type': 'R9.4.1'})
+    input_files.write('readset_batches', {'raw_sequencing_batch_name': batch_name, 'readset_batch_name': batch_name,
+                                          'readset_batch_dir': batch_directory, 'basecaller': 'guppy v5 HAC'})
+    artic_files = InputFiles(os.path.join(input_files.output_dir, 'artic'))
+    for i, (sample_identifier, date_tiling_pcred) in enumerate(readsets):
+        barcode = f"barcode{i + 1:02d}"
+        fastq_dir = os.path.join(batch_directory, 'fastq_pass', barcode)
+        os.makedirs(fastq_dir)
+        open(os.path.join(fastq_dir, f"{batch_name}_{barcode}.fastq.gz"), 'w').close()
+        input_files.write('readsets', {'sample_identifier': sample_identifier,
+                                       'date_tiling_pcred': date_string(date_tiling_pcred),
+                                       'tiling_pcr_identifier': 1, 'date_extracted': '', 'extraction_identifier': '',
+                                       'group_name': group_name, 'barcode': barcode, 'data_storage_device': 'local',
+                                       'readset_batch_name': batch_name})
+        pct_covered_bases = round(rng.uniform(20, 99.5), 2)
+        artic_files.write(batch_name, {'sample_name': f"{batch_name}_{barcode}",
+                                       'pct_N_bases': round(100 - pct_covered_bases, 2),
+                                       'pct_covered_bases': pct_covered_bases,
+                                       'longest_no_N_run': rng.randint(500, 29000),
+                                       'num_aligned_reads': rng.randint(1000, 200000),
+                                       'fasta': f"{batch_name}_{barcode}.consensus.fasta",
+                                       'bam': f"{batch_name}_{barcode}.primertrimmed.rg.sorted.bam",
+                                       'qc_pass': 'TRUE' if pct_covered_bases > 90 else 'FALSE'})
+        lineage, scorpio_call = rng.choice(lineages)
+        input_files.write('pangolin_results', {'taxon': f"{batch_name}_{barcode}/ARTIC/medaka_MN908947.3",
+                                               'lineage': lineage, 'conflict': 0,
+                                               'ambiguity_score': round(rng.random(), 4),
+                                               'scorpio_call': scorpio_call, 'scorpio_support': 0.8571,
+                                               'scorpio_conflict': 0, 'version': 'PLEARN-v1.2.13',
+                                               'pangolin_version': '3.1.5', 'pangoLEARN_version': '2021-06-15',
+                                               'pango_version': 'v1.2.13', 'status': 'passed_qc', 'note': ''})
+    artic_files.close()
+    input_files.row_counts['artic_covid_results'] = input_files.row_counts.get('artic_covid_results', 0) + \
+        artic_files.row_counts[batch_name]
+    return batch_name
+
+
+def write_manifest(output_dir, batch_names):
+    with open(os.path.join(output_dir, 'manifest.yaml'), 'w') as fo:
+        fo.write('---\n')
+        for stage_name, file_name in [('groups', 'groups'), ('projects', 'projects'), ('pcr_assays', 'pcr_assay'),
+                                      ('sample_sources', 'sample_sources'), ('samples', 'samples'),
+                                      ('pcr_results', 'pcr_results'), ('extractions', 'extraction'),
+                                      ('tiling_pcrs', 'tiling_pcr'), ('covid_confirmatory_pcrs', 'confirmatory_pcr'),
+                                      ('raw_sequencing_batches', 'raw_sequencing_batch'),
+                                      ('readset_batches', 'readset_batches')]:
+            fo.write(f"{stage_name}: {file_name}.csv\n")
+        fo.write('readsets:\n  inhandle: readsets.csv\n  covid: true\n  nanopore_default: true\n')
+        fo.write('artic_covid_results:\n')
+        for batch_name in batch_names:
+            fo.write(f"  - inhandle: artic/{batch_name}.csv\n    readset_batch_name: {batch_name}\n"
+                     f"    workflow: medaka\n    profile: docker\n")
+        fo.write('pangolin_results:\n  inhandle: pangolin_results.csv\n  nanopore_default: true\n'
+                 '  artic_workflow: medaka\n  artic_profile: docker\n')
+
+
+def get_project_names(num_projects):
+    return [f"bench_project_{p + 1}" for p in range(num_projects)]
+
+
+def generate(output_dir, num_samples, num_projects=4, positive_fraction=0.6, sequenced_fraction=0.8, seed=1):
+    # writes the input files and manifest.yaml to output_dir, which shouldn't exist yet. returns the number of rows
+    # in the input file(s) of each stage, keyed by the stage name in the manifest.
+    os.makedirs(os.path.join(output_dir, 'artic'))
+    batches_dir = os.path.join(output_dir, 'batches')
+    os.makedirs(batches_dir)
+    rng = random.Random(seed)
+    input_files = InputFiles(output_dir)
+    input_files.write('groups', {'group_name': group_name, 'pi': 'Bench Mark', 'institution': institution})
+    input_files.write('pcr_assay', {'assay_name': 'SARS-CoV2-CDC-N1'})
+    project_names = get_project_names(num_projects)
+    for project_name in project_names:
+        input_files.write('projects', {'project_name': project_name, 'group_name': group_name,
+                                       'institution': institution, 'project_details': 'synthetic benchmark data'})
+    batch_names = []
+    to_sequence = []
+    for i in range(num_samples):
+        identifier = f"BENCH{i:07d}"
+        # roughly in the order they came in, a few hundred a day
+        date_collected = first_date + datetime.timedelta(days=i // 300)
+        date_received = date_collected + datetime.timedelta(days=rng.randint(0, 3))
+        input_files.write('sample_sources', {'sample_source_identifier': identifier,
+                                             'sample_source_type': 'patient', 'township': '', 'city': 'Blantyre',
+                                             'country': 'Malawi', 'latitude': round(rng.uniform(-16, -15.5), 6),
+                                             'longitude': round(rng.uniform(34.9, 35.1), 6),
+                                             'projects': rng.choice(project_names), 'group_name': group_name,
+                                             'institution': institution})
+        input_files.write('samples', {'sample_source_identifier': identifier, 'sample_identifier': identifier,
+                                      'species': 'SARS-CoV-2', 'sample_type': 'NP',
+                                      'day_collected': date_collected.day, 'month_collected': date_collected.month,
+                                      'year_collected': date_collected.year, 'day_received': date_received.day,
+                                      'month_received': date_received.month, 'year_received': date_received.year,
+                                      'group_name': group_name, 'institution': institution})
+        positive = rng.random() < positive_fraction
+        ct = round(rng.uniform(12, 35), 1)
+        input_files.write('pcr_results', {'sample_identifier': identifier, 'date_pcred': date_string(date_received),
+                                          'pcr_identifier': 1, 'group_name': group_name,
+                                          'assay_name': 'SARS-CoV2-CDC-N1',
+                                          'pcr_result': 'Positive' if positive else 'Negative',
+                                          'ct': ct if positive else '', 'institution': 'QECH'})
+        if not positive:
+            continue
+        date_extracted = date_received + datetime.timedelta(days=rng.randint(1, 7))
+        input_files.write('extraction', {'sample_identifier': identifier, 'extraction_identifier': 1,
+                                         'extraction_machine': 'QiaSymphony', 'extraction_kit': 'MiniKit',
+                                         'what_was_extracted': 'RNA', 'date_extracted': date_string(date_extracted),
+                                         'extraction_processing_institution': institution, 'group_name': group_name,
+                                         'extraction_from': 'whole sample'})
+        if rng.random() >= sequenced_fraction:
+            continue
+        input_files.write('confirmatory_pcr', {'sample_identifier': identifier,
+                                               'date_extracted': date_string(date_extracted),
+                                               'extraction_identifier': 1,
+                                               'date_covid_confirmatory_pcred': date_string(date_extracted),
+                                               'covid_confirmatory_pcr_identifier': 1, 'group_name': group_name,
+                                               'covid_confirmatory_pcr_protocol': 'cdc v1',
+                                               'covid_confirmatory_pcr_ct': round(ct + rng.uniform(-2, 2), 1)})
+        date_tiling_pcred = date_extracted + datetime.timedelta(days=1)
+        input_files.write('tiling_pcr', {'sample_identifier': identifier, 'date_extracted': date_string(date_extracted),
+                                         'extraction_identifier': 1, 'date_tiling_pcred': date_string(date_tiling_pcred),
+                                         'tiling_pcr_identifier': 1, 'group_name': group_name,
+                                         'tiling_pcr_protocol': 'ARTIC v3', 'number_of_cycles': 35})
+        to_sequence.append((identifier, date_tiling_pcred))
+        if len(to_sequence) == barcodes_per_batch:
+            batch_names.append(write_batch(input_files, batches_dir, len(batch_names), to_sequence, rng))
+            to_sequence = []
+    if to_sequence:
+        batch_names.append(write_batch(input_files, batches_dir, len(batch_names), to_sequence, rng))
+    input_files.close()
+    write_manifest(output_dir, batch_names)
+    row_counts = input_files.row_counts
+    return {'groups': row_counts['groups'], 'projects': row_counts['projects'], 'pcr_assays': row_counts['pcr_assay'],
+            'sample_sources': row_counts['sample_sources'], 'samples': row_counts['samples'],
+            'pcr_results': row_counts['pcr_results'], 'extractions': row_counts.get('extraction', 0),
+            'tiling_pcrs': row_counts.get('tiling_pcr', 0),
+            'covid_confirmatory_pcrs': row_counts.get('confirmatory_pcr', 0),
+            'raw_sequencing_batches': row_counts.get('raw_sequencing_batch', 0),
+            'readset_batches': row_counts.get('readset_batches', 0), 'readsets': row_counts.get('readsets', 0),
+            'artic_covid_results': row_counts.get('artic_covid_results', 0),
+            'pangolin_results': row_counts.get('pangolin_results', 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='generate_synthetic_data')
+    parser.add_argument('-n', dest='num_samples', type=int, default=1000, help='Number of samples, default 1000.')
+    parser.add_argument('-o', dest='output_dir', required=True, help='Directory to write to, must not exist yet.')
+    parser.add_argument('--projects', dest='num_projects', type=int, default=4, help='Number of projects.')
+    parser.add_argument('--positive-fraction', dest='positive_fraction', type=float, default=0.6,
+                        help='Fraction of samples with a positive pcr result, which are extracted.')
+    parser.add_argument('--sequenced-fraction', dest='sequenced_fraction', type=float, default=0.8,
+                        help='Fraction of the extracted samples which are sequenced.')
+    parser.add_argument('--seed', dest='seed', type=int, default=1, help='Random seed, the same seed gives the '
+                                                                       'same files.')
+    args = parser.parse_args()
+    if os.path.exists(args.output_dir):
+        print(f"{args.output_dir} already exists. Exiting.")
+        sys.exit(1)
+    row_counts = generate(args.output_dir, args.num_samples, args.num_projects, args.positive_fraction,
+                          args.sequenced_fraction, args.seed)
+    for stage_name, num_rows in row_counts.items():
+        print(f"{stage_name}\t{num_rows}")
+
+
+if __name__ == '__main__':
+    main()
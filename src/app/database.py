@@ -0,0 +1,24 @@
+"""
+The database object that models.py declares the tables on. Whatever imports app.models has to bind one first - the web
+app (app/web.py) binds its flask_sqlalchemy SQLAlchemy object, the command line scripts (src/seqbox_db.py) a plain
+SQLAlchemy engine and session.
+"""
+db = None
+
+
+def bind(database):
+    # makes database the one models.py uses. the models are only declared once, on whichever database is bound when
+    # app.models is first imported, so it can't be changed to a different one afterwards.
+    global db
+    if db is not None and db is not database:
+        raise RuntimeError(f"app.database is already bound to {db}, can't bind it to {database} as well. Import "
+                           f"either seqbox_db or app.web first, not both.")
+    db = database
+    return database
+
+
+def get_db():
+    if db is None:
+        raise RuntimeError("No database is bound for app.models. Import seqbox_db (command line scripts) or app.web "
+                           "(web app) before importing app.models.")
+    return db
@@ -2,19 +2,19 @@
 SQLAlchemy : Using ORM(Oject Relational Mapper)
 """
 from datetime import datetime
-from app import db, login
-from flask_login import UserMixin
+from app import database
 from sqlalchemy.orm import backref  # relationship
 from sqlalchemy.schema import Sequence, UniqueConstraint
 from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
 
+db = database.get_db()
 
-class User(UserMixin, db.Model):
+
+class User(db.Model):
     """This is a Class for User inherits from db.Model,a base class for all models from Flask-SQLAlchemy.
     
     Arguments:
-        UserMixin {class} --[ This provides default implementations for the methods that Flask-Login expects user objects to have.]
         db {object} -- [Object that represents the database.]
     
     """
@@ -54,25 +54,33 @@ class User(UserMixin, db.Model):
         """
         return check_password_hash(self.password_hash, password)
 
+    # the defaults that flask_login.UserMixin provides, written out here so that models.py can be imported without
+    # flask_login (see src/seqbox_db.py).
+    @property
+    def is_active(self):
+        return True
 
-@login.user_loader
-def load_user(id):
-    """[The @login.user_loader decorated function is used by Flask-Login to convert a stored user ID to an actual user instance.
-    The user loader callack function receives a user identifier as a Unicode string the return value of the function 
-    must be the user object if available or None otherwise. ]  
-    """
-    return User.query.get(int(id))
+    @property
+    def is_authenticated(self):
+        return self.is_active
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def get_id(self):
+        return str(self.id)
 
 
 class ReadSetBatch(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.VARCHAR(60), comment="Name of readset batch.")
+    name = db.Column(db.VARCHAR(60), index=True, unique=True, comment="Name of readset batch.")
     batch_directory = db.Column(db.VARCHAR(128), comment="Original directory where readset batch stored.")
     basecaller = db.Column(db.VARCHAR(60), comment="Basecaller used to generate sequence data.")
     raw_sequencing_batch_id = db.Column(db.Integer,
                                         db.ForeignKey("raw_sequencing_batch.id", onupdate="cascade",
                                                       ondelete="cascade"),
-                                        nullable=True)
+                                        nullable=True, index=True)
     readsets = db.relationship("ReadSet", backref=backref("readset_batch", passive_deletes=True))
     notes = db.Column(db.VARCHAR(256), comment="General comments.")
 
@@ -80,8 +88,9 @@ class ReadSetBatch(db.Model):
 class ReadSet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     raw_sequencing_id = db.Column(db.Integer,
-                                  db.ForeignKey("raw_sequencing.id", onupdate="cascade", ondelete="cascade"))
-    readset_batch_id = db.Column(db.Integer, db.ForeignKey("read_set_batch.id", ondelete="cascade", onupdate="cascade"))
+                                  db.ForeignKey("raw_sequencing.id", onupdate="cascade", ondelete="cascade"), index=True)
+    readset_batch_id = db.Column(db.Integer, db.ForeignKey("read_set_batch.id", ondelete="cascade", onupdate="cascade"),
+                                 index=True)
     readset_identifier = db.Column(db.Integer, db.Sequence("readset_identifier"), comment="ReadSet identifier id, "
                                                                                           "incrementing integer id to "
                                                                                           "uniquely identify this read "
@@ -97,6 +106,17 @@ class ReadSet(db.Model):
     data_storage_device = db.Column(db.VARCHAR(64), comment="which machine is this data stored on?")
     include = db.Column(db.VARCHAR(128), comment="Should this readset be included in further analyses?")
     artic_covid_result = db.relationship("ArticCovidResult", backref=backref("readset", passive_deletes=True))
+    # filled in by seqbox_filehandling.py compute_readset_stats, over all the fastqs of the readset (both reads for
+    # illumina).
+    num_reads = db.Column(db.BigInteger, comment="Number of reads in the fastq(s).")
+    total_bases = db.Column(db.BigInteger, comment="Number of bases in the fastq(s).")
+    n50 = db.Column(db.Integer, comment="Read length N50.")
+    mean_quality = db.Column(db.Float, comment="Mean phred base quality.")
+    stats_files_size = db.Column(db.BigInteger, comment="Total size of the fastq(s) when the stats were computed, to "
+                                                        "tell whether they need computing again.")
+    stats_files_mtime = db.Column(db.Float, comment="Latest modification time (unix time) of the fastq(s) when the "
+                                                    "stats were computed.")
+    date_stats_computed = db.Column(db.DateTime)
 
     # @hybrid_property
     # def readset_id(self):
@@ -114,7 +134,7 @@ class ReadSetIllumina(db.Model):
         [type] -- [description]
     """
     id = db.Column(db.Integer, primary_key=True)
-    readset_id = db.Column(db.Integer, db.ForeignKey("read_set.id", ondelete="cascade", onupdate="cascade"))
+    readset_id = db.Column(db.Integer, db.ForeignKey("read_set.id", ondelete="cascade", onupdate="cascade"), index=True)
 
     # illumina_batch = db.Column(db.VARCHAR(50), db.ForeignKey("illumina_batch.id", onupdate="cascade",
     #                                                          ondelete="set null"), nullable=True, comment="")
@@ -131,11 +151,11 @@ class ReadSetIllumina(db.Model):
 
 class ReadSetNanopore(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    readset_id = db.Column(db.Integer, db.ForeignKey("read_set.id", ondelete="cascade", onupdate="cascade"))
+    readset_id = db.Column(db.Integer, db.ForeignKey("read_set.id", ondelete="cascade", onupdate="cascade"), index=True)
     path_fastq = db.Column(db.VARCHAR(250))
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
     basecaller = db.Column(db.VARCHAR(60))
-    barcode = db.Column(db.VARCHAR(60))
+    barcode = db.Column(db.VARCHAR(60), index=True)
     notes = db.Column(db.VARCHAR(256), comment="General comments.")
 
     # nanopore_batch = db.Column(db.VARCHAR(50), db.ForeignKey("nanopore_batch.id", onupdate="cascade",
@@ -146,6 +166,21 @@ class ReadSetNanopore(db.Model):
         return f"ReadSetNanopore({self.id}, {self.path_fastq})"
 
 
+class FileChecksum(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    readset_id = db.Column(db.Integer, db.ForeignKey("read_set.id", ondelete="cascade", onupdate="cascade"), index=True)
+    path = db.Column(db.VARCHAR(512), index=True, unique=True)
+    size = db.Column(db.BigInteger, comment="Size of the file in bytes when it was hashed.")
+    mtime = db.Column(db.Float, comment="Modification time (unix time) of the file when it was hashed.")
+    sha256 = db.Column(db.VARCHAR(64))
+    date_hashed = db.Column(db.DateTime, default=datetime.utcnow)
+    date_verified = db.Column(db.DateTime, comment="Last time the file was hashed again and matched sha256.")
+    readset = db.relationship("ReadSet", backref=backref("file_checksums", passive_deletes=True))
+
+    def __repr__(self):
+        return f"FileChecksum({self.id}, {self.path})"
+
+
 class Mykrobe(db.Model):
     """[Define model 'Mykrobe' mapped to table 'mykrobe']
 
@@ -180,12 +215,12 @@ class Mykrobe(db.Model):
 
 class Sample(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    sample_identifier = db.Column(db.VARCHAR(30), comment="Lab identifier for the sample which DNA was extracted from. "
+    sample_identifier = db.Column(db.VARCHAR(30), index=True, comment="Lab identifier for the sample which DNA was extracted from. "
                                                           "Has to be unique within a group.")
     sample_type = db.Column(db.VARCHAR(60), comment="What was DNA extracted from? An isolate, clinical sample (for "
                                                     "covid), a plate sweep, whole stools, etc.")
     species = db.Column(db.VARCHAR(120), comment="Putative species of this sample, if known/appropriate.")
-    sample_source_id = db.Column(db.ForeignKey("sample_source.id", ondelete="cascade", onupdate="cascade"))
+    sample_source_id = db.Column(db.ForeignKey("sample_source.id", ondelete="cascade", onupdate="cascade"), index=True)
     day_collected = db.Column(db.Integer, comment="day of the month this was collected")
     month_collected = db.Column(db.Integer, comment="month this was collected")
     year_collected = db.Column(db.Integer, comment="year this was collected")
@@ -204,6 +239,11 @@ class Sample(db.Model):
 
 
 class Extraction(db.Model):
+    # an extraction is identified by the sample, the date it was extracted and the extraction_identifier
+    __table_args__ = (db.Index('ix_extraction_sample_id_date_extracted_extraction_identifier', 'sample_id',
+                               'date_extracted', 'extraction_identifier', unique=True),
+                      db.Index('ix_extraction_extraction_identifier_date_extracted', 'extraction_identifier',
+                               'date_extracted'))
     id = db.Column(db.Integer, primary_key=True)
     sample_id = db.Column(db.ForeignKey("sample.id", ondelete="cascade", onupdate="cascade"))
     extraction_identifier = db.Column(db.Integer, comment="An identifier to differentiate multiple extracts from the "
@@ -227,8 +267,9 @@ class Extraction(db.Model):
 
 
 class TilingPcr(db.Model):
+    __table_args__ = (db.Index('ix_tiling_pcr_pcr_identifier_date_pcred', 'pcr_identifier', 'date_pcred'),)
     id = db.Column(db.Integer, primary_key=True)
-    extraction_id = db.Column(db.ForeignKey("extraction.id", ondelete="cascade", onupdate="cascade"))
+    extraction_id = db.Column(db.ForeignKey("extraction.id", ondelete="cascade", onupdate="cascade"), index=True)
     number_of_cycles = db.Column(db.Integer, comment="Number of PCR cycles")
     date_pcred = db.Column(db.DateTime, comment="Date this PCR was done")
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
@@ -244,9 +285,10 @@ class TilingPcr(db.Model):
 
 class RawSequencing(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    extraction_id = db.Column(db.ForeignKey("extraction.id", ondelete="cascade", onupdate="cascade"))
-    raw_sequencing_batch_id = db.Column(db.ForeignKey("raw_sequencing_batch.id", ondelete="cascade", onupdate="cascade"))
-    tiling_pcr_id = db.Column(db.ForeignKey("tiling_pcr.id",  ondelete="cascade", onupdate="cascade"))
+    extraction_id = db.Column(db.ForeignKey("extraction.id", ondelete="cascade", onupdate="cascade"), index=True)
+    raw_sequencing_batch_id = db.Column(db.ForeignKey("raw_sequencing_batch.id", ondelete="cascade", onupdate="cascade"),
+                                        index=True)
+    tiling_pcr_id = db.Column(db.ForeignKey("tiling_pcr.id",  ondelete="cascade", onupdate="cascade"), index=True)
     data_storage_device = db.Column(db.VARCHAR(64), comment="which machine is this data stored on?")
     readsets = db.relationship("ReadSet", backref=backref("raw_sequencing", passive_deletes=True))
     raw_sequencing_nanopore = db.relationship("RawSequencingNanopore", backref=backref("raw_sequencing", passive_deletes=True), uselist=False)
@@ -259,7 +301,7 @@ class RawSequencing(db.Model):
 
 class RawSequencingNanopore(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    raw_sequencing_id = db.Column(db.ForeignKey("raw_sequencing.id", ondelete="cascade", onupdate="cascade"))
+    raw_sequencing_id = db.Column(db.ForeignKey("raw_sequencing.id", ondelete="cascade", onupdate="cascade"), index=True)
     path_fast5 = db.Column(db.VARCHAR(250))
     notes = db.Column(db.VARCHAR(256), comment="General comments.")
 
@@ -269,7 +311,7 @@ class RawSequencingNanopore(db.Model):
 
 class RawSequencingIllumina(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    raw_sequencing_id = db.Column(db.ForeignKey("raw_sequencing.id", ondelete="cascade", onupdate="cascade"))
+    raw_sequencing_id = db.Column(db.ForeignKey("raw_sequencing.id", ondelete="cascade", onupdate="cascade"), index=True)
     path_r1 = db.Column(db.VARCHAR(250))
     path_r2 = db.Column(db.VARCHAR(250))
     notes = db.Column(db.VARCHAR(256), comment="General comments.")
@@ -288,7 +330,7 @@ class RawSequencingBatch(db.Model):
         [type] -- [description]
     """
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.VARCHAR(50))
+    name = db.Column(db.VARCHAR(50), index=True, unique=True)
     date_run = db.Column(db.DATE)
     sequencing_type = db.Column(db.VARCHAR(64))
     instrument_model = db.Column(db.VARCHAR(64))
@@ -310,13 +352,15 @@ class RawSequencingBatch(db.Model):
 sample_source_project = db.Table("sample_source_project",
                                   db.Column("sample_source_id", db.Integer, db.ForeignKey("sample_source.id", ondelete='cascade', onupdate="cascade"),
                                             primary_key=True),
-                                  db.Column("project_id", db.Integer, db.ForeignKey("project.id", ondelete='cascade', onupdate="cascade"), primary_key=True)
+                                  db.Column("project_id", db.Integer, db.ForeignKey("project.id", ondelete='cascade', onupdate="cascade"), primary_key=True),
+                                  # the primary key covers looking up by sample_source_id, this is for project_id
+                                  db.Index("ix_sample_source_project_project_id", "project_id")
                                   )
 
 
 class SampleSource(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    sample_source_identifier = db.Column(db.VARCHAR(30), comment="the identifier for the sample source this sample "
+    sample_source_identifier = db.Column(db.VARCHAR(30), index=True, comment="the identifier for the sample source this sample "
                                                                   "came from, e.g. if it's a stool sample, then "
                                                                  "what is the identifier of the patient it came from")
     sample_source_type = db.Column(db.VARCHAR(60), comment="what type of sample source did it come from? i.e. what "
@@ -345,13 +389,13 @@ class Project(db.Model):
         [type] -- [description]
     """
     id = db.Column(db.Integer, primary_key=True)
-    groups_id = db.Column(db.ForeignKey("groups.id", ondelete="cascade", onupdate="cascade"))
+    groups_id = db.Column(db.ForeignKey("groups.id", ondelete="cascade", onupdate="cascade"), index=True)
     project_name = db.Column(db.VARCHAR(64), comment="You can think about this as 'what study got ethics for this "
                                                      "sample to be taken'")
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
     project_details = db.Column(db.VARCHAR(160))
-    # __table_args__ = (UniqueConstraint('project_name', 'group_name', name='_projectname_group_uc'),)
-    # todo - add in a constraint somehow so that project_name is unique within group
+    # project_name is unique within group
+    __table_args__ = (UniqueConstraint('project_name', 'groups_id', name='uq_project_project_name_groups_id'),)
     notes = db.Column(db.VARCHAR(256), comment="General comments.")
     sample_sources = db.relationship("SampleSource", secondary="sample_source_project", backref=backref("projects", passive_deletes=True))
 
@@ -360,6 +404,7 @@ class Project(db.Model):
 
 
 class Groups(db.Model):
+    __table_args__ = (UniqueConstraint('group_name', 'institution', name='uq_groups_group_name_institution'),)
     id = db.Column(db.Integer, primary_key=True)
     group_name = db.Column(db.VARCHAR(60), comment="The name of the group running this project (again, think about"
                                                    "this in context of ethics permission).")
@@ -372,7 +417,7 @@ class Groups(db.Model):
 class CovidConfirmatoryPcr(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # link to extraction
-    extraction_id = db.Column(db.ForeignKey("extraction.id", ondelete="cascade", onupdate="cascade"))
+    extraction_id = db.Column(db.ForeignKey("extraction.id", ondelete="cascade", onupdate="cascade"), index=True)
     ct = db.Column(db.Numeric, comment="Ct value of the confirmatory PCR")
     protocol = db.Column(db.VARCHAR(60), comment="What is the name/identifier of the assay? E.g. CDC v1")
     date_pcred = db.Column(db.DateTime, comment="Date this PCR was done")
@@ -384,7 +429,7 @@ class CovidConfirmatoryPcr(db.Model):
 
 class PcrResult(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    sample_id = db.Column(db.ForeignKey("sample.id", ondelete="cascade", onupdate="cascade"))
+    sample_id = db.Column(db.ForeignKey("sample.id", ondelete="cascade", onupdate="cascade"), index=True)
     pcr_result = db.Column(db.VARCHAR(60), comment="Was the test positive or negative")
     ct = db.Column(db.Numeric, comment="Was the test positive or negative")
     date_pcred = db.Column(db.DateTime, comment="Date this PCR was done")
@@ -393,12 +438,12 @@ class PcrResult(db.Model):
     institution = db.Column(db.VARCHAR(60), comment="Which institution did this PCR?")
     pcr_identifier = db.Column(db.Integer, comment="Differentiates this PCR from other PCRs done on this sample on the "
                                                    "same day.")
-    pcr_assay_id = db.Column(db.ForeignKey("pcr_assay.id", ondelete="cascade", onupdate="cascade"))
+    pcr_assay_id = db.Column(db.ForeignKey("pcr_assay.id", ondelete="cascade", onupdate="cascade"), index=True)
 
 
 class PcrAssay(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    assay_name = db.Column(db.VARCHAR(60), comment="What is the name/identifier of the assay? E.g. sars-cov-2 CDC v1")
+    assay_name = db.Column(db.VARCHAR(60), index=True, unique=True, comment="What is the name/identifier of the assay? E.g. sars-cov-2 CDC v1")
     pcr_results = db.relationship("PcrResult", backref=backref("pcr_assay", passive_deletes=True))
     notes = db.Column(db.VARCHAR(256), comment="General comments.")
 
@@ -411,7 +456,7 @@ class ArticCovidResult(db.Model):
     num_aligned_reads = db.Column(db.Numeric, comment="The number of aligned reads")
     workflow = db.Column(db.VARCHAR(60), comment="Workflow e.g. illumina, medaka, nanopolish")
     profile = db.Column(db.VARCHAR(60), comment="Profile e.g. docker, conda, etc")
-    readset_id = db.Column(db.ForeignKey("read_set.id", ondelete="cascade", onupdate="cascade"))
+    readset_id = db.Column(db.ForeignKey("read_set.id", ondelete="cascade", onupdate="cascade"), index=True)
     notes = db.Column(db.VARCHAR(256), comment="General comments.")
     pangolin_results = db.relationship("PangolinResult", backref=backref("artic_covid_result", passive_deletes=True))
 
@@ -432,7 +477,7 @@ class PangolinResult(db.Model):
                                                      "allele in the sequence. Ambiguous/other non-ref/alt bases at each"
                                                      " of the variant positions contribute only to the denominators of"
                                                      " these scores")
-    version = db.Column(db.VARCHAR(60), comment="See https://cov-lineages.org/pangolin_docs/output.html")
+    version = db.Column(db.VARCHAR(60), index=True, comment="See https://cov-lineages.org/pangolin_docs/output.html")
     pangolin_version = db.Column(db.VARCHAR(60), comment="Pangolin version")
     # todo - pangolearn version should be a date
     pangolearn_version = db.Column(db.DateTime, comment="Pangolearn version")
@@ -441,5 +486,96 @@ class PangolinResult(db.Model):
     note = db.Column(db.VARCHAR(300), comment="If any conflicts from the decision tree, this field will output the "
                                              "alternative assignments. ")
     notes = db.Column(db.VARCHAR(256), comment="General comments.")
-    artic_covid_result_id = db.Column(db.ForeignKey("artic_covid_result.id", ondelete="cascade", onupdate="cascade"))
+    artic_covid_result_id = db.Column(db.ForeignKey("artic_covid_result.id", ondelete="cascade", onupdate="cascade"),
+                                      index=True)
+
 
+class CurrentPangolinResult(db.Model):
+    """The pangolin result to report for each artic covid result - the most recently added one. Kept up to date by
+    seqbox_utils.add_pangolin_result and copy_pangolin_results, so that reports can join to it rather than picking the
+    latest pangolin result with a subquery for every row.
+    """
+    artic_covid_result_id = db.Column(db.ForeignKey("artic_covid_result.id", ondelete="cascade", onupdate="cascade"),
+                                      primary_key=True)
+    pangolin_result_id = db.Column(db.ForeignKey("pangolin_result.id", ondelete="cascade", onupdate="cascade"),
+                                   index=True)
+    artic_covid_result = db.relationship("ArticCovidResult", backref=backref("current_pangolin_result", uselist=False,
+                                                                             passive_deletes=True))
+    pangolin_result = db.relationship("PangolinResult")
+
+    def __repr__(self):
+        return f"CurrentPangolinResult({self.artic_covid_result_id}, {self.pangolin_result_id})"
+
+
+class CovidSampleStatus(db.Model):
+    """The covid todo list (seqbox_queries.py get_covid_todo_list) stored as a table - one row per positive SARS-CoV-2
+    sample and project, with the latest extraction, confirmatory PCR, tiling PCR and sequencing of the sample.
+    seqbox_cmd.py refreshes the rows of the samples each ingest touches, so the todo list can be read straight from
+    here.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    sample_id = db.Column(db.ForeignKey("sample.id", ondelete="cascade", onupdate="cascade"), index=True)
+    project_id = db.Column(db.ForeignKey("project.id", ondelete="cascade", onupdate="cascade"), index=True)
+    sample_identifier = db.Column(db.VARCHAR(30))
+    day_received = db.Column(db.Integer)
+    month_received = db.Column(db.Integer)
+    year_received = db.Column(db.Integer)
+    qech_pcr_result = db.Column(db.VARCHAR(60))
+    original_ct = db.Column(db.Numeric)
+    project_name = db.Column(db.VARCHAR(64), index=True)
+    extraction_identifier = db.Column(db.Integer)
+    date_extracted = db.Column(db.DateTime)
+    covid_confirmatory_pcr_identifier = db.Column(db.Integer)
+    date_covid_confirmatory_pcred = db.Column(db.DateTime)
+    covid_confirmatory_pcr_ct = db.Column(db.Numeric)
+    tiling_pcr_identifier = db.Column(db.Integer)
+    date_tiling_pcred = db.Column(db.DateTime)
+    raw_sequencing_batch_name = db.Column(db.VARCHAR(50))
+    readset_identifier = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f"CovidSampleStatus({self.sample_id}, {self.sample_identifier}, {self.project_name})"
+
+
+class ReadsetSummary(db.Model):
+    """One row per readset with everything reports usually want about it from the readset -> raw_sequencing ->
+    extraction -> sample -> sample_source -> project -> groups chain, the pcrs, and the latest artic result and its
+    current pangolin result, so that reports can read one table. Filled in by seqbox_queries.py, seqbox_cmd.py
+    refreshes the rows of the readsets each ingest touches.
+    """
+    readset_id = db.Column(db.ForeignKey("read_set.id", ondelete="cascade", onupdate="cascade"), primary_key=True)
+    readset_identifier = db.Column(db.Integer, index=True)
+    readset_batch_name = db.Column(db.VARCHAR(60), index=True)
+    data_storage_device = db.Column(db.VARCHAR(64))
+    barcode = db.Column(db.VARCHAR(60))
+    raw_sequencing_batch_name = db.Column(db.VARCHAR(50))
+    sequencing_type = db.Column(db.VARCHAR(64))
+    date_run = db.Column(db.DATE)
+    tiling_pcr_identifier = db.Column(db.Integer)
+    date_tiling_pcred = db.Column(db.DateTime)
+    tiling_pcr_protocol = db.Column(db.VARCHAR(60))
+    extraction_identifier = db.Column(db.Integer)
+    date_extracted = db.Column(db.DateTime)
+    sample_id = db.Column(db.Integer, index=True)
+    sample_identifier = db.Column(db.VARCHAR(30), index=True)
+    species = db.Column(db.VARCHAR(120))
+    day_received = db.Column(db.Integer)
+    month_received = db.Column(db.Integer)
+    year_received = db.Column(db.Integer)
+    sample_source_identifier = db.Column(db.VARCHAR(30))
+    project_names = db.Column(db.Text, comment="All the projects of the sample source, comma separated.")
+    group_name = db.Column(db.VARCHAR(60))
+    pcr_result = db.Column(db.VARCHAR(60), comment="Latest pcr result of the sample.")
+    pcr_ct = db.Column(db.Numeric)
+    covid_confirmatory_pcr_ct = db.Column(db.Numeric, comment="Latest confirmatory pcr of the extraction.")
+    date_covid_confirmatory_pcred = db.Column(db.DateTime)
+    pct_covered_bases = db.Column(db.Numeric, comment="From the latest artic result of the readset.")
+    pct_N_bases = db.Column(db.Numeric)
+    artic_workflow = db.Column(db.VARCHAR(60))
+    artic_profile = db.Column(db.VARCHAR(60))
+    lineage = db.Column(db.VARCHAR(60), comment="From the current pangolin result of the latest artic result.")
+    scorpio_call = db.Column(db.VARCHAR(60))
+    pangolin_version = db.Column(db.VARCHAR(60))
+
+    def __repr__(self):
+        return f"ReadsetSummary({self.readset_id}, {self.readset_identifier}, {self.sample_identifier})"
@@ -0,0 +1,32 @@
+from flask import Flask
+from config import Config
+from flask_sqlalchemy import SQLAlchemy
+from flask_login import LoginManager
+from flask_bootstrap import Bootstrap
+from flask_migrate import Migrate
+from app import database
+
+
+app = Flask(__name__) # Create a Flask app instance
+app.config.from_object(Config)
+ # Load ALL uppercase variables
+ # from Python module 'config.py' into 'app.config'
+Bootstrap(app)
+db = SQLAlchemy(app) # Initialize the Flask-SQLAlchemy extension instance
+# the models are declared on this db
+database.bind(db)
+# see here https://blog.miguelgrinberg.com/post/how-to-add-flask-migrate-to-an-existing-project
+migrate = Migrate(app, db, compare_type=True)
+login = LoginManager(app)
+login.login_view = 'login'
+
+from app import routes, models
+
+
+@login.user_loader
+def load_user(id):
+    """[The @login.user_loader decorated function is used by Flask-Login to convert a stored user ID to an actual user instance.
+    The user loader callack function receives a user identifier as a Unicode string the return value of the function 
+    must be the user object if available or None otherwise. ]  
+    """
+    return models.User.query.get(int(id))
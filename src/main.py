@@ -1,4 +1,4 @@
-from app import app, db
+from app.web import app, db
 from app.models import User, Sample, Post, Batch, Location, Result1, Mykrobe, Project, Sample_project
 
 
@@ -1,22 +1,36 @@
+import os
 import sys
+import yaml
 import argparse
-from seqbox_utils import read_in_as_dict, add_sample, add_project,\
+from seqbox_utils import read_in_as_records, add_sample, add_project,\
     get_sample_source, add_sample_source, query_projects, \
     get_extraction, add_extraction, add_readset, add_raw_sequencing_batch, get_raw_sequencing_batch, \
     get_tiling_pcr, add_tiling_pcr, get_readset, get_sample, \
     check_sample_source_associated_with_project, get_group, add_group, get_covid_confirmatory_pcr, \
     add_covid_confirmatory_pcr, get_readset_batch, add_readset_batch, get_pcr_result, add_pcr_result, get_pcr_assay, \
     add_pcr_assay, get_artic_covid_result, add_artic_covid_result, get_pangolin_result, add_pangolin_result, \
-    check_tiling_pcr, basic_check_readset_fields, check_pcr_result
+    check_tiling_pcr, basic_check_readset_fields, check_pcr_result, add_samples_bulk, \
+    set_commit_policy, file_transaction, warm_lookup_cache, iter_csv_as_records, copy_artic_covid_results, \
+    copy_pangolin_results, allowable_pcr_results, compile_schema, validate_file, readset_lookup_cache, \
+    display_value, GroupRecord, ProjectRecord, PcrAssayRecord, SampleSourceRecord, SampleRecord, PcrResultRecord, \
+    ExtractionRecord, TilingPcrRecord, CovidConfirmatoryPcrRecord, RawSequencingBatchRecord, ReadsetBatchRecord, \
+    ReadsetRecord, ArticCovidResultRecord, PangolinResultRecord
+from seqbox_db import db
+from seqbox_queries import get_max_ids, refresh_covid_sample_status, get_samples_changed_since, \
+    refresh_readset_summary, get_readsets_changed_since
+from seqbox_profile import enable_profiling, profile_stage, print_profile
 
 
 allowed_sequencing_types = {'nanopore', 'illumina'}
 permitted_artic_workflows = {'medaka'}
 permitted_artic_profiles = {'docker', 'manual'}
+# the ids of the existing sample sources which this run has added to another project. that doesn't add a row to any of
+# the tables get_max_ids() watches, so refresh_after_ingest needs to be told about them.
+relinked_sample_source_ids = set()
 
 
 def add_groups(args):
-    all_groups_info = read_in_as_dict(args.groups_inhandle)
+    all_groups_info = read_in_as_records(args.groups_inhandle, GroupRecord)
     for group_info in all_groups_info:
         if get_group(group_info) is False:
             add_group(group_info)
@@ -26,7 +40,7 @@ def add_groups(args):
 
 
 def add_tiling_pcrs(args):
-    all_tiling_pcrs_info = read_in_as_dict(args.tiling_pcrs_inhandle)
+    all_tiling_pcrs_info = read_in_as_records(args.tiling_pcrs_inhandle, TilingPcrRecord)
     for tiling_pcr_info in all_tiling_pcrs_info:
         # check the tiling pcr information is there, if it isn't (because e.g. covid confirmation pcr failed), then
         # just continue.
@@ -37,7 +51,7 @@ def add_tiling_pcrs(args):
 
 
 def add_raw_sequencing_batches(args):
-    all_raw_sequencing_batches_info = read_in_as_dict(args.raw_sequencing_batches_inhandle)
+    all_raw_sequencing_batches_info = read_in_as_records(args.raw_sequencing_batches_inhandle, RawSequencingBatchRecord)
     for raw_sequencing_batch_info in all_raw_sequencing_batches_info:
         if raw_sequencing_batch_info['sequencing_type'] not in allowed_sequencing_types:
             print(f"sequencing_type {raw_sequencing_batch_info['sequencing_type']} is not in {allowed_sequencing_types}"
@@ -48,7 +62,7 @@ def add_raw_sequencing_batches(args):
 
 
 def add_readset_batches(args):
-    all_readset_batches_info = read_in_as_dict(args.readset_batches_inhandle)
+    all_readset_batches_info = read_in_as_records(args.readset_batches_inhandle, ReadsetBatchRecord)
     for readset_batch_info in all_readset_batches_info:
         if get_readset_batch(readset_batch_info) is False:
             add_readset_batch(readset_batch_info)
@@ -58,38 +72,43 @@ def add_readset_batches(args):
 
 
 def add_readsets(args):
-    all_readsets_info = read_in_as_dict(args.readsets_inhandle)
-    for readset_info in all_readsets_info:
-        if basic_check_readset_fields(readset_info) is False:
-            continue
-        if get_readset(readset_info, args.covid) is False:
-            add_readset(readset_info=readset_info, covid=args.covid,
-                        nanopore_default=args.nanopore_default)
-        else:
-            if 'path_fastq' in readset_info:
-                print(f"This readset ({readset_info['path_fastq']}) already exists in the database for the group "
-                      f"{readset_info['group_name']}. Not adding it to the database.")
-            elif 'path_r1' in readset_info:
-                print(f"This readset ({readset_info['path_r1']}) already exists in the database for the group "
-                      f"{readset_info['group_name']}. Not adding it to the database.")
-            elif args.nanopore_default is True:
-                print(f"The readset for sample {readset_info['sample_identifier']} for batch {readset_info['readset_batch_name']} "
-                      f"is already in the database for group {readset_info['group_name']}. Not adding it to the database.")
+    all_readsets_info = [x for x in read_in_as_records(args.readsets_inhandle, ReadsetRecord)
+                         if basic_check_readset_fields(x) is not False]
+    # one query for whether each readset (and its raw sequencing) is already there, rather than two per row
+    with readset_lookup_cache(all_readsets_info, args.covid):
+        for readset_info in all_readsets_info:
+            if get_readset(readset_info, args.covid) is False:
+                add_readset(readset_info=readset_info, covid=args.covid,
+                            nanopore_default=args.nanopore_default)
+            else:
+                if 'path_fastq' in readset_info:
+                    print(f"This readset ({readset_info['path_fastq']}) already exists in the database for the group "
+                          f"{readset_info['group_name']}. Not adding it to the database.")
+                elif 'path_r1' in readset_info:
+                    print(f"This readset ({readset_info['path_r1']}) already exists in the database for the group "
+                          f"{readset_info['group_name']}. Not adding it to the database.")
+                elif args.nanopore_default is True:
+                    print(f"The readset for sample {readset_info['sample_identifier']} for batch {readset_info['readset_batch_name']} "
+                          f"is already in the database for group {readset_info['group_name']}. Not adding it to the database.")
 
 
 def add_extractions(args):
-    all_extractions_info = read_in_as_dict(args.extractions_inhandle)
+    all_extractions_info = read_in_as_records(args.extractions_inhandle, ExtractionRecord)
     for extraction_info in all_extractions_info:
         if get_extraction(extraction_info) is False:
             add_extraction(extraction_info)
         else:
             print(f"This extraction ({extraction_info['sample_identifier']}, {extraction_info['extraction_identifier']})"
-                  f" on {extraction_info['date_extracted']} already exists in the database for the group "
+                  f" on {display_value(extraction_info['date_extracted'])} already exists in the database for the "
+                  f"group "
                   f"{extraction_info['group_name']}")
 
 
 def add_samples(args):
-    all_samples_info = read_in_as_dict(args.samples_inhandle)
+    all_samples_info = read_in_as_records(args.samples_inhandle, SampleRecord)
+    if args.bulk is True:
+        add_samples_bulk(all_samples_info)
+        return
     for sample_info in all_samples_info:
         if get_sample(sample_info) is False:
             add_sample(sample_info)
@@ -100,7 +119,7 @@ def add_samples(args):
 
 
 def add_sample_sources(args):
-    all_sample_source_info = read_in_as_dict(args.sample_sources_inhandle)
+    all_sample_source_info = read_in_as_records(args.sample_sources_inhandle, SampleSourceRecord)
     for sample_source_info in all_sample_source_info:
         sample_source = get_sample_source(sample_source_info)
         if sample_source is False:
@@ -110,11 +129,13 @@ def add_sample_sources(args):
                 f"This sample source ({sample_source_info['sample_source_identifier']}) already exists in the database "
                 f"for the group {sample_source_info['group_name']}")
 
-            check_sample_source_associated_with_project(sample_source, sample_source_info)
+            relinked_sample_source_id = check_sample_source_associated_with_project(sample_source, sample_source_info)
+            if relinked_sample_source_id is not None:
+                relinked_sample_source_ids.add(relinked_sample_source_id)
 
 
 def add_projects(args):
-    all_projects_info = read_in_as_dict(args.projects_inhandle)
+    all_projects_info = read_in_as_records(args.projects_inhandle, ProjectRecord)
     for project_info in all_projects_info:
         # query_projects takes project_info['project_name'] as well as project_info because 'project_name' isn't
         # always in the dictionary which this function takes
@@ -127,14 +148,15 @@ def add_projects(args):
 
 
 def add_covid_confirmatory_pcrs(args):
-    all_covid_confirmatory_pcrs_info = read_in_as_dict(args.covid_confirmatory_pcrs_inhandle)
+    all_covid_confirmatory_pcrs_info = read_in_as_records(args.covid_confirmatory_pcrs_inhandle,
+                                                          CovidConfirmatoryPcrRecord)
     for covid_confirmatory_pcr_info in all_covid_confirmatory_pcrs_info:
         if get_covid_confirmatory_pcr(covid_confirmatory_pcr_info) is False:
             add_covid_confirmatory_pcr(covid_confirmatory_pcr_info)
 
 
 def add_pcr_results(args):
-    all_pcr_results_info = read_in_as_dict(args.pcr_results_inhandle)
+    all_pcr_results_info = read_in_as_records(args.pcr_results_inhandle, PcrResultRecord)
     for pcr_result_info in all_pcr_results_info:
         # this is a check to account for the combined format, is the pcr result present?
         if check_pcr_result(pcr_result_info) is False:
@@ -143,11 +165,11 @@ def add_pcr_results(args):
             add_pcr_result(pcr_result_info)
         else:
             print(f"PCR result for {pcr_result_info['sample_identifier']} already exists on "
-                  f"{pcr_result_info['date_pcred']}. Not adding.")
+                  f"{display_value(pcr_result_info['date_pcred'])}. Not adding.")
 
 
 def add_pcr_assays(args):
-    all_pcr_assays_info = read_in_as_dict(args.pcr_assays_inhandle)
+    all_pcr_assays_info = read_in_as_records(args.pcr_assays_inhandle, PcrAssayRecord)
     for pcr_assay in all_pcr_assays_info:
         if get_pcr_assay(pcr_assay) is False:
             add_pcr_assay(pcr_assay)
@@ -156,12 +178,14 @@ def add_pcr_assays(args):
 def add_artic_covid_results(args):
     assert args.workflow in permitted_artic_workflows
     assert args.profile in permitted_artic_profiles
-    all_artic_covid_results_info = read_in_as_dict(args.artic_covid_results_inhandle)
+    file_info = {'readset_batch_name': args.readset_batch_name, 'artic_workflow': args.workflow,
+                 'artic_profile': args.profile}
+    all_artic_covid_results_info = iter_csv_as_records(args.artic_covid_results_inhandle, ArticCovidResultRecord,
+                                                       file_info)
+    if args.copy is True:
+        copy_artic_covid_results(list(all_artic_covid_results_info))
+        return
     for artic_covid_result in all_artic_covid_results_info:
-        artic_covid_result['readset_batch_name'] = args.readset_batch_name
-        artic_covid_result['barcode'] = artic_covid_result['sample_name'].split('_')[-1]
-        artic_covid_result['artic_workflow'] = args.workflow
-        artic_covid_result['artic_profile'] = args.profile
         if get_artic_covid_result(artic_covid_result) is False:
             add_artic_covid_result(artic_covid_result)
         else:
@@ -170,19 +194,21 @@ def add_artic_covid_results(args):
 
 
 def add_pangolin_results(args):
-    all_pangolin_results_info = read_in_as_dict(args.pangolin_results_inhandle)
+    assert args.artic_workflow in permitted_artic_workflows
+    assert args.artic_profile in permitted_artic_profiles
+    file_info = {'artic_workflow': args.artic_workflow, 'artic_profile': args.artic_profile}
+    # otherwise the readset batch name comes from the taxon
+    if args.nanopore_default is False:
+        file_info['readset_batch_name'] = args.readset_batch_name
+    all_pangolin_results_info = iter_csv_as_records(args.pangolin_results_inhandle, PangolinResultRecord, file_info)
+    if args.copy is True:
+        all_pangolin_results_info = list(all_pangolin_results_info)
+        for pangolin_result_info in all_pangolin_results_info:
+            assert pangolin_result_info['barcode'].startswith('barcode')
+        copy_pangolin_results(all_pangolin_results_info)
+        return
     for pangolin_result_info in all_pangolin_results_info:
-        if args.nanopore_default is False:
-            pangolin_result_info['readset_batch_name'] = args.readset_batch_name
-        else:
-            pangolin_result_info['readset_batch_name'] = pangolin_result_info['taxon'].split('/')[0].split('_barcode')[0]
-        # print(pangolin_result_info['readset_batch_name'])
-        pangolin_result_info['barcode'] = pangolin_result_info['taxon'].split('/')[0].split('_')[-1]
         assert pangolin_result_info['barcode'].startswith('barcode')
-        assert args.artic_workflow in permitted_artic_workflows
-        pangolin_result_info['artic_workflow'] = args.artic_workflow
-        assert args.artic_profile in permitted_artic_profiles
-        pangolin_result_info['artic_profile'] = args.artic_profile
         if get_pangolin_result(pangolin_result_info) is False:
             add_pangolin_result(pangolin_result_info)
         else:
@@ -191,46 +217,320 @@ def add_pangolin_results(args):
                   f"{pangolin_result_info['pangoLEARN_version']} in the database. No action taken.")
 
 
+# the stages of the ingest command, in the order they need to be loaded. each stage is the name used in the manifest
+# (the function's -i argument is always {name}_inhandle), the function which loads it, the options it requires and
+# the options it can take, with their defaults.
+ingest_stages = [('groups', add_groups, [], {}),
+                 ('projects', add_projects, [], {}),
+                 ('pcr_assays', add_pcr_assays, [], {}),
+                 ('sample_sources', add_sample_sources, [], {}),
+                 ('samples', add_samples, [], {'bulk': False}),
+                 ('pcr_results', add_pcr_results, [], {}),
+                 ('extractions', add_extractions, [], {}),
+                 ('tiling_pcrs', add_tiling_pcrs, [], {}),
+                 ('covid_confirmatory_pcrs', add_covid_confirmatory_pcrs, [], {}),
+                 ('raw_sequencing_batches', add_raw_sequencing_batches, [], {}),
+                 ('readset_batches', add_readset_batches, [], {}),
+                 ('readsets', add_readsets, [], {'covid': False, 'nanopore_default': False}),
+                 ('artic_covid_results', add_artic_covid_results, ['readset_batch_name', 'workflow', 'profile'],
+                  {'copy': False}),
+                 ('pangolin_results', add_pangolin_results, ['artic_workflow', 'artic_profile'],
+                  {'readset_batch_name': None, 'nanopore_default': False, 'copy': False})]
+
+
+def validate_pangolin_status(pangolin_result_info):
+    # the name of the output column changed from status to qc_status 2022-07-04
+    status = pangolin_result_info.get('status', pangolin_result_info.get('qc_status'))
+    if status is None:
+        return 'status (or qc_status) column is missing'
+    if status.strip() == '':
+        return 'status column should not be empty'
+
+
+def validate_pangolin_taxon(pangolin_result_info):
+    barcode = pangolin_result_info['taxon'].split('/')[0].split('_')[-1]
+    if pangolin_result_info['taxon'].strip() != '' and not barcode.startswith('barcode'):
+        return f"taxon should start with {{readset batch}}_{{barcode}}, {pangolin_result_info['taxon']} doesn't"
+
+
+def get_validation_schema(stage_name, args):
+    # what validate_file checks for each stage, without going to the database. these are the checks the check_*
+    # functions in seqbox_utils make as the rows are loaded, plus that the dates and numbers will parse.
+    # required - must not be empty. optional - can be empty, but the column needs to be there. names - no spaces or
+    # slashes. skip_if_empty - the add_* function skips the row if one of these is empty, so validation does too.
+    # row_checks - functions which take the whole row.
+    schemas = {'groups': {'required': ['group_name', 'institution'], 'names': ['group_name'], 'optional': ['pi']},
+               'projects': {'required': ['project_name', 'group_name', 'institution'],
+                            'optional': ['project_details']},
+               'pcr_assays': {'required': ['assay_name']},
+               'sample_sources': {'required': ['sample_source_identifier', 'sample_source_type', 'projects',
+                                               'group_name', 'institution'],
+                                  'optional': ['township', 'city', 'country'],
+                                  'numbers': ['latitude', 'longitude']},
+               'samples': {'required': ['sample_source_identifier', 'sample_identifier', 'group_name', 'institution'],
+                           'optional': ['species', 'sample_type'],
+                           'integers': ['day_collected', 'month_collected', 'year_collected', 'day_received',
+                                        'month_received', 'year_received']},
+               'pcr_results': {'skip_if_empty': ['sample_identifier', 'date_pcred', 'pcr_identifier', 'group_name',
+                                                 'assay_name'],
+                               'dates': ['date_pcred'], 'numbers': ['ct'], 'integers': ['pcr_identifier'],
+                               'one_of': {'pcr_result': allowable_pcr_results}},
+               'extractions': {'required': ['sample_identifier', 'date_extracted', 'extraction_identifier',
+                                            'group_name'],
+                               'optional': ['extraction_machine', 'extraction_kit', 'what_was_extracted',
+                                            'extraction_processing_institution', 'extraction_from'],
+                               'dates': ['date_extracted'], 'integers': ['extraction_identifier']},
+               'tiling_pcrs': {'skip_if_empty': ['sample_identifier', 'date_extracted', 'extraction_identifier',
+                                                 'date_tiling_pcred', 'tiling_pcr_identifier', 'group_name',
+                                                 'tiling_pcr_protocol'],
+                               'dates': ['date_extracted', 'date_tiling_pcred'],
+                               'integers': ['extraction_identifier', 'tiling_pcr_identifier', 'number_of_cycles']},
+               'covid_confirmatory_pcrs': {'required': ['sample_identifier', 'date_extracted', 'extraction_identifier',
+                                                        'date_covid_confirmatory_pcred',
+                                                        'covid_confirmatory_pcr_identifier', 'group_name',
+                                                        'covid_confirmatory_pcr_protocol'],
+                                           'dates': ['date_extracted', 'date_covid_confirmatory_pcred'],
+                                           'numbers': ['covid_confirmatory_pcr_ct'],
+                                           'integers': ['extraction_identifier', 'covid_confirmatory_pcr_identifier']},
+               'raw_sequencing_batches': {'required': ['batch_directory', 'batch_name', 'date_run', 'sequencing_type',
+                                                       'instrument_name', 'library_prep_method', 'flowcell_type'],
+                                          'optional': ['instrument_model', 'sequencing_centre'],
+                                          'dates': ['date_run'],
+                                          'one_of': {'sequencing_type': allowed_sequencing_types}},
+               'readset_batches': {'required': ['raw_sequencing_batch_name', 'readset_batch_name', 'readset_batch_dir',
+                                                'basecaller']},
+               'artic_covid_results': {'required': ['sample_name', 'pct_N_bases', 'pct_covered_bases',
+                                                    'num_aligned_reads'],
+                                       'numbers': ['pct_N_bases', 'pct_covered_bases', 'num_aligned_reads']},
+               'pangolin_results': {'required': ['taxon', 'lineage'],
+                                    'optional': ['scorpio_call', 'version', 'pangolin_version', 'note'],
+                                    'numbers': ['conflict', 'ambiguity_score', 'scorpio_support', 'scorpio_conflict'],
+                                    'row_checks': [validate_pangolin_status, validate_pangolin_taxon]}}
+    if stage_name == 'readsets':
+        # whether it needs path_fastq/path_fast5 or path_r1/path_r2 depends on the sequencing type of the raw
+        # sequencing batch, which is in the database, so that is left to check_readset_fields.
+        schema = {'skip_if_empty': ['data_storage_device', 'readset_batch_name'],
+                  'required': ['sample_identifier', 'group_name']}
+        if args.nanopore_default is True:
+            schema['required'].append('barcode')
+        if args.covid is True:
+            schema['required'] += ['date_tiling_pcred', 'tiling_pcr_identifier']
+            schema['dates'] = ['date_tiling_pcred']
+            schema['integers'] = ['tiling_pcr_identifier']
+        else:
+            schema['required'] += ['date_extracted', 'extraction_identifier']
+            schema['dates'] = ['date_extracted']
+            schema['integers'] = ['extraction_identifier']
+        return schema
+    return schemas[stage_name]
+
+
+def validate_input_files(to_validate):
+    # to_validate is a list of (stage name, args). checks all the files and reports every problem in all of them,
+    # returns the number of problems found.
+    num_errors = 0
+    for stage_name, stage_args in to_validate:
+        inhandle = vars(stage_args)[f'{stage_name}_inhandle']
+        errors = validate_file(inhandle, compile_schema(get_validation_schema(stage_name, stage_args)))
+        for error in errors:
+            print(f"{inhandle} ({stage_name}) {error}")
+        num_errors += len(errors)
+    return num_errors
+
+
+def validate(args):
+    if args.manifest_inhandle is not None:
+        to_validate = [(stage_name, stage_args) for stage_name, _, stage_args in read_in_manifest(args.manifest_inhandle)]
+    elif args.stage is not None and args.inhandle is not None:
+        to_validate = [(args.stage, argparse.Namespace(**{f'{args.stage}_inhandle': args.inhandle}, covid=args.covid,
+                                                       nanopore_default=args.nanopore_default))]
+    else:
+        print("validate needs either a manifest (-m), or a stage (-t) and an input file (-i). Exiting.")
+        sys.exit(1)
+    num_errors = validate_input_files(to_validate)
+    if num_errors > 0:
+        print(f"Found {num_errors} problem(s). Exiting.")
+        sys.exit(1)
+    print(f"No problems found in {len(to_validate)} input file(s).")
+
+
+def preflight(to_validate):
+    # called before any database work, so that a bad row at the end of a file is found before loading the rest of it.
+    num_errors = validate_input_files(to_validate)
+    if num_errors > 0:
+        print(f"Found {num_errors} problem(s) with the input file(s), nothing has been added to the database. Fix them "
+              f"(or re-run with --skip-validation). Exiting.")
+        sys.exit(1)
+
+
+def read_in_manifest(manifest_inhandle):
+    # the manifest is a yaml dictionary of stage name -> input file(s). each input file can either be just the path,
+    # or a dictionary with the path as 'inhandle' plus any options for that stage. relative paths are relative to the
+    # manifest.
+    # returns a list of (stage name, function, args) in the order they need to be run.
+    with open(manifest_inhandle) as fi:
+        manifest = yaml.safe_load(fi)
+    stage_names = [x[0] for x in ingest_stages]
+    for stage_name in manifest:
+        if stage_name not in stage_names:
+            print(f"Stage {stage_name} in {manifest_inhandle} should be one of {stage_names}. Exiting.")
+            sys.exit(1)
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_inhandle))
+    to_run = []
+    for stage_name, function, required_options, optional_options in ingest_stages:
+        if stage_name not in manifest:
+            continue
+        stage_inputs = manifest[stage_name]
+        if not isinstance(stage_inputs, list):
+            stage_inputs = [stage_inputs]
+        for stage_input in stage_inputs:
+            if not isinstance(stage_input, dict):
+                stage_input = {'inhandle': stage_input}
+            if 'inhandle' not in stage_input:
+                print(f"Need an inhandle for every {stage_name} input in {manifest_inhandle}. Exiting.")
+                sys.exit(1)
+            for option in stage_input:
+                if option != 'inhandle' and option not in required_options and option not in optional_options:
+                    print(f"Option {option} for stage {stage_name} in {manifest_inhandle} should be one of "
+                          f"{required_options + list(optional_options)}. Exiting.")
+                    sys.exit(1)
+            for option in required_options:
+                if option not in stage_input:
+                    print(f"Need to give {option} for stage {stage_name} in {manifest_inhandle}. Exiting.")
+                    sys.exit(1)
+            options = dict(optional_options)
+            options.update(stage_input)
+            options[f"{stage_name}_inhandle"] = os.path.join(manifest_dir, options.pop('inhandle'))
+            to_run.append((stage_name, function, argparse.Namespace(**options)))
+    return to_run
+
+
+def ingest(to_run):
+    # load all the input files in the manifest in one process, in dependency order, each in its own transaction.
+    for stage_name, function, stage_args in to_run:
+        inhandle = vars(stage_args)[f'{stage_name}_inhandle']
+        print(f"Ingesting {stage_name} from {inhandle}")
+        with profile_stage(stage_name, inhandle=inhandle), file_transaction():
+            function(stage_args)
+
+
+def refresh_after_ingest(max_ids):
+    # bring the covid_sample_status and readset_summary rows of the samples and readsets this run touched up to date.
+    # max_ids is get_max_ids() from before the run.
+    with profile_stage('refresh derived tables'):
+        refresh_covid_sample_status(get_samples_changed_since(max_ids, relinked_sample_source_ids))
+        refresh_readset_summary(get_readsets_changed_since(max_ids, relinked_sample_source_ids))
+        db.session.commit()
+
+
+# stages which only add rows that no sample or readset refers to yet, so can't change covid_sample_status or
+# readset_summary. a run made up of only these skips refresh_after_ingest.
+stages_without_derived_rows = {'groups', 'projects', 'pcr_assays', 'raw_sequencing_batches', 'readset_batches'}
+
+
 def run_command(args):
-    if args.command == 'add_projects':
-        add_projects(args=args)
-    if args.command == 'add_sample_sources':
-        add_sample_sources(args=args)
-    if args.command == 'add_samples':
-        add_samples(args=args)
-    if args.command == 'add_extractions':
-        add_extractions(args=args)
-    if args.command == 'add_readset_batches':
-        add_readset_batches(args=args)
-    if args.command == 'add_readsets':
-        add_readsets(args=args)
-    if args.command == 'add_raw_sequencing_batches':
-        add_raw_sequencing_batches(args=args)
-    if args.command == 'add_tiling_pcrs':
-        add_tiling_pcrs(args=args)
-    if args.command == 'add_groups':
-        add_groups(args=args)
-    if args.command == 'add_covid_confirmatory_pcrs':
-        add_covid_confirmatory_pcrs(args=args)
     if args.command == 'get_covid_todo_list':
-        print('currently need to get covid todo list through direct sql query. sorry!')
+        print('The covid todo list is now seqbox_queries.py get_covid_todo_list.')
         sys.exit()
-    if args.command == 'add_pcr_results':
-        add_pcr_results(args=args)
-    if args.command == 'add_pcr_assays':
-        add_pcr_assays(args=args)
-    if args.command == 'add_artic_covid_results':
-        add_artic_covid_results(args=args)
-    if args.command == 'add_pangolin_results':
-        add_pangolin_results(args=args)
+    if args.command == 'validate':
+        validate(args=args)
+        return
+    if args.command == 'ingest':
+        to_run = read_in_manifest(args.manifest_inhandle)
+        if args.skip_validation is False:
+            with profile_stage('validation'):
+                preflight([(stage_name, stage_args) for stage_name, _, stage_args in to_run])
+        stage_names = {stage_name for stage_name, _, _ in to_run}
+    else:
+        # e.g. add_samples loads the samples stage, from args.samples_inhandle
+        stage_name = args.command[len('add_'):]
+        stage_names = {stage_name}
+        if args.skip_validation is False:
+            with profile_stage('validation'):
+                preflight([(stage_name, args)])
+    set_commit_policy(args.commit_mode, args.commit_every)
+    refresh = not stage_names.issubset(stages_without_derived_rows)
+    max_ids = get_max_ids() if refresh else None
+    ingest_error = None
+    try:
+        if args.command == 'ingest':
+            with profile_stage('warm lookup cache'):
+                warm_lookup_cache()
+            ingest(to_run)
+            return
+        with profile_stage(args.command, inhandle=vars(args)[f'{stage_name}_inhandle']), \
+                file_transaction():
+            warm_lookup_cache()
+            if args.command == 'add_projects':
+                add_projects(args=args)
+            if args.command == 'add_sample_sources':
+                add_sample_sources(args=args)
+            if args.command == 'add_samples':
+                add_samples(args=args)
+            if args.command == 'add_extractions':
+                add_extractions(args=args)
+            if args.command == 'add_readset_batches':
+                add_readset_batches(args=args)
+            if args.command == 'add_readsets':
+                add_readsets(args=args)
+            if args.command == 'add_raw_sequencing_batches':
+                add_raw_sequencing_batches(args=args)
+            if args.command == 'add_tiling_pcrs':
+                add_tiling_pcrs(args=args)
+            if args.command == 'add_groups':
+                add_groups(args=args)
+            if args.command == 'add_covid_confirmatory_pcrs':
+                add_covid_confirmatory_pcrs(args=args)
+            if args.command == 'add_pcr_results':
+                add_pcr_results(args=args)
+            if args.command == 'add_pcr_assays':
+                add_pcr_assays(args=args)
+            if args.command == 'add_artic_covid_results':
+                add_artic_covid_results(args=args)
+            if args.command == 'add_pangolin_results':
+                add_pangolin_results(args=args)
+    except BaseException as error:
+        ingest_error = error
+        raise
+    finally:
+        # each input file (or each batch/row with --commit) is committed as it goes, so refresh for whatever got
+        # into the database even if a later file or row failed.
+        db.session.rollback()
+        if refresh is True:
+            try:
+                refresh_after_ingest(max_ids)
+            except Exception as error:
+                # don't hide why the ingest failed behind why the refresh failed, report both.
+                db.session.rollback()
+                print(f"Refreshing covid_sample_status and readset_summary failed: {error!r}. Run "
+                      f"seqbox_queries.py refresh_covid_sample_status and seqbox_queries.py refresh_readset_summary "
+                      f"to bring them up to date.")
+                if ingest_error is None:
+                    raise
 
 
 def main():
     parser = argparse.ArgumentParser(prog='seqbox_cmd')
+    parser.add_argument('--commit', dest='commit_mode', choices=['file', 'batch', 'row'], default='file',
+                        help='file - commit once at the end of the input file, so a failed file is rolled back '
+                             'completely (default). batch - commit every --commit-every rows. row - commit after every '
+                             'row.')
+    parser.add_argument('--commit-every', dest='commit_every', type=int, default=1000,
+                        help='How many rows to flush (file) or commit (batch) at a time. Default 1000.')
+    parser.add_argument('--skip-validation', dest='skip_validation', action='store_true', default=False,
+                        help='Don\'t check the whole input file (see validate) before adding it to the database.')
+    parser.add_argument('--profile', dest='profile', action='store_true', default=False,
+                        help='At the end, print (to stderr) the time taken by each stage, the number of SQL '
+                             'statements by type and by the function that made them, and the slowest statements with '
+                             'their query plans.')
     subparsers = parser.add_subparsers(title='[sub-commands]', dest='command')
     parser_add_samples = subparsers.add_parser('add_samples', help='Take a csv file of samples and add to the DB')
     parser_add_samples.add_argument('-i', dest='samples_inhandle', help='A CSV file containing samples'
                                      , required=True)
+    parser_add_samples.add_argument('--bulk', dest='bulk', action='store_true', default=False,
+                                    help='Look up all the sample sources and existing samples for the file in one go '
+                                         'and insert all the new samples in a single transaction. Much faster for '
+                                         'large files.')
     parser_add_projects = subparsers.add_parser('add_projects', help='take a csv file of projects and add to the DB')
     parser_add_projects.add_argument('-i', dest='projects_inhandle', help='A CSV file containing projects'
                                      , required=True)
@@ -276,6 +576,10 @@ def main():
                                                                             'nanopolish', required=True)
     parser_add_artic_covid_results.add_argument('-p', dest='profile', help='Profile e.g. docker, conda, etc',
                                                 required=True)
+    parser_add_artic_covid_results.add_argument('--copy', dest='copy', action='store_true', default=False,
+                                                help='Postgres only. Look up all the readsets for the file in one '
+                                                     'go, COPY the results into a staging table and add the new ones '
+                                                     'with a single INSERT. Much faster for large files.')
     parser_add_pangolin_results = subparsers.add_parser('add_pangolin_results', help='Pangolin')
     parser_add_pangolin_results.add_argument('-i', dest='pangolin_results_inhandle', required=True)
     parser_add_pangolin_results.add_argument('-b', dest='readset_batch_name', help='Readset batch name. If youre '
@@ -291,12 +595,36 @@ def main():
     parser_add_pangolin_results.add_argument('-n', dest='nanopore_default', action='store_true', default=False,
                                      help='Are the data for these readsets arranged in nanopore default format? Need to'
                                           ' follow a different template for the inhandle.')
-    # print the help if no arguments passed
-    if len(sys.argv) == 1:
+    parser_add_pangolin_results.add_argument('--copy', dest='copy', action='store_true', default=False,
+                                             help='Postgres only. Look up all the artic covid results for the file in '
+                                                  'one go, COPY the results into a staging table and add the new ones '
+                                                  'with a single INSERT. Much faster for large files.')
+    parser_ingest = subparsers.add_parser('ingest', help='Load all the input files listed in a manifest in one go, in '
+                                                         'dependency order (groups, projects, ... pangolin results)')
+    parser_ingest.add_argument('-m', dest='manifest_inhandle', help='A yaml manifest of the input files for each stage',
+                               required=True)
+    parser_validate = subparsers.add_parser('validate', help='Check every row of the input file(s) without going to '
+                                                             'the database, and report all the problems in one go. '
+                                                             'The add_* commands and ingest do this automatically.')
+    parser_validate.add_argument('-m', dest='manifest_inhandle', help='A yaml manifest of input files (see ingest)')
+    parser_validate.add_argument('-t', dest='stage', choices=[x[0] for x in ingest_stages],
+                                 help='What the input file is, e.g. samples')
+    parser_validate.add_argument('-i', dest='inhandle', help='A CSV input file')
+    parser_validate.add_argument('-s', dest='covid', action='store_true', default=False,
+                                 help='For readsets, is this a covid readset?')
+    parser_validate.add_argument('-n', dest='nanopore_default', action='store_true', default=False,
+                                 help='For readsets, are they in nanopore default format?')
+    args = parser.parse_args()
+    # print the help if no sub-command passed, e.g. just --profile
+    if args.command is None:
         parser.print_help(sys.stderr)
         sys.exit(1)
-    args = parser.parse_args()
-    run_command(args)
+    if args.profile is True:
+        enable_profiling(db.engine)
+    try:
+        run_command(args)
+    finally:
+        print_profile()
 
 
 if __name__ == '__main__':
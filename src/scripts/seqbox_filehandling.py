@@ -1,11 +1,22 @@
 import os
 import sys
-import yaml
+import csv
 import glob
+import gzip
+import json
+import hashlib
+import yaml
+import collections
+import concurrent.futures
 import argparse
-from app.models import ReadSetBatch
-from seqbox_utils import read_in_as_dict, get_readset, get_nanopore_readset_from_batch_and_barcode, \
-    basic_check_readset_fields
+from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload, configure_mappers
+import seqbox_db  # binds app.models to the plain sqlalchemy session, must come first
+from app.models import ReadSetBatch, ReadSet, ReadSetNanopore, RawSequencing, Extraction, Sample, SampleSource, Project, \
+    FileChecksum
+from seqbox_utils import read_in_as_records, basic_check_readset_fields, get_readsets_bulk, get_readset_key, \
+    ReadsetRecord
+from seqbox_profile import enable_profiling, profile_stage, print_profile
 
 
 def read_in_config(config_inhandle):
@@ -13,71 +24,283 @@ def read_in_config(config_inhandle):
         return yaml.safe_load(fi)
 
 
-def add_readset_to_filestructure(readset, config):
+def get_readset_filestructure_options():
+    # everything add_readset_to_filestructure and run_add_artic_consensus_to_filestructure use from a readset, so that
+    # all the readsets for an input file can be loaded up front, rather than each readset lazy loading its
+    # raw_sequencing, batch, extraction, sample, sample source, projects and groups one SELECT at a time.
+    # the backrefs (e.g. ReadSet.raw_sequencing) only exist once the mappers are configured.
+    configure_mappers()
+    return [joinedload(ReadSet.raw_sequencing).joinedload(RawSequencing.raw_sequencing_batch),
+            joinedload(ReadSet.raw_sequencing).joinedload(RawSequencing.extraction).joinedload(Extraction.sample)
+            .joinedload(Sample.sample_source).selectinload(SampleSource.projects).joinedload(Project.groups),
+            joinedload(ReadSet.readset_nanopore),
+            joinedload(ReadSet.readset_illumina)]
+
+
+def get_readsets_for_filestructure(readset_ids):
+    # one query (plus one for the projects) for all the readsets, returns readset id -> readset
+    readsets = ReadSet.query.options(*get_readset_filestructure_options()).filter(ReadSet.id.in_(readset_ids)).all()
+    return {readset.id: readset for readset in readsets}
+
+
+def get_nanopore_readset_ids_from_batches_and_barcodes(all_readsets_info):
+    # the bulk version of seqbox_utils.get_nanopore_readset_from_batch_and_barcode, returns
+    # (readset_batch_name, barcode) -> readset id for all the batches in all_readsets_info
+    batch_names = {x['readset_batch_name'] for x in all_readsets_info}
+    matching_readsets = ReadSetNanopore.query.with_entities(ReadSetBatch.name, ReadSetNanopore.barcode,
+                                                            ReadSetNanopore.readset_id)\
+        .select_from(ReadSetNanopore).join(ReadSet).join(ReadSetBatch)\
+        .filter(ReadSetBatch.name.in_(batch_names)).all()
+    return {(readset_batch_name, barcode): readset_id for readset_batch_name, barcode, readset_id in matching_readsets}
+
+
+def make_link(kind, source, target):
+    # one planned symlink, target -> source. kind is what the source is, for the messages.
+    return {'kind': kind, 'source': source, 'target': target}
+
+
+def plan_readset_links(readset, config):
     '''
-    1. Check that input files exist
+    Works out the links for one readset, from the database alone.
+    1. get the group name of this readset, the data is stored in a directory with the group name
     2. get readset_identifier-filename for this sample
-    3. check that output dir exists (make it if not)
-        a. will be /Users/flashton/Dropbox/non-project/test_seqbox_data/Core/[readset_identifier]-filename/
-    4. link the fastq to the output_dir
+    3. the output dir will be e.g. /Users/flashton/Dropbox/non-project/test_seqbox_data/Core/[readset_identifier]-filename/
+    4. link the fastq(s) into the output dir
     '''
-    if readset.raw_sequencing.raw_sequencing_batch.sequencing_type == 'nanopore':
-        assert os.path.isfile(readset.readset_nanopore.path_fastq)
-    elif readset.raw_sequencing.raw_sequencing_batch.sequencing_type == 'illumina':
-        assert os.path.isfile(readset.readset_illumina.path_r1)
-        assert os.path.isfile(readset.readset_illumina.path_r2)
-    # data is going to be stored in a directory with the group name, so need to get the group name of this readset.
     projects = readset.raw_sequencing.extraction.sample.sample_source.projects
     group_names = [x.groups.group_name for x in projects]
     # a sample can only belong to one group, so this assertion should always be true.
     assert len(set(group_names)) == 1
-    group_name = group_names[0]
-    group_dir = os.path.join(config['seqbox_directory'], group_name)
-    if not os.path.isdir(group_dir):
-        os.mkdir(group_dir)
+    group_dir = os.path.join(config['seqbox_directory'], group_names[0])
     # going to name the linked file with the sample name and readset_identifier
     sample_name = readset.raw_sequencing.extraction.sample.sample_identifier
     readset_dir = os.path.join(group_dir, f"{readset.readset_identifier}-{sample_name}")
-    if not os.path.isdir(readset_dir):
-        os.mkdir(readset_dir)
     if readset.raw_sequencing.raw_sequencing_batch.sequencing_type == 'nanopore':
-        output_readset_fastq_path = os.path.join(readset_dir, f"{readset.readset_identifier}-{sample_name}.fastq.gz")
-        if os.path.isfile(output_readset_fastq_path):
-            print(f"{output_readset_fastq_path} already exists. Exiting.")
-            sys.exit()
-        else:
-            os.symlink(readset.readset_nanopore.path_fastq, output_readset_fastq_path)
+        return [make_link('fastq', readset.readset_nanopore.path_fastq,
+                          os.path.join(readset_dir, f"{readset.readset_identifier}-{sample_name}.fastq.gz"))]
     elif readset.raw_sequencing.raw_sequencing_batch.sequencing_type == 'illumina':
-        output_readset_r1_fastq_path = os.path.join(readset_dir, f"{readset.readset_identifier}-{sample_name}_R1.fastq.gz")
-        output_readset_r2_fastq_path = os.path.join(readset_dir, f"{readset.readset_identifier}-{sample_name}_R2.fastq.gz")
+        return [make_link('R1 fastq', readset.readset_illumina.path_r1,
+                          os.path.join(readset_dir, f"{readset.readset_identifier}-{sample_name}_R1.fastq.gz")),
+                make_link('R2 fastq', readset.readset_illumina.path_r2,
+                          os.path.join(readset_dir, f"{readset.readset_identifier}-{sample_name}_R2.fastq.gz"))]
+
+
+def list_target_directory(directory):
+    # directory listing used to classify all the links into one directory. returns link name -> whether it's a
+    # symlink, None if the directory doesn't exist yet, or False if there is something other than a directory there.
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name: entry.is_symlink() for entry in entries}
+    except FileNotFoundError:
+        return None
+    except NotADirectoryError:
+        return False
+
 
-        assert os.path.isfile(output_readset_r2_fastq_path) is False
-        os.symlink(readset.readset_illumina.path_r1, output_readset_r1_fastq_path)
-        os.symlink(readset.readset_illumina.path_r2, output_readset_r2_fastq_path)
-    print(f"Added readset to filestructure {readset.readset_identifier}-{sample_name} to {group_dir}")
+def classify_link(link, listing):
+    # works out what applying one planned link would do, without changing anything. listing is the
+    # list_target_directory() of the directory the link goes in. the status is one of
+    # new - nothing at the target yet, the link will be made.
+    # already_correct - the target is already a link to the source, nothing to do.
+    # conflicting - there is something else at the target, it will be left alone.
+    # missing_source - the source file doesn't exist, nothing will be made.
+    if listing is False:
+        return 'conflicting'
+    if listing is not None and os.path.basename(link['target']) in listing:
+        if listing[os.path.basename(link['target'])] is True and os.readlink(link['target']) == link['source']:
+            return 'already_correct'
+        return 'conflicting'
+    if not os.path.isfile(link['source']):
+        return 'missing_source'
+    return 'new'
+
+
+def plan_actions(links, jobs):
+    '''
+    Turns the planned links into the full list of mkdir and link actions, each with a status (see classify_link). The
+    filesystem is only read - each target directory is listed once, and the only other calls are a readlink for each
+    target that is already a link and a stat of the source for each target that isn't there yet. The filesystem
+    calls are independent of each other, and on a network filesystem each one is a round trip, so run up to `jobs` of
+    them at a time. The actions come back with the mkdirs first, then the links in the same order as links.
+    '''
+    directories = sorted({os.path.dirname(link['target']) for link in links})
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        listings = dict(zip(directories, executor.map(list_target_directory, directories)))
+        statuses = list(executor.map(lambda link: classify_link(link, listings[os.path.dirname(link['target'])]),
+                                     links))
+    link_actions = [dict(link, action='link', status=status) for link, status in zip(links, statuses)]
+    directories_with_new_links = {os.path.dirname(x['target']) for x in link_actions if x['status'] == 'new'}
+    mkdir_actions = []
+    for directory in directories:
+        if listings[directory] is None:
+            # only make a directory if something is going to be linked into it
+            status = 'new' if directory in directories_with_new_links else 'missing_source'
+        elif listings[directory] is False:
+            status = 'conflicting'
+        else:
+            status = 'already_correct'
+        mkdir_actions.append({'kind': 'directory', 'source': '', 'target': directory, 'action': 'mkdir',
+                              'status': status})
+    return mkdir_actions + link_actions
+
+
+def write_plan(plan, plan_format, outhandle):
+    # the plan as json (a list of actions) or tsv (one action per line), to a file or stdout
+    fields = ['action', 'status', 'kind', 'source', 'target']
+    fo = sys.stdout if outhandle is None else open(outhandle, 'w', newline='')
+    try:
+        if plan_format == 'json':
+            json.dump([{field: action[field] for field in fields} for action in plan], fo, indent=2)
+            fo.write('\n')
+        elif plan_format == 'tsv':
+            writer = csv.DictWriter(fo, fieldnames=fields, delimiter='\t', extrasaction='ignore', lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(plan)
+    finally:
+        if outhandle is not None:
+            fo.close()
+
+
+def read_plan(plan_inhandle):
+    # the actions of a plan written out by --plan, json or tsv
+    fields = ['action', 'status', 'kind', 'source', 'target']
+    with open(plan_inhandle, newline='') as fi:
+        if fi.read(1) == '[':
+            fi.seek(0)
+            plan = json.load(fi)
+        else:
+            fi.seek(0)
+            plan = list(csv.DictReader(fi, delimiter='\t'))
+    for action in plan:
+        if any(field not in action for field in fields):
+            print(f"Every action in {plan_inhandle} needs {', '.join(fields)}, this one doesn't: {action}. Exiting.")
+            sys.exit(1)
+    return plan
+
+
+def apply_action(action):
+    # carries out one new action. returns the status it ends up with - made (mkdir), linked (link) or conflicting, if
+    # something else got to the target between planning and here.
+    if action['action'] == 'mkdir':
+        os.makedirs(action['target'], exist_ok=True)
+        return 'made'
+    try:
+        os.symlink(action['source'], action['target'])
+    except FileExistsError:
+        return 'conflicting'
+    return 'linked'
+
+
+def apply_plan(plan, jobs):
+    # only the new actions change anything, so applying the same plan (or a fresh plan of the same batch) again is a
+    # no-op. the directories are all made before any of the links into them. returns the plan with the final statuses.
+    results = [dict(action) for action in plan]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        for action_type in ('mkdir', 'link'):
+            to_apply = [x for x in results if x['action'] == action_type and x['status'] == 'new']
+            for action, status in zip(to_apply, executor.map(apply_action, to_apply)):
+                action['status'] = status
+    return results
+
+
+def report_link_results(results):
+    # print what happened to each link, then a summary. returns the number of links with each status.
+    status_messages = {'linked': 'Linked {source} to {target}',
+                       'already_correct': '{target} is already linked to {source}',
+                       'conflicting': '{target} already exists and is not a link to {source}, not changing it',
+                       'missing_source': 'No {kind} at {source}'}
+    counts = {status: 0 for status in status_messages}
+    for action in results:
+        if action['action'] == 'mkdir':
+            if action['status'] == 'conflicting':
+                print(f"{action['target']} already exists and is not a directory, not linking anything into it")
+            continue
+        print(status_messages[action['status']].format(**action))
+        counts[action['status']] += 1
+    print(f"{counts['linked']} linked, {counts['already_correct']} already linked, {counts['conflicting']} conflicts, "
+          f"{counts['missing_source']} missing sources.")
+    return counts
+
+
+def run_links(links, args):
+    # plans the links, then either writes the plan out (--plan) or applies it. returns the counts of each link status,
+    # or None if only the plan was written.
+    plan = plan_actions(links, args.jobs)
+    if args.plan_format is not None:
+        write_plan(plan, args.plan_format, args.plan_outhandle)
+        return None
+    return report_link_results(apply_plan(plan, args.jobs))
+
+
+def run_apply_plan(args):
+    # makes the links which were new in a plan written out by --plan earlier. the filesystem could have changed since
+    # then, so each one is checked again first, and only the ones which are still new are made.
+    plan = read_plan(args.plan_inhandle)
+    links = [make_link(x['kind'], x['source'], x['target']) for x in plan
+             if x['action'] == 'link' and x['status'] == 'new']
+    results = apply_plan(plan_actions(links, args.jobs), args.jobs)
+    counts = report_link_results(results)
+    num_changed = len(links) - counts['linked']
+    if num_changed > 0:
+        print(f"{num_changed} of the {len(links)} new links in {args.plan_inhandle} weren't new any more.")
+    if counts['conflicting'] > 0 or counts['missing_source'] > 0:
+        sys.exit(1)
 
 
 def run_add_readset_to_filestructure(args):
     config = read_in_config(args.seqbox_config)
-    all_readsets_info = read_in_as_dict(args.readsets_inhandle)
+    all_readsets_info = [x for x in read_in_as_records(args.readsets_inhandle, ReadsetRecord)
+                         if basic_check_readset_fields(x) is not False]
+    # first work out which readset each line is, then load all of them (and everything plan_readset_links needs from
+    # them) in one go.
+    if args.nanopore_default is True:
+        nanopore_readset_ids = get_nanopore_readset_ids_from_batches_and_barcodes(all_readsets_info)
+    elif args.nanopore_default is False:
+        readset_techs, _ = get_readsets_bulk(all_readsets_info, args.covid)
+    readset_ids = []
     for readset_info in all_readsets_info:
-        if basic_check_readset_fields(readset_info) is False:
-            continue
         if args.nanopore_default is True:
-            readset_nanopre = get_nanopore_readset_from_batch_and_barcode(readset_info)
-            if readset_nanopre is False:
-                print(f"There is no readset for\n{readset_info}\nExiting.")
-                sys.exit()
-            else:
-                add_readset_to_filestructure(readset_nanopre.readset, config)
+            readset_id = nanopore_readset_ids.get((readset_info['readset_batch_name'], readset_info['barcode']))
         elif args.nanopore_default is False:
             # readset_tech is either readset_illumina or readset_nanopore
-            readset_tech = get_readset(readset_info, args.covid)
-            if readset_tech is False:
-                print(f"There is no readset for\n{readset_info}\nExiting.")
-                sys.exit()
-            else:
-                add_readset_to_filestructure(readset_tech.readset, config)
+            readset_tech = readset_techs.get(get_readset_key(readset_info, args.covid), [])
+            readset_id = readset_tech[0].readset_id if len(readset_tech) == 1 else None
+        if readset_id is None:
+            print(f"There is no readset for\n{readset_info}\nExiting.")
+            sys.exit()
+        readset_ids.append(readset_id)
+    readsets = get_readsets_for_filestructure(readset_ids)
+    links = [link for readset_id in readset_ids for link in plan_readset_links(readsets[readset_id], config)]
+    counts = run_links(links, args)
+    if counts is not None and (counts['conflicting'] > 0 or counts['missing_source'] > 0):
+        sys.exit(1)
+
+
+# the artic pipeline outputs that add_artic_consensus_to_filestructure links - what it is, the end of the output file
+# name after {readset batch name}_{barcode}, the end of the link name after {readset_identifier}-{sample_identifier},
+# and whether to report it as missing if it isn't there.
+artic_artifacts = [('consensus genome', '.consensus.fasta', '.artic.consensus.fasta', True),
+                   ('bam', '.primertrimmed.rg.sorted.bam', '.artic.bam', True),
+                   ('vcf', '.pass.vcf.gz', '.artic.pass.vcf.gz', False),
+                   ('qc', '.qc.csv', '.artic.qc.csv', False),
+                   ('depth plot', '.depth.png', '.artic.depth.png', False)]
+
+
+def index_artic_results(results_dir, readset_batch_name):
+    # lists results_dir once and returns barcode -> {artifact kind -> path} for all the outputs from this readset batch,
+    # rather than globbing the (often very big) directory for each output of each readset.
+    artic_results = {}
+    prefix = f"{readset_batch_name}_"
+    with os.scandir(results_dir) as entries:
+        for entry in entries:
+            if not entry.name.startswith(prefix):
+                continue
+            for kind, source_suffix, _, _ in artic_artifacts:
+                if entry.name.endswith(source_suffix):
+                    barcode = entry.name[len(prefix):-len(source_suffix)]
+                    artic_results.setdefault(barcode, {})[kind] = os.path.join(results_dir, entry.name)
+                    break
+    return artic_results
 
 
 def run_add_artic_consensus_to_filestructure(args):
@@ -92,37 +315,248 @@ def run_add_artic_consensus_to_filestructure(args):
     '''
     rsb = ReadSetBatch.query.filter_by(name=args.readset_batch_name).all()
     assert len(rsb) == 1
-    for rs in rsb[0].readsets:
+    readsets = ReadSet.query.options(*get_readset_filestructure_options()).filter_by(readset_batch_id=rsb[0].id)\
+        .order_by(ReadSet.id).all()
+    artic_results = index_artic_results(args.consensus_genomes_parent_dir, args.readset_batch_name)
+    links = []
+    for rs in readsets:
         sample = rs.raw_sequencing.extraction.sample
         group_name = sample.sample_source.projects[0].groups.group_name
         target_dir = os.path.join(config['seqbox_directory'], group_name, f"{rs.readset_identifier}-{sample.sample_identifier}", "artic_pipeline")
-        target_consensus = os.path.join(target_dir, f"{rs.readset_identifier}-{sample.sample_identifier}.artic.consensus.fasta")
-        if not os.path.isfile(target_consensus):
-            source_consensus = glob.glob(
-                    f"{args.consensus_genomes_parent_dir}/{args.readset_batch_name}_{rs.readset_nanopore.barcode}.consensus.fasta")
-            if len(source_consensus) == 1:
-                if not os.path.isdir(target_dir):
-                    os.mkdir(target_dir)
-                os.symlink(source_consensus[0], target_consensus)
-                print(f"Linked {source_consensus[0]} to {target_consensus}")
-            elif len(source_consensus) == 0:
-                print(f"No consensus genome at {args.consensus_genomes_parent_dir}/{args.readset_batch_name}_{rs.readset_nanopore.barcode}.consensus.fasta")
-            elif len(source_consensus) > 1:
-                print(f"More than one consensus genome at {args.consensus_genomes_parent_dir}/{args.readset_batch_name}_{rs.readset_nanopore.barcode}.consensus.fasta")
-
-        target_bam = os.path.join(target_dir, f"{rs.readset_identifier}-{sample.sample_identifier}.artic.bam")
-        if not os.path.isfile(target_bam):
-            source_bam = glob.glob(
-                    f"{args.consensus_genomes_parent_dir}/{args.readset_batch_name}_{rs.readset_nanopore.barcode}.primertrimmed.rg.sorted.bam")
-            if len(source_bam) == 1:
-                if not os.path.isdir(target_dir):
-                    os.mkdir(target_dir)
-                os.symlink(source_bam[0], target_bam)
-                print(f"Linked {source_bam[0]} to {target_bam}")
-            elif len(source_bam) == 0:
-                print(f"No bam at {args.consensus_genomes_parent_dir}/{args.readset_batch_name}_{rs.readset_nanopore.barcode}.primertrimmed.rg.sorted.bam")
-            elif len(source_bam) > 1:
-                print(f"More than one bam at {args.consensus_genomes_parent_dir}/{args.readset_batch_name}_{rs.readset_nanopore.barcode}.primertrimmed.rg.sorted.bam")
+        barcode_results = artic_results.get(rs.readset_nanopore.barcode, {})
+        for kind, source_suffix, target_suffix, required in artic_artifacts:
+            if kind not in barcode_results and required is False:
+                continue
+            # if a required output is missing, the link is still planned, so that it's reported as a missing source
+            source = barcode_results.get(kind, os.path.join(
+                args.consensus_genomes_parent_dir, f"{args.readset_batch_name}_{rs.readset_nanopore.barcode}{source_suffix}"))
+            links.append(make_link(kind, source, os.path.join(
+                target_dir, f"{rs.readset_identifier}-{sample.sample_identifier}{target_suffix}")))
+    # not every barcode in a batch has artic output (e.g. negative controls), so missing sources aren't an error here
+    counts = run_links(links, args)
+    if counts is not None and counts['conflicting'] > 0:
+        sys.exit(1)
+
+
+def compute_fastq_stats(fastqs):
+    '''
+    Number of reads, total bases, read length N50 and mean phred base quality over all the reads in the fastqs
+    (gzipped or not), in one pass. Only a histogram of read lengths is kept, so memory doesn't grow with the number
+    of reads. Runs in a worker process, so takes and returns plain python objects.
+    '''
+    num_reads = 0
+    total_bases = 0
+    total_quality = 0
+    read_lengths = collections.Counter()
+    for fastq in fastqs:
+        opener = gzip.open if fastq.endswith('.gz') else open
+        with opener(fastq, 'rb') as fi:
+            while True:
+                header = fi.readline()
+                if not header:
+                    break
+                sequence = fi.readline().rstrip(b'\r\n')
+                fi.readline()
+                quality = fi.readline().rstrip(b'\r\n')
+                num_reads += 1
+                total_bases += len(sequence)
+                read_lengths[len(sequence)] += 1
+                # the quality characters are phred + 33
+                total_quality += sum(quality) - 33 * len(quality)
+    n50 = None
+    bases_so_far = 0
+    for read_length in sorted(read_lengths, reverse=True):
+        bases_so_far += read_length * read_lengths[read_length]
+        if bases_so_far * 2 >= total_bases > 0:
+            n50 = read_length
+            break
+    mean_quality = total_quality / total_bases if total_bases > 0 else None
+    return {'num_reads': num_reads, 'total_bases': total_bases, 'n50': n50, 'mean_quality': mean_quality}
+
+
+def get_readset_fastqs(readset):
+    if readset.readset_nanopore is not None:
+        return [readset.readset_nanopore.path_fastq]
+    elif readset.readset_illumina is not None:
+        return [readset.readset_illumina.path_r1, readset.readset_illumina.path_r2]
+    return []
+
+
+def get_fastqs_size_and_mtime(fastqs):
+    # (total size, latest mtime) of the fastqs, to tell whether they've changed since the stats were computed. returns
+    # None if any of them doesn't exist.
+    try:
+        stats = [os.stat(fastq) for fastq in fastqs]
+    except (FileNotFoundError, TypeError):
+        return None
+    return sum(x.st_size for x in stats), max(x.st_mtime for x in stats)
+
+
+def run_compute_readset_stats(args):
+    configure_mappers()
+    query = ReadSet.query.options(joinedload(ReadSet.readset_nanopore), joinedload(ReadSet.readset_illumina))
+    if args.readset_batch_name is not None:
+        query = query.join(ReadSetBatch).filter(ReadSetBatch.name == args.readset_batch_name)
+    readsets = query.order_by(ReadSet.id).all()
+    to_compute = []
+    counts = {'computed': 0, 'unchanged': 0, 'missing': 0, 'failed': 0}
+    for readset in readsets:
+        fastqs = get_readset_fastqs(readset)
+        size_and_mtime = get_fastqs_size_and_mtime(fastqs)
+        if not fastqs or size_and_mtime is None:
+            print(f"Fastq(s) {fastqs} for readset {readset.id} don't exist, not computing stats for it.")
+            counts['missing'] += 1
+        elif args.force is False and (readset.stats_files_size, readset.stats_files_mtime) == size_and_mtime:
+            counts['unchanged'] += 1
+        else:
+            to_compute.append((readset, fastqs, size_and_mtime))
+    # reading and decompressing the fastqs is cpu bound, so it's done in separate processes, and each readset is
+    # committed as soon as its stats come back so that an interrupted run doesn't lose everything.
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(compute_fastq_stats, fastqs): (readset, fastqs, size_and_mtime)
+                   for readset, fastqs, size_and_mtime in to_compute}
+        for future in concurrent.futures.as_completed(futures):
+            readset, fastqs, size_and_mtime = futures[future]
+            try:
+                stats = future.result()
+            except (OSError, EOFError) as e:
+                print(f"Couldn't read {fastqs} for readset {readset.id}: {e}")
+                counts['failed'] += 1
+                continue
+            for column, value in stats.items():
+                setattr(readset, column, value)
+            readset.stats_files_size, readset.stats_files_mtime = size_and_mtime
+            readset.date_stats_computed = datetime.utcnow()
+            seqbox_db.db.session.commit()
+            print(f"Readset {readset.id}: {stats['num_reads']} reads, {stats['total_bases']} bases, N50 {stats['n50']}, "
+                  f"mean quality {stats['mean_quality']}")
+            counts['computed'] += 1
+    print(f"{counts['computed']} computed, {counts['unchanged']} unchanged, {counts['missing']} missing fastqs, "
+          f"{counts['failed']} failed.")
+    if counts['missing'] > 0 or counts['failed'] > 0:
+        sys.exit(1)
+
+
+def get_readset_files(readset):
+    # every file registered for a readset - its fastq(s) and the raw fast5s/fastqs they came from. for nanopore default
+    # data path_fast5 is a glob of the barcode's fast5_pass directory. if that matches nothing, the glob itself is
+    # returned, so that it's checked (and reported as missing) like any other file.
+    files = [x for x in get_readset_fastqs(readset) if x is not None]
+    raw_sequencing = readset.raw_sequencing
+    if raw_sequencing is not None and raw_sequencing.raw_sequencing_nanopore is not None \
+            and raw_sequencing.raw_sequencing_nanopore.path_fast5 is not None:
+        path_fast5 = raw_sequencing.raw_sequencing_nanopore.path_fast5
+        files.extend((sorted(glob.glob(path_fast5)) or [path_fast5]) if '*' in path_fast5 else [path_fast5])
+    if raw_sequencing is not None and raw_sequencing.raw_sequencing_illumina is not None:
+        files.extend(x for x in (raw_sequencing.raw_sequencing_illumina.path_r1,
+                                 raw_sequencing.raw_sequencing_illumina.path_r2) if x is not None)
+    return list(dict.fromkeys(files))
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    # sha256 of the file, read a chunk at a time so memory doesn't depend on the file size. hashlib lets go of the GIL
+    # while it hashes each chunk, so several of these can run at once in threads.
+    sha256 = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as fi:
+        while True:
+            num_read = fi.readinto(buffer)
+            if num_read == 0:
+                break
+            sha256.update(view[:num_read])
+    return sha256.hexdigest()
+
+
+def check_file(path, recorded, full):
+    '''
+    Works out whether one file needs hashing, and hashes it if it does. recorded is the (size, mtime, sha256) from the
+    file_checksum table, or None if the file hasn't been hashed before. Returns (status, (size, mtime, sha256)) where
+    the status is one of
+    new - not hashed before.
+    unchanged - same size and mtime as when it was hashed, so not hashed again (unless full is True).
+    verified - hashed again and the sha256 matches.
+    changed - hashed again and the sha256 doesn't match.
+    missing - the file doesn't exist.
+    failed - the file couldn't be read.
+    '''
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 'missing', None
+    if recorded is not None and full is False and recorded[:2] == (stat.st_size, stat.st_mtime):
+        return 'unchanged', recorded
+    try:
+        sha256 = hash_file(path)
+    except OSError:
+        return 'failed', None
+    if recorded is None:
+        return 'new', (stat.st_size, stat.st_mtime, sha256)
+    return 'verified' if sha256 == recorded[2] else 'changed', (stat.st_size, stat.st_mtime, sha256)
+
+
+def run_checksum_files(args):
+    configure_mappers()
+    query = ReadSet.query.options(joinedload(ReadSet.readset_nanopore), joinedload(ReadSet.readset_illumina),
+                                  joinedload(ReadSet.raw_sequencing).joinedload(RawSequencing.raw_sequencing_nanopore),
+                                  joinedload(ReadSet.raw_sequencing).joinedload(RawSequencing.raw_sequencing_illumina))
+    checksums_query = FileChecksum.query
+    if args.readset_batch_name is not None:
+        query = query.join(ReadSetBatch).filter(ReadSetBatch.name == args.readset_batch_name)
+        checksums_query = checksums_query.join(ReadSet).join(ReadSetBatch)\
+            .filter(ReadSetBatch.name == args.readset_batch_name)
+    readsets = query.order_by(ReadSet.id).all()
+    checksums = {x.path: x for x in checksums_query.all()}
+    to_check = []
+    seen = set()
+    for readset in readsets:
+        for path in get_readset_files(readset):
+            if path not in seen:
+                seen.add(path)
+                to_check.append((readset.id, path))
+    # files which were hashed before but aren't there any more (e.g. a fast5 gone from a globbed directory) are checked
+    # too, so that they are reported as missing
+    to_check.extend((x.readset_id, path) for path, x in checksums.items() if path not in seen)
+    # plain tuples for the worker threads, which mustn't touch the session
+    recorded = {path: (x.size, x.mtime, x.sha256) for path, x in checksums.items()}
+    counts = {status: 0 for status in ('new', 'unchanged', 'verified', 'changed', 'missing', 'failed')}
+
+    def check(readset_id_and_path):
+        path = readset_id_and_path[1]
+        return check_file(path, recorded.get(path), args.full)
+
+    # on the data storage hosts the reads are the slow part, so run up to `jobs` files at a time. the results come back
+    # in order, and are committed every so often so that an interrupted audit keeps what it has done.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        for i, ((readset_id, path), (status, result)) in enumerate(zip(to_check, executor.map(check, to_check))):
+            counts[status] += 1
+            checksum = checksums.get(path)
+            if status == 'new':
+                size, mtime, sha256 = result
+                seqbox_db.db.session.add(FileChecksum(readset_id=readset_id, path=path, size=size, mtime=mtime,
+                                                      sha256=sha256))
+            elif status == 'verified':
+                checksum.size, checksum.mtime, _ = result
+                checksum.date_verified = datetime.utcnow()
+            elif status == 'changed':
+                print(f"{path} has changed since it was hashed on {checksum.date_hashed}, sha256 was "
+                      f"{checksum.sha256} and is now {result[2]}.")
+                if args.update is True:
+                    checksum.size, checksum.mtime, checksum.sha256 = result
+                    checksum.date_hashed = datetime.utcnow()
+            elif status == 'missing' and '*' in path:
+                print(f"No files match {path}.")
+            elif status == 'missing':
+                print(f"{path} doesn't exist.")
+            elif status == 'failed':
+                print(f"Couldn't read {path}.")
+            if i % 100 == 99:
+                seqbox_db.db.session.commit()
+    seqbox_db.db.session.commit()
+    print(f"{counts['new']} new, {counts['unchanged']} unchanged, {counts['verified']} verified, "
+          f"{counts['changed']} changed, {counts['missing']} missing, {counts['failed']} failed.")
+    if counts['changed'] > 0 or counts['missing'] > 0 or counts['failed'] > 0:
+        sys.exit(1)
 
 
 def run_command(args):
@@ -130,10 +564,19 @@ def run_command(args):
         run_add_readset_to_filestructure(args=args)
     if args.command == 'add_artic_consensus_to_filestructure':
         run_add_artic_consensus_to_filestructure(args=args)
+    if args.command == 'compute_readset_stats':
+        run_compute_readset_stats(args=args)
+    if args.command == 'checksum_files':
+        run_checksum_files(args=args)
+    if args.command == 'apply_plan':
+        run_apply_plan(args=args)
 
 
 def main():
     parser = argparse.ArgumentParser(prog='seqbox_filehandling')
+    parser.add_argument('--profile', dest='profile', action='store_true', default=False,
+                        help='At the end, print (to stderr) the time taken, the number of SQL statements by type and '
+                             'by the function that made them, and the slowest statements with their query plans.')
     subparsers = parser.add_subparsers(title='[sub-commands]', dest='command')
     parser_add_readset_to_filestructure = subparsers.add_parser('add_readset_to_filestructure',
                                                                 help='Take a csv file of samples and add links to the '
@@ -159,8 +602,56 @@ def main():
                                                              help='Absolute path to the artic pipeline results dir',
                                                              required=True)
 
+    for subparser in (parser_add_readset_to_filestructure, parser_add_artic_consensus_to_filestructure):
+        subparser.add_argument('--jobs', dest='jobs', type=int, default=1,
+                               help='How many links to make at once. Every link is worked out from the database '
+                                    'first, then the filesystem work is done by this many threads. Default 1.')
+        subparser.add_argument('--plan', dest='plan_format', choices=['json', 'tsv'], default=None,
+                               help="Don't change anything, just write out every mkdir and link that would be done and "
+                                    "whether each one is new, already_correct, conflicting or missing_source.")
+        subparser.add_argument('--plan-out', dest='plan_outhandle', default=None,
+                               help='Where to write the --plan to. Default stdout.')
+    parser_apply_plan = subparsers.add_parser('apply_plan',
+                                              help='Make the new links in a plan written out earlier with --plan, '
+                                                   'checking each one again first.')
+    parser_apply_plan.add_argument('-i', dest='plan_inhandle', help='A json or tsv plan from --plan', required=True)
+    parser_apply_plan.add_argument('--jobs', dest='jobs', type=int, default=1,
+                                   help='How many links to check and make at once. Default 1.')
+    parser_compute_readset_stats = subparsers.add_parser('compute_readset_stats',
+                                                         help='Work out the number of reads, total bases, N50 and mean '
+                                                              'quality of readsets from their fastqs.')
+    parser_compute_readset_stats.add_argument('-b', dest='readset_batch_name', default=None,
+                                              help='Only do the readsets in this readset batch. Default all readsets.')
+    parser_compute_readset_stats.add_argument('-f', dest='force', action='store_true', default=False,
+                                              help="Compute the stats again even if the fastqs haven't changed (size "
+                                                   "and mtime) since the last time.")
+    parser_compute_readset_stats.add_argument('--jobs', dest='jobs', type=int, default=1,
+                                              help='How many fastqs to read at once, each in its own process. '
+                                                   'Default 1.')
+    parser_checksum_files = subparsers.add_parser('checksum_files',
+                                                  help='Record the sha256 of the fastq and fast5 files of readsets, '
+                                                       'and check the ones already recorded.')
+    parser_checksum_files.add_argument('-b', dest='readset_batch_name', default=None,
+                                       help='Only do the readsets in this readset batch. Default all readsets.')
+    parser_checksum_files.add_argument('-a', dest='full', action='store_true', default=False,
+                                       help="Hash every file again, not just the ones whose size or mtime has changed "
+                                            "since they were hashed.")
+    parser_checksum_files.add_argument('-u', dest='update', action='store_true', default=False,
+                                       help='Record the new sha256 of files which have changed, rather than just '
+                                            'reporting them.')
+    parser_checksum_files.add_argument('--jobs', dest='jobs', type=int, default=1,
+                                       help='How many files to hash at once. Default 1.')
     args = parser.parse_args()
-    run_command(args)
+    if args.command is not None and args.jobs < 1:
+        print(f"--jobs needs to be 1 or more, not {args.jobs}. Exiting.")
+        sys.exit(1)
+    if args.profile is True:
+        enable_profiling(seqbox_db.db.engine)
+    try:
+        with profile_stage(args.command, inhandle=getattr(args, 'readsets_inhandle', None)):
+            run_command(args)
+    finally:
+        print_profile()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,139 @@
+"""
+--profile for the seqbox command line scripts. Counts and times every SQL statement through SQLAlchemy's cursor execute
+events, and at the end of the run prints (to stderr, so it doesn't get mixed up with csv output) the wall time and
+rows per second of each stage, the number of statements of each type from each calling function, and the slowest
+statements with their EXPLAIN plans.
+
+enable_profiling(db.engine)
+with profile_stage('samples', inhandle=args.samples_inhandle):
+    add_samples(args)
+print_profile()
+
+profile_stage does nothing unless profiling has been enabled, so it can be left in the normal code path.
+"""
+import os
+import sys
+import time
+import heapq
+import itertools
+import contextlib
+from sqlalchemy import event
+from seqbox_utils import iter_csv_as_dict
+
+scripts_directory = os.path.dirname(os.path.abspath(__file__))
+explainable_statements = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'}
+# the slowest statements are cut off after this many characters, the plan is usually more use than the whole thing
+max_statement_length = 2000
+
+profile = {'enabled': False, 'explaining': False, 'stage': None, 'stages': {}, 'statements': {},
+           'slowest': [], 'num_slowest': 10, 'counter': itertools.count()}
+
+
+def enable_profiling(*engines):
+    profile['enabled'] = True
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+def get_calling_function():
+    # the innermost get_* function in src/scripts the statement came from, or if there isn't one, the innermost
+    # function in src/scripts, e.g. add_readset for a flush.
+    frame = sys._getframe(2)
+    caller = None
+    while frame is not None:
+        if os.path.dirname(os.path.abspath(frame.f_code.co_filename)) == scripts_directory \
+                and frame.f_code.co_filename != __file__:
+            if frame.f_code.co_name.startswith('get_'):
+                return frame.f_code.co_name
+            if caller is None:
+                caller = frame.f_code.co_name
+        frame = frame.f_back
+    return caller or '(none)'
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if profile['explaining'] is False:
+        conn.info.setdefault('profile_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if profile['explaining'] is True:
+        return
+    seconds = time.perf_counter() - conn.info['profile_start'].pop()
+    statement_type = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else '(empty)'
+    key = (profile['stage'], statement_type, get_calling_function())
+    count, total_seconds = profile['statements'].get(key, (0, 0.0))
+    profile['statements'][key] = (count + 1, total_seconds + seconds)
+    # a min heap of the slowest statements so far, with a counter so that ties don't compare the statements
+    slow_statement = (seconds, next(profile['counter']), statement, parameters, executemany, conn.engine)
+    if len(profile['slowest']) < profile['num_slowest']:
+        heapq.heappush(profile['slowest'], slow_statement)
+    elif seconds > profile['slowest'][0][0]:
+        heapq.heapreplace(profile['slowest'], slow_statement)
+
+
+@contextlib.contextmanager
+def profile_stage(name, inhandle=None):
+    # times everything in the with block as the stage name, and attributes its statements to it. if inhandle is
+    # given, the rows in it are counted for the rows per second.
+    if profile['enabled'] is False:
+        yield
+        return
+    num_rows = sum(1 for _ in iter_csv_as_dict(inhandle)) if inhandle is not None else None
+    previous_stage = profile['stage']
+    profile['stage'] = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds, total_rows = profile['stages'].get(name, (0.0, None))
+        if num_rows is not None:
+            total_rows = (total_rows or 0) + num_rows
+        profile['stages'][name] = (seconds + time.perf_counter() - start, total_rows)
+        profile['stage'] = previous_stage
+
+
+def explain(engine, statement, parameters, executemany):
+    # the query plan, as text. the explain is run on its own connection, so it can't see e.g. temp tables.
+    if executemany:
+        parameters = parameters[0]
+    explain_prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    profile['explaining'] = True
+    try:
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(explain_prefix + statement, parameters).fetchall()
+    except Exception as e:
+        return f"(couldn't explain: {str(e).splitlines()[0]})"
+    finally:
+        profile['explaining'] = False
+    if engine.dialect.name == 'sqlite':
+        # id, parent, notused, detail
+        return '\n'.join(str(row[-1]) for row in rows)
+    return '\n'.join(str(row[0]) for row in rows)
+
+
+def print_profile(outhandle=sys.stderr):
+    if profile['enabled'] is False:
+        return
+    print('\n==== profile ====', file=outhandle)
+    print(f"{'stage':<35}{'seconds':>10}{'rows':>10}{'rows/s':>12}{'statements':>12}", file=outhandle)
+    for name, (seconds, num_rows) in profile['stages'].items():
+        num_statements = sum(count for (stage, _, _), (count, _) in profile['statements'].items() if stage == name)
+        rows_per_second = f"{num_rows / seconds:.1f}" if num_rows and seconds > 0 else ''
+        print(f"{name:<35}{seconds:>10.2f}{'' if num_rows is None else num_rows:>10}{rows_per_second:>12}"
+              f"{num_statements:>12}", file=outhandle)
+    print(f"\n{'stage':<35}{'type':<10}{'function':<50}{'count':>8}{'seconds':>10}", file=outhandle)
+    for (stage, statement_type, function), (count, seconds) in sorted(profile['statements'].items(),
+                                                                      key=lambda x: -x[1][1]):
+        print(f"{stage or '(no stage)':<35}{statement_type:<10}{function:<50}{count:>8}{seconds:>10.3f}",
+              file=outhandle)
+    print(f"\nslowest {len(profile['slowest'])} statements", file=outhandle)
+    for seconds, _, statement, parameters, executemany, engine in sorted(profile['slowest'], reverse=True):
+        statement_text = statement.strip()
+        if len(statement_text) > max_statement_length:
+            statement_text = statement_text[:max_statement_length] + ' ...'
+        print(f"\n-- {seconds:.4f}s{' (executemany)' if executemany else ''}\n{statement_text}\n-- parameters: "
+              f"{parameters[:3] if executemany else parameters}", file=outhandle)
+        if statement.lstrip().split(None, 1)[0].upper() in explainable_statements:
+            print(explain(engine, statement, parameters, executemany), file=outhandle)
@@ -1,10 +1,18 @@
 import os
+import csv
+import sys
+import decimal
+import datetime
 import argparse
 import sqlalchemy
+from sqlalchemy import select, func, and_, union, text, bindparam
 from sqlalchemy.orm import sessionmaker
+from seqbox_db import db
+from seqbox_profile import enable_profiling, profile_stage, print_profile
 from app.models import Sample, Project, SampleSource, ReadSet, ReadSetIllumina, ReadSetNanopore, RawSequencingBatch,\
     Extraction, RawSequencing, RawSequencingNanopore, RawSequencingIllumina, TilingPcr, Groups, CovidConfirmatoryPcr, \
-    ReadSetBatch, PcrResult, PcrAssay, ArticCovidResult, PangolinResult
+    ReadSetBatch, PcrResult, PcrAssay, ArticCovidResult, PangolinResult, CovidSampleStatus, sample_source_project, \
+    CurrentPangolinResult, ReadsetSummary
 
 
 def get_nanopore_fastq_path(args, Session, data_dir):
@@ -64,10 +72,517 @@ def get_sample_barcode_batch(args, Session):
 
 
 
+# the columns of the covid todo list, in output order
+covid_todo_list_columns = ['sample_identifier', 'day_received', 'month_received', 'year_received', 'qech_pcr_result',
+                           'original_ct', 'project_name', 'extraction_identifier', 'date_extracted',
+                           'covid_confirmatory_pcr_identifier', 'date_covid_confirmatory_pcred',
+                           'covid_confirmatory_pcr_ct', 'tiling_pcr_identifier', 'date_tiling_pcred',
+                           'raw_sequencing_batch_name', 'readset_identifier']
+
+
+def rank_latest(partition_by, *order_by):
+    # 1 for the latest row of each partition_by, so that one row per sample/extraction can be picked with a window
+    # function rather than joining all of them and getting a row for every combination.
+    return func.row_number().over(partition_by=partition_by,
+                                  order_by=[x.desc().nulls_last() for x in order_by]).label('rank')
+
+
+def get_covid_todo_list_query(sample_ids=None):
+    '''
+    One row per positive SARS-CoV-2 sample and project, with the latest positive pcr result of the sample, its latest
+    extraction, the latest confirmatory pcr and tiling pcr of that extraction, and the latest sequencing (raw
+    sequencing batch and readset) of that tiling pcr, so a sample that has been tiling pcr'd again but not sequenced
+    yet shows up as not sequenced. sample_ids (a list or a select of sample ids) limits it to those samples. The columns are sample_id,
+    project_id, then covid_todo_list_columns.
+    '''
+    positive_pcr = select(PcrResult.sample_id, PcrResult.pcr_result, PcrResult.ct,
+                          rank_latest(PcrResult.sample_id, PcrResult.date_pcred, PcrResult.id))\
+        .where(PcrResult.pcr_result.like('Positive%'))
+    extraction = select(Extraction.id, Extraction.sample_id, Extraction.extraction_identifier, Extraction.date_extracted,
+                        rank_latest(Extraction.sample_id, Extraction.date_extracted, Extraction.id))
+    confirmatory_pcr = select(CovidConfirmatoryPcr.extraction_id, CovidConfirmatoryPcr.pcr_identifier,
+                              CovidConfirmatoryPcr.date_pcred, CovidConfirmatoryPcr.ct,
+                              rank_latest(CovidConfirmatoryPcr.extraction_id, CovidConfirmatoryPcr.date_pcred,
+                                          CovidConfirmatoryPcr.id))
+    tiling_pcr = select(TilingPcr.id, TilingPcr.extraction_id, TilingPcr.pcr_identifier, TilingPcr.date_pcred,
+                        rank_latest(TilingPcr.extraction_id, TilingPcr.date_pcred, TilingPcr.id))
+    sequencing = select(RawSequencing.tiling_pcr_id, RawSequencingBatch.name, ReadSet.readset_identifier,
+                        rank_latest(RawSequencing.tiling_pcr_id, RawSequencing.id, ReadSet.id))\
+        .select_from(RawSequencing)\
+        .outerjoin(RawSequencingBatch, RawSequencing.raw_sequencing_batch_id == RawSequencingBatch.id)\
+        .outerjoin(ReadSet, ReadSet.raw_sequencing_id == RawSequencing.id)
+    if sample_ids is not None:
+        # only rank the rows of these samples
+        extraction_ids = select(Extraction.id).where(Extraction.sample_id.in_(sample_ids))
+        positive_pcr = positive_pcr.where(PcrResult.sample_id.in_(sample_ids))
+        extraction = extraction.where(Extraction.sample_id.in_(sample_ids))
+        confirmatory_pcr = confirmatory_pcr.where(CovidConfirmatoryPcr.extraction_id.in_(extraction_ids))
+        tiling_pcr = tiling_pcr.where(TilingPcr.extraction_id.in_(extraction_ids))
+        sequencing = sequencing.where(RawSequencing.extraction_id.in_(extraction_ids))
+    positive_pcr = positive_pcr.subquery()
+    extraction = extraction.subquery()
+    confirmatory_pcr = confirmatory_pcr.subquery()
+    tiling_pcr = tiling_pcr.subquery()
+    sequencing = sequencing.subquery()
+    query = select(Sample.id.label('sample_id'), Project.id.label('project_id'), Sample.sample_identifier,
+                   Sample.day_received, Sample.month_received, Sample.year_received,
+                   positive_pcr.c.pcr_result.label('qech_pcr_result'), positive_pcr.c.ct.label('original_ct'),
+                   Project.project_name, extraction.c.extraction_identifier, extraction.c.date_extracted,
+                   confirmatory_pcr.c.pcr_identifier.label('covid_confirmatory_pcr_identifier'),
+                   confirmatory_pcr.c.date_pcred.label('date_covid_confirmatory_pcred'),
+                   confirmatory_pcr.c.ct.label('covid_confirmatory_pcr_ct'),
+                   tiling_pcr.c.pcr_identifier.label('tiling_pcr_identifier'),
+                   tiling_pcr.c.date_pcred.label('date_tiling_pcred'),
+                   sequencing.c.name.label('raw_sequencing_batch_name'), sequencing.c.readset_identifier)\
+        .select_from(Sample)\
+        .join(positive_pcr, and_(positive_pcr.c.sample_id == Sample.id, positive_pcr.c.rank == 1))\
+        .outerjoin(sample_source_project, sample_source_project.c.sample_source_id == Sample.sample_source_id)\
+        .outerjoin(Project, Project.id == sample_source_project.c.project_id)\
+        .outerjoin(extraction, and_(extraction.c.sample_id == Sample.id, extraction.c.rank == 1))\
+        .outerjoin(confirmatory_pcr, and_(confirmatory_pcr.c.extraction_id == extraction.c.id,
+                                          confirmatory_pcr.c.rank == 1))\
+        .outerjoin(tiling_pcr, and_(tiling_pcr.c.extraction_id == extraction.c.id, tiling_pcr.c.rank == 1))\
+        .outerjoin(sequencing, and_(sequencing.c.tiling_pcr_id == tiling_pcr.c.id, sequencing.c.rank == 1))\
+        .where(Sample.species == 'SARS-CoV-2')
+    if sample_ids is not None:
+        query = query.where(Sample.id.in_(sample_ids))
+    return query
+
+
+def filter_covid_todo_list(columns, date_from, date_to, projects):
+    # the todo list from either the live query or the covid_sample_status table (columns is the .c of either), most
+    # recently received first. date_from and date_to are datetimes (inclusive) for the date received, projects a list
+    # of project names, any of them can be None.
+    query = select(*[columns[x] for x in covid_todo_list_columns])
+    date_received = columns.year_received * 10000 + columns.month_received * 100 + columns.day_received
+    if date_from is not None:
+        query = query.where(date_received >= date_from.year * 10000 + date_from.month * 100 + date_from.day)
+    if date_to is not None:
+        query = query.where(date_received <= date_to.year * 10000 + date_to.month * 100 + date_to.day)
+    if projects is not None:
+        query = query.where(columns.project_name.in_(projects))
+    return query.order_by(columns.year_received.desc(), columns.month_received.desc(), columns.day_received.desc(),
+                          columns.sample_identifier, columns.project_name)
+
+
+# the tables whose new rows can change covid_sample_status or readset_summary
+watched_models = [Sample, PcrResult, Extraction, CovidConfirmatoryPcr, TilingPcr, ReadSet, ArticCovidResult,
+                  PangolinResult]
+
+
+def get_max_ids():
+    # table name -> the highest id in it, for each of watched_models, in one query. take this before an ingest, then
+    # every row with a higher id afterwards was added by the ingest. ids rather than date_added, because not every
+    # table has date_added and the --copy paths don't fill it in.
+    max_ids = select(*[select(func.coalesce(func.max(model.id), 0)).scalar_subquery() for model in watched_models])
+    return dict(zip([model.__tablename__ for model in watched_models], db.session.execute(max_ids).one()))
+
+
+def get_samples_changed_since(max_ids, relinked_sample_source_ids=()):
+    # select of the samples which have had anything on the covid todo list added since get_max_ids() returned max_ids,
+    # i.e. the ones whose covid_sample_status rows need refreshing. relinked_sample_source_ids are the existing sample
+    # sources which have been added to another project since then, which doesn't give any new ids, so the caller has
+    # to keep track of them.
+    return union(select(Sample.id).where(Sample.id > max_ids['sample']),
+                 select(PcrResult.sample_id).where(PcrResult.id > max_ids['pcr_result']),
+                 select(Extraction.sample_id).where(Extraction.id > max_ids['extraction']),
+                 select(Extraction.sample_id).join(CovidConfirmatoryPcr)
+                 .where(CovidConfirmatoryPcr.id > max_ids['covid_confirmatory_pcr']),
+                 select(Extraction.sample_id).join(TilingPcr).where(TilingPcr.id > max_ids['tiling_pcr']),
+                 select(Extraction.sample_id).join(RawSequencing).join(ReadSet).where(ReadSet.id > max_ids['read_set']),
+                 select(Sample.id).where(Sample.sample_source_id.in_(list(relinked_sample_source_ids))))
+
+
+def get_readsets_changed_since(max_ids, relinked_sample_source_ids=()):
+    # select of the readsets which have had anything in readset_summary added since get_max_ids() returned max_ids,
+    # or whose sample source is in relinked_sample_source_ids (see get_samples_changed_since)
+    readsets_of_extractions = select(ReadSet.id).join(RawSequencing)
+    return union(select(ReadSet.id).where(ReadSet.id > max_ids['read_set']),
+                 readsets_of_extractions.join(Extraction).where(Extraction.sample_id.in_(
+                     select(PcrResult.sample_id).where(PcrResult.id > max_ids['pcr_result']))),
+                 readsets_of_extractions.where(RawSequencing.extraction_id.in_(
+                     select(CovidConfirmatoryPcr.extraction_id)
+                     .where(CovidConfirmatoryPcr.id > max_ids['covid_confirmatory_pcr']))),
+                 readsets_of_extractions.where(RawSequencing.tiling_pcr_id > max_ids['tiling_pcr']),
+                 select(ArticCovidResult.readset_id).where(ArticCovidResult.id > max_ids['artic_covid_result']),
+                 select(ArticCovidResult.readset_id).join(PangolinResult)
+                 .where(PangolinResult.id > max_ids['pangolin_result']),
+                 readsets_of_extractions.join(Extraction).join(Sample)
+                 .where(Sample.sample_source_id.in_(list(relinked_sample_source_ids))))
+
+
+def refresh_derived_table(model, key, query, ids=None):
+    # deletes the rows of model whose key is in ids (a list or a select), or all of them if ids is None, and inserts
+    # the rows of query in their place. the query's column labels are model's column names. doesn't commit.
+    table = model.__table__
+    delete = table.delete()
+    if ids is not None:
+        delete = delete.where(table.c[key].in_(ids))
+    db.session.execute(delete)
+    db.session.execute(table.insert().from_select([x.name for x in query.selected_columns], query))
+
+
+def refresh_covid_sample_status(sample_ids=None):
+    # rebuilds the covid_sample_status rows of sample_ids, or of every sample if it's None
+    refresh_derived_table(CovidSampleStatus, 'sample_id', get_covid_todo_list_query(sample_ids), sample_ids)
+
+
+def aggregate_names(column):
+    # the values of column in each group, comma separated
+    if db.engine.dialect.name == 'postgresql':
+        return func.string_agg(column, ', ')
+    return func.group_concat(column, ', ')
+
+
+def get_readset_summary_query(readset_ids=None):
+    '''
+    The readset_summary rows - one per readset (or per readset in readset_ids, a list or a select of readset ids). The
+    pcr result is the latest of the sample, the confirmatory pcr the latest of the extraction, and the artic result
+    the latest of the readset, with its current pangolin result.
+    '''
+    projects = select(sample_source_project.c.sample_source_id,
+                      aggregate_names(Project.project_name).label('project_names'),
+                      func.max(Groups.group_name).label('group_name'))\
+        .select_from(sample_source_project)\
+        .join(Project, Project.id == sample_source_project.c.project_id)\
+        .outerjoin(Groups, Groups.id == Project.groups_id)\
+        .group_by(sample_source_project.c.sample_source_id)
+    pcr = select(PcrResult.sample_id, PcrResult.pcr_result, PcrResult.ct,
+                 rank_latest(PcrResult.sample_id, PcrResult.date_pcred, PcrResult.id))
+    confirmatory_pcr = select(CovidConfirmatoryPcr.extraction_id, CovidConfirmatoryPcr.ct,
+                              CovidConfirmatoryPcr.date_pcred,
+                              rank_latest(CovidConfirmatoryPcr.extraction_id, CovidConfirmatoryPcr.date_pcred,
+                                          CovidConfirmatoryPcr.id))
+    artic = select(ArticCovidResult.readset_id, ArticCovidResult.pct_covered_bases, ArticCovidResult.pct_N_bases,
+                   ArticCovidResult.workflow, ArticCovidResult.profile, PangolinResult.lineage,
+                   PangolinResult.scorpio_call, PangolinResult.pangolin_version,
+                   rank_latest(ArticCovidResult.readset_id, ArticCovidResult.id))\
+        .select_from(ArticCovidResult)\
+        .outerjoin(CurrentPangolinResult, CurrentPangolinResult.artic_covid_result_id == ArticCovidResult.id)\
+        .outerjoin(PangolinResult, PangolinResult.id == CurrentPangolinResult.pangolin_result_id)
+    if readset_ids is not None:
+        # only rank the rows of these readsets
+        sample_ids = select(Extraction.sample_id).join(RawSequencing).join(ReadSet).where(ReadSet.id.in_(readset_ids))
+        extraction_ids = select(RawSequencing.extraction_id).join(ReadSet).where(ReadSet.id.in_(readset_ids))
+        pcr = pcr.where(PcrResult.sample_id.in_(sample_ids))
+        confirmatory_pcr = confirmatory_pcr.where(CovidConfirmatoryPcr.extraction_id.in_(extraction_ids))
+        artic = artic.where(ArticCovidResult.readset_id.in_(readset_ids))
+    projects = projects.subquery()
+    pcr = pcr.subquery()
+    confirmatory_pcr = confirmatory_pcr.subquery()
+    artic = artic.subquery()
+    query = select(ReadSet.id.label('readset_id'), ReadSet.readset_identifier,
+                   ReadSetBatch.name.label('readset_batch_name'), ReadSet.data_storage_device, ReadSetNanopore.barcode,
+                   RawSequencingBatch.name.label('raw_sequencing_batch_name'), RawSequencingBatch.sequencing_type,
+                   RawSequencingBatch.date_run, TilingPcr.pcr_identifier.label('tiling_pcr_identifier'),
+                   TilingPcr.date_pcred.label('date_tiling_pcred'), TilingPcr.protocol.label('tiling_pcr_protocol'),
+                   Extraction.extraction_identifier, Extraction.date_extracted, Sample.id.label('sample_id'),
+                   Sample.sample_identifier, Sample.species, Sample.day_received, Sample.month_received,
+                   Sample.year_received, SampleSource.sample_source_identifier, projects.c.project_names,
+                   projects.c.group_name, pcr.c.pcr_result, pcr.c.ct.label('pcr_ct'),
+                   confirmatory_pcr.c.ct.label('covid_confirmatory_pcr_ct'),
+                   confirmatory_pcr.c.date_pcred.label('date_covid_confirmatory_pcred'), artic.c.pct_covered_bases,
+                   artic.c.pct_N_bases, artic.c.workflow.label('artic_workflow'),
+                   artic.c.profile.label('artic_profile'), artic.c.lineage, artic.c.scorpio_call,
+                   artic.c.pangolin_version)\
+        .select_from(ReadSet)\
+        .outerjoin(ReadSetBatch, ReadSetBatch.id == ReadSet.readset_batch_id)\
+        .outerjoin(ReadSetNanopore, ReadSetNanopore.readset_id == ReadSet.id)\
+        .outerjoin(RawSequencing, RawSequencing.id == ReadSet.raw_sequencing_id)\
+        .outerjoin(RawSequencingBatch, RawSequencingBatch.id == RawSequencing.raw_sequencing_batch_id)\
+        .outerjoin(TilingPcr, TilingPcr.id == RawSequencing.tiling_pcr_id)\
+        .outerjoin(Extraction, Extraction.id == RawSequencing.extraction_id)\
+        .outerjoin(Sample, Sample.id == Extraction.sample_id)\
+        .outerjoin(SampleSource, SampleSource.id == Sample.sample_source_id)\
+        .outerjoin(projects, projects.c.sample_source_id == SampleSource.id)\
+        .outerjoin(pcr, and_(pcr.c.sample_id == Sample.id, pcr.c.rank == 1))\
+        .outerjoin(confirmatory_pcr, and_(confirmatory_pcr.c.extraction_id == Extraction.id,
+                                          confirmatory_pcr.c.rank == 1))\
+        .outerjoin(artic, and_(artic.c.readset_id == ReadSet.id, artic.c.rank == 1))
+    if readset_ids is not None:
+        query = query.where(ReadSet.id.in_(readset_ids))
+    return query
+
+
+def refresh_readset_summary(readset_ids=None):
+    # rebuilds the readset_summary rows of readset_ids, or of every readset if it's None
+    refresh_derived_table(ReadsetSummary, 'readset_id', get_readset_summary_query(readset_ids), readset_ids)
+
+
+def execute_streaming(query, parameters=None, rows_at_a_time=1000):
+    # on postgres this uses a server side cursor, so only rows_at_a_time rows are held in memory however big the
+    # result is.
+    return db.session.connection().execution_options(stream_results=True, max_row_buffer=rows_at_a_time)\
+        .execute(query, parameters or {})
+
+
+def iterate_rows(result, rows_at_a_time=1000):
+    for rows in result.partitions(rows_at_a_time):
+        yield from rows
+
+
+def stream_rows(query, rows_at_a_time=1000):
+    return iterate_rows(execute_streaming(query, rows_at_a_time=rows_at_a_time), rows_at_a_time)
+
+
+def format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, decimal.Decimal):
+        # e.g. 15.4 rather than 15.4000000000
+        return format(value.normalize(), 'f')
+    return value
+
+
+def write_rows(rows, columns, output_format, outhandle):
+    # writes the header and then the rows as they come, to outhandle or stdout
+    fo = sys.stdout if outhandle is None else open(outhandle, 'w', newline='')
+    try:
+        writer = csv.writer(fo, delimiter='\t' if output_format == 'tsv' else ',', lineterminator='\n')
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([format_value(x) for x in row])
+        fo.flush()
+    except BrokenPipeError:
+        # e.g. piped into head, which has stopped reading. point stdout at devnull, otherwise python prints another
+        # traceback when it flushes stdout on the way out.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if outhandle is not None:
+            fo.close()
+
+
+def parse_date_argument(date, flag):
+    if date is None:
+        return None
+    try:
+        return datetime.datetime.strptime(date, '%d/%m/%Y')
+    except ValueError:
+        print(f"{flag} should be a date in dd/mm/yyyy format, not {date}. Exiting.")
+        sys.exit(1)
+
+
+# the reports run by `seqbox_queries.py report <name>`. each is a parameterised statement, mostly on readset_summary,
+# with the parameters it takes and their defaults, which can be overridden with -P name=value. list parameters are
+# bound as arrays, so the batch exclusions, projects etc. are never pasted into the sql.
+project_filter = '''exists (select 1 from sample project_sample
+        join sample_source_project ssp on project_sample.sample_source_id = ssp.sample_source_id
+        join project p on ssp.project_id = p.id
+        where project_sample.id = {sample_id} and p.project_name in :projects)'''
+
+received_filter = '''(:received_from is null or {table}.year_received * 10000 + {table}.month_received * 100
+         + {table}.day_received >= :received_from)
+    and (:received_to is null or {table}.year_received * 10000 + {table}.month_received * 100
+         + {table}.day_received <= :received_to)'''
+
+# the highest coverage readset of each sample, leaving out excluded batches, negative controls, other tiling
+# protocols and other projects - what the AAP reports and the GISAID upload count as sequenced.
+best_readset_per_sample = f'''select * from (
+    select rs.*, row_number() over (partition by rs.sample_identifier
+                                    order by rs.pct_covered_bases desc nulls last, rs.readset_id desc) as sample_rank
+    from readset_summary rs
+    where rs.raw_sequencing_batch_name not in :exclude_batches
+    and (rs.tiling_pcr_protocol in :protocols or rs.tiling_pcr_protocol is null)
+    and rs.sample_identifier not in :exclude_samples
+    and {project_filter.format(sample_id='rs.sample_id')}
+    and {received_filter.format(table='rs')}
+    and (:min_coverage is null or rs.pct_covered_bases > :min_coverage)) as ranked
+where sample_rank = 1'''
+
+aap_parameters = {'projects': ['ISARIC', 'COCOA', 'COCOSU', 'MARVELS'],
+                  'protocols': ['ARTIC v3', 'UNZA Sanger', 'UNZA'],
+                  'exclude_batches': ['20210623_1513_MN33881_FAO36636_d6fbf869',
+                                      '20210628_1538_MN33881_FAO36636_219737d0',
+                                      '20210818_1510_MN34547_FAQ69577_004054cc'],
+                  'exclude_samples': ['Neg ex', 'Neg_ex', 'Neg_extract'],
+                  'received_from': None, 'received_to': None, 'min_coverage': None}
+
+# the AAP lineage and pcr result counts only go back to june 2021, when the AAP reporting started, and COCOSU samples
+# only count from the 4th of august 2021, when that study joined.
+aap_received_from = 20210601
+cocosu_received_from = 20210804
+
+reports = {
+    'aap_sequenced': {
+        'description': 'AAP report, the distinct samples sequenced, with the highest coverage readset of each.',
+        'sql': f'''select readset_identifier, sample_identifier, sample_source_identifier, pcr_ct as original_ct,
+    covid_confirmatory_pcr_ct as confirmatory_ct, pct_covered_bases, project_names, barcode,
+    raw_sequencing_batch_name, tiling_pcr_protocol as protocol, lineage, scorpio_call, year_received, month_received,
+    day_received
+from ({best_readset_per_sample}) as sequenced
+order by sample_identifier''',
+        'parameters': aap_parameters},
+    'aap_lineages': {
+        'description': 'AAP report, the number of sequenced samples of each lineage.',
+        'sql': f'''select lineage, count(*) as num_samples
+from ({best_readset_per_sample}) as sequenced
+where pct_covered_bases is not null
+group by lineage
+order by num_samples desc, lineage''',
+        'parameters': dict(aap_parameters, projects=['ISARIC', 'COCOA'], received_from=aap_received_from)},
+    'aap_pcr_results': {
+        'description': 'AAP report, the number of samples received with each pcr result (latest result of each '
+                       'sample).',
+        'sql': f'''select pcr_result, count(*) as num_samples from (
+    select case when pr.pcr_result like 'Positive%' then 'Positive'
+                when pr.pcr_result like 'Negative%' then 'Negative'
+                else pr.pcr_result end as pcr_result,
+           row_number() over (partition by s.sample_identifier
+                              order by pr.date_pcred desc nulls last, pr.id desc) as sample_rank
+    from sample s
+    join pcr_result pr on s.id = pr.sample_id
+    where pr.pcr_result != 'Not Done'
+    and exists (select 1 from sample_source_project ssp
+        join project p on ssp.project_id = p.id
+        where ssp.sample_source_id = s.sample_source_id and p.project_name in :projects
+        and (p.project_name != 'COCOSU' or :cocosu_received_from is null
+             or s.year_received * 10000 + s.month_received * 100 + s.day_received >= :cocosu_received_from))
+    and {received_filter.format(table='s')}) as received
+where sample_rank = 1
+group by pcr_result
+order by pcr_result''',
+        'parameters': {'projects': ['ISARIC', 'COCOA', 'COCOSU'], 'received_from': aap_received_from,
+                       'received_to': None, 'cocosu_received_from': cocosu_received_from}},
+    'routine_run': {
+        'description': 'Routine run report, everything about every readset in a readset batch.',
+        'sql': '''select project_names, sample_source_identifier, sample_identifier,
+    covid_confirmatory_pcr_ct as confirmatory_pcr_ct, readset_identifier, barcode, readset_batch_name as batch_name,
+    pct_covered_bases, lineage, scorpio_call
+from readset_summary
+where readset_batch_name = :readset_batch_name
+order by barcode, readset_id''',
+        'parameters': {'readset_batch_name': None},
+        'required': ['readset_batch_name']},
+    'gisaid_filenames': {
+        'description': 'The consensus genome of the highest coverage readset of each sample, relative to the '
+                       'seqbox directory, for GISAID upload.',
+        'sql': f'''select coalesce(group_name, '') || '/' || readset_identifier || '-' || sample_identifier
+    || '/artic_pipeline/' || readset_identifier || '-' || sample_identifier || '.artic.consensus.fasta' as filename
+from (select group_name, coalesce(cast(readset_identifier as varchar), '') as readset_identifier, sample_identifier
+      from ({best_readset_per_sample}) as best) as sequenced
+order by sample_identifier''',
+        'parameters': dict(aap_parameters, min_coverage=70)}}
+
+# how to read each report parameter from -P name=value
+report_parameter_types = {'projects': 'list', 'protocols': 'list', 'exclude_batches': 'list', 'exclude_samples': 'list',
+                          'received_from': 'date', 'received_to': 'date', 'cocosu_received_from': 'date',
+                          'min_coverage': 'number',
+                          'readset_batch_name': 'text'}
+
+
+def compile_report(report_name):
+    # the report's sql as a statement with its list parameters bound as arrays
+    report = reports[report_name]
+    return text(report['sql']).bindparams(*[bindparam(x, expanding=True) for x in report['parameters']
+                                            if report_parameter_types[x] == 'list'])
+
+
+def parse_report_parameter(name, value):
+    parameter_type = report_parameter_types[name]
+    if parameter_type == 'list':
+        return [x.strip() for x in value.split(',') if x.strip() != '']
+    if parameter_type == 'date':
+        date = parse_date_argument(value, name)
+        return date.year * 10000 + date.month * 100 + date.day
+    if parameter_type == 'number':
+        try:
+            return float(value)
+        except ValueError:
+            print(f"{name} should be a number, not {value}. Exiting.")
+            sys.exit(1)
+    return value
+
+
+def get_report_parameters(report_name, parameter_arguments):
+    # the report's default parameters, overridden by the name=value strings in parameter_arguments
+    report = reports[report_name]
+    parameters = dict(report['parameters'])
+    for parameter_argument in parameter_arguments:
+        name, _, value = parameter_argument.partition('=')
+        if name not in parameters:
+            print(f"The {report_name} report doesn't take a {name} parameter, it takes {', '.join(parameters)}. "
+                  f"Exiting.")
+            sys.exit(1)
+        parameters[name] = parse_report_parameter(name, value)
+    for name in report.get('required', []):
+        if parameters[name] is None:
+            print(f"The {report_name} report needs -P {name}=... Exiting.")
+            sys.exit(1)
+    return parameters
+
+
+def list_reports():
+    for report_name, report in reports.items():
+        print(f"{report_name} - {report['description']}")
+        for name, default in report['parameters'].items():
+            if isinstance(default, list):
+                default = ','.join(default)
+            elif report_parameter_types[name] == 'date' and default is not None:
+                default = f'{default % 100:02}/{default // 100 % 100:02}/{default // 10000}'
+            print(f"    {name} ({report_parameter_types[name]}), default {default}")
+
+
+def run_report(args):
+    if args.report_name is None:
+        list_reports()
+        return
+    if args.report_name not in reports:
+        print(f"There is no {args.report_name} report, the reports are {', '.join(reports)}. Exiting.")
+        sys.exit(1)
+    parameters = get_report_parameters(args.report_name, args.parameters)
+    result = execute_streaming(compile_report(args.report_name), parameters)
+    write_rows(iterate_rows(result), list(result.keys()), args.output_format, args.outhandle)
+
+
+def get_covid_todo_list(args):
+    date_from = parse_date_argument(args.date_from, '--from')
+    date_to = parse_date_argument(args.date_to, '--to')
+    if args.cached is True:
+        columns = CovidSampleStatus.__table__.c
+    else:
+        columns = get_covid_todo_list_query().subquery().c
+    query = filter_covid_todo_list(columns, date_from, date_to, args.projects)
+    write_rows(stream_rows(query), covid_todo_list_columns, args.output_format, args.outhandle)
+
+
+def get_readset_summary(args):
+    table = ReadsetSummary.__table__
+    query = select(table)
+    if args.readset_batch_name is not None:
+        query = query.where(table.c.readset_batch_name == args.readset_batch_name)
+    if args.sample_identifier is not None:
+        query = query.where(table.c.sample_identifier == args.sample_identifier)
+    write_rows(stream_rows(query.order_by(table.c.readset_id)), [x.name for x in table.columns], args.output_format,
+               args.outhandle)
+
+
 def run_command(args):
+    # these use the seqbox_db session, so nothing is echoed into their output
+    if args.command == 'get_covid_todo_list':
+        get_covid_todo_list(args)
+        return
+    if args.command == 'refresh_covid_sample_status':
+        refresh_covid_sample_status()
+        db.session.commit()
+        return
+    if args.command == 'get_readset_summary':
+        get_readset_summary(args)
+        return
+    if args.command == 'report':
+        run_report(args)
+        return
+    if args.command == 'refresh_readset_summary':
+        refresh_readset_summary()
+        db.session.commit()
+        return
     SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
     # from here https://stackoverflow.com/questions/43459182/proper-sqlalchemy-use-in-flask
-    engine = sqlalchemy.create_engine(SQLALCHEMY_DATABASE_URI, echo=True)
+    engine = sqlalchemy.create_engine(SQLALCHEMY_DATABASE_URI, echo=not args.profile)
+    if args.profile is True:
+        enable_profiling(engine)
     Session = sessionmaker(bind=engine)
     if args.command == 'get_nanopore_fastq_path':
         data_dir = {'mlw-gpu1': '/home/phil/data/seqbox'}
@@ -79,13 +594,66 @@ def run_command(args):
 
 def main():
     parser = argparse.ArgumentParser(prog='seqbox_queries')
+    parser.add_argument('--profile', dest='profile', action='store_true', default=False,
+                        help='At the end, print (to stderr) the time taken, the number of SQL statements by type and '
+                             'by the function that made them, and the slowest statements with their query plans. '
+                             'Turns off the SQL echo of get_nanopore_fastq_path and get_sample_barcode_batch.')
     subparsers = parser.add_subparsers(title='[sub-commands]', dest='command')
     parser_get_nanopore_fastq_path = subparsers.add_parser('get_nanopore_fastq_path',
                                                                 help='get_nanopore_fastq_path')
     parser_get_sample_barcode_batch = subparsers.add_parser('get_sample_barcode_batch',
                                                            help='get_sample_barcode_batch')
+    parser_get_covid_todo_list = subparsers.add_parser('get_covid_todo_list',
+                                                       help='Every positive SARS-CoV-2 sample, with its latest '
+                                                            'extraction, confirmatory pcr, tiling pcr and sequencing.')
+    parser_get_covid_todo_list.add_argument('--from', dest='date_from', default=None,
+                                            help='Only samples received on or after this date, dd/mm/yyyy.')
+    parser_get_covid_todo_list.add_argument('--to', dest='date_to', default=None,
+                                            help='Only samples received on or before this date, dd/mm/yyyy.')
+    parser_get_covid_todo_list.add_argument('-p', dest='projects', action='append', default=None,
+                                            help='Only samples from this project. Can be given more than once.')
+    parser_get_covid_todo_list.add_argument('-f', dest='output_format', choices=['csv', 'tsv'], default='csv',
+                                            help='Output format, default csv.')
+    parser_get_covid_todo_list.add_argument('-o', dest='outhandle', default=None,
+                                            help='File to write the todo list to. Default stdout.')
+    parser_get_covid_todo_list.add_argument('--cached', dest='cached', action='store_true', default=False,
+                                            help='Read the todo list from the covid_sample_status table, which '
+                                                 'seqbox_cmd.py keeps up to date, rather than working it out.')
+    parser_refresh_covid_sample_status = subparsers.add_parser('refresh_covid_sample_status',
+                                                               help='Rebuild the whole covid_sample_status table, '
+                                                                    'e.g. after changing data by hand.')
+    parser_get_readset_summary = subparsers.add_parser('get_readset_summary',
+                                                       help='Write out the readset_summary table, one line per '
+                                                            'readset.')
+    parser_get_readset_summary.add_argument('-b', dest='readset_batch_name', default=None,
+                                            help='Only the readsets from this readset batch.')
+    parser_get_readset_summary.add_argument('-s', dest='sample_identifier', default=None,
+                                            help='Only the readsets of this sample.')
+    parser_get_readset_summary.add_argument('-f', dest='output_format', choices=['csv', 'tsv'], default='csv',
+                                            help='Output format, default csv.')
+    parser_get_readset_summary.add_argument('-o', dest='outhandle', default=None,
+                                            help='File to write the summary to. Default stdout.')
+    parser_refresh_readset_summary = subparsers.add_parser('refresh_readset_summary',
+                                                           help='Rebuild the whole readset_summary table, e.g. after '
+                                                                'changing data by hand.')
+    parser_report = subparsers.add_parser('report', help='Run one of the standard reports. Leave out the name to '
+                                                         'list the reports and their parameters.')
+    parser_report.add_argument('report_name', nargs='?', default=None, help='Which report to run.')
+    parser_report.add_argument('-P', dest='parameters', action='append', default=[],
+                               help='Override one of the report parameters, e.g. -P projects=ISARIC,COCOA or '
+                                    '-P received_from=01/06/2021. Can be given more than once.')
+    parser_report.add_argument('-f', dest='output_format', choices=['csv', 'tsv'], default='csv',
+                               help='Output format, default csv.')
+    parser_report.add_argument('-o', dest='outhandle', default=None,
+                               help='File to write the report to. Default stdout.')
     args = parser.parse_args()
-    run_command(args)
+    if args.profile is True:
+        enable_profiling(db.engine)
+    try:
+        with profile_stage(args.command):
+            run_command(args)
+    finally:
+        print_profile()
 
 
 if __name__ == '__main__':
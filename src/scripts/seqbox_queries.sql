@@ -1,3 +1,6 @@
+-- the AAP, routine run and GISAID filename queries below are also in seqbox_queries.py as parameterised reports,
+-- `python seqbox_queries.py report` lists them. Edit the parameters there rather than copying these.
+
 -- get covid todo list - returning duplicates where there are multiple tiling PCRs
 
 select sample.sample_identifier, sample.day_received, sample.month_received, sample.year_received, pr.pcr_result as qech_pcr_result, pr.ct as original_ct, project_name, e.extraction_identifier, DATE(e.date_extracted) as date_extracted, ccp.pcr_identifier, DATE(ccp.date_pcred) as date_covid_confirmatory_pcred,
@@ -18,24 +21,26 @@ where species = 'SARS-CoV-2'
   and (project_name = any(array['ISARIC', 'COCOA', 'COCOSU', 'MARVELS']))
 order by sample.year_received desc, sample.month_received desc, sample.day_received desc;
 
--- get pangolin results for plotting
--- needs to be changed to handle multiple pangolin results
--- select readset_identifier, sample_identifier, lineage, day_received, month_received, year_received from pangolin_result
--- join artic_covid_result acr on pangolin_result.artic_covid_result_id = acr.id
--- join read_set rs on rs.id = acr.readset_id
--- join raw_sequencing r on rs.raw_sequencing_id = r.id
--- join extraction e on r.extraction_id = e.id
--- join sample s on e.sample_id = s.id
--- where lineage != 'None';
-
--- get artic qc and pangolin results
--- needs to be changed to handle multiple pangolin results
--- select readset_identifier, sample_identifier, pct_covered_bases, lineage, day_received, month_received, year_received from pangolin_result
--- join artic_covid_result acr on pangolin_result.artic_covid_result_id = acr.id
--- join read_set rs on rs.id = acr.readset_id
--- join raw_sequencing r on rs.raw_sequencing_id = r.id
--- join extraction e on r.extraction_id = e.id
--- join sample s on e.sample_id = s.id;
+-- get pangolin results for plotting, the current pangolin result of each artic result
+
+select readset_identifier, sample_identifier, lineage, day_received, month_received, year_received from current_pangolin_result cpr
+join pangolin_result on cpr.pangolin_result_id = pangolin_result.id
+join artic_covid_result acr on cpr.artic_covid_result_id = acr.id
+join read_set rs on rs.id = acr.readset_id
+join raw_sequencing r on rs.raw_sequencing_id = r.id
+join extraction e on r.extraction_id = e.id
+join sample s on e.sample_id = s.id
+where lineage != 'None';
+
+-- get artic qc and pangolin results, the current pangolin result of each artic result
+
+select readset_identifier, sample_identifier, pct_covered_bases, lineage, day_received, month_received, year_received from current_pangolin_result cpr
+join pangolin_result on cpr.pangolin_result_id = pangolin_result.id
+join artic_covid_result acr on cpr.artic_covid_result_id = acr.id
+join read_set rs on rs.id = acr.readset_id
+join raw_sequencing r on rs.raw_sequencing_id = r.id
+join extraction e on r.extraction_id = e.id
+join sample s on e.sample_id = s.id;
 
 -- get readset batch, readset id, sample id
 
@@ -92,8 +97,8 @@ left join read_set_nanopore rsn on read_set.id = rsn.readset_id
 left join read_set_batch rsb on read_set.readset_batch_id = rsb.id
 left join raw_sequencing rs on read_set.raw_sequencing_id = rs.id
 left join artic_covid_result on read_set.id = artic_covid_result.readset_id
-left join pangolin_result on artic_covid_result.id = pangolin_result.artic_covid_result_id
-            and pangolin_result.pangolearn_version = (select max(pangolearn_version) from pangolin_result where artic_covid_result.id = pangolin_result.artic_covid_result_id)
+left join current_pangolin_result cpr on artic_covid_result.id = cpr.artic_covid_result_id
+left join pangolin_result on cpr.pangolin_result_id = pangolin_result.id
 left join extraction e on rs.extraction_id = e.id
 left join covid_confirmatory_pcr on e.id = covid_confirmatory_pcr.extraction_id
 left join sample s on e.sample_id = s.id
@@ -102,6 +107,11 @@ left join sample_source_project ssp on ss.id = ssp.sample_source_id
 left join project p on ssp.project_id = p.id
 where name = '20211221_1403_MN34547_FAQ92318_c38ea5f7';
 
+-- all info on a run for routine report, from readset_summary (one row per readset, no joins)
+
+select project_names, sample_source_identifier, sample_identifier, covid_confirmatory_pcr_ct, readset_identifier, barcode, readset_batch_name, pct_covered_bases, lineage, scorpio_call from readset_summary
+where readset_batch_name = '20211221_1403_MN34547_FAQ92318_c38ea5f7';
+
 -- AAP report, distinct samples sequenced, which arent super script, aren't on duplicated runs, etc.
 -- add in/remove the pct_covered_bases for the proportion >90
 -- add in/remove the lineage section as required
@@ -113,8 +123,8 @@ select distinct on(sample_identifier) readset_identifier, sample_identifier, sam
         left join read_set_nanopore on read_set.id = read_set_nanopore.readset_id
         left join artic_covid_result on read_set.id = artic_covid_result.readset_id
         left join raw_sequencing rs on read_set.raw_sequencing_id = rs.id
-        left join pangolin_result on artic_covid_result.id = pangolin_result.artic_covid_result_id
-            and pangolin_result.pangolearn_version = (select max(pangolearn_version) from pangolin_result where artic_covid_result.id = pangolin_result.artic_covid_result_id)
+        left join current_pangolin_result cpr on artic_covid_result.id = cpr.artic_covid_result_id
+        left join pangolin_result on cpr.pangolin_result_id = pangolin_result.id
         left join tiling_pcr on rs.tiling_pcr_id = tiling_pcr.id
         left join raw_sequencing_batch rsb on rs.raw_sequencing_batch_id = rsb.id
         left join extraction e on rs.extraction_id = e.id
@@ -175,8 +185,8 @@ select distinct on (sample_identifier) lineage
 from read_set
 left join read_set_nanopore on read_set.id = read_set_nanopore.readset_id
 left join artic_covid_result on read_set.id = artic_covid_result.readset_id
-left join pangolin_result on artic_covid_result.id = pangolin_result.artic_covid_result_id
-            and pangolin_result.pangolearn_version = (select max(pangolearn_version) from pangolin_result where artic_covid_result.id = pangolin_result.artic_covid_result_id)
+left join current_pangolin_result cpr on artic_covid_result.id = cpr.artic_covid_result_id
+left join pangolin_result on cpr.pangolin_result_id = pangolin_result.id
 left join raw_sequencing rs on read_set.raw_sequencing_id = rs.id
 left join tiling_pcr tp on rs.tiling_pcr_id = tp.id
 left join extraction e on rs.extraction_id = e.id
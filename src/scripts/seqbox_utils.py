@@ -1,41 +1,517 @@
+import io
 import os
 import csv
 import sys
-import glob
+import decimal
 import datetime
-from app import db
+import functools
+import contextlib
+from sqlalchemy import text, func, select, values, column, literal, union_all, and_, String, Integer, DateTime
+from sqlalchemy.orm import joinedload
+from seqbox_db import db
 from app.models import Sample, Project, SampleSource, ReadSet, ReadSetIllumina, ReadSetNanopore, RawSequencingBatch,\
     Extraction, RawSequencing, RawSequencingNanopore, RawSequencingIllumina, TilingPcr, Groups, CovidConfirmatoryPcr, \
-    ReadSetBatch, PcrResult, PcrAssay, ArticCovidResult, PangolinResult
-
-
-def read_in_as_dict(inhandle):
-    # since csv.DictReader returns a generator rather than an iterator, need to do this fancy business to
-    # pull in everything from a generator into an honest to goodness iterable.
-    info = csv.DictReader(open(inhandle, encoding='utf-8-sig'))
-    # info is a list of ordered dicts, so convert each one to
-    list_of_lines = []
-    for each_dict in info:
-        # print(each_dict)
-        # delete data from columns with no header, usually just empty fields
-        if None in each_dict:
-            del each_dict[None]
-        new_info = {x: each_dict[x] for x in each_dict}
-        # print(new_info)
-        # sometimes excel saves blank lines, so only take lines where the lenght of the set of teh values is > 1
-        # it will be 1 where they are all blank i.e. ''
-        if len(set(new_info.values())) > 1:
-            list_of_lines.append(new_info)
-        # because pcr assay only has one value, need to add this check
-        elif len(set(new_info.values())) == 1:
-            if list(set(new_info.values()))[0] == '':
-                pass
-            else:
-                list_of_lines.append(new_info)
+    ReadSetBatch, PcrResult, PcrAssay, ArticCovidResult, PangolinResult, CurrentPangolinResult, sample_source_project
+
+# the add_* functions call commit_row() rather than committing directly, so that how often we commit is configurable.
+# 'file' - flush every `every` rows and commit once at the end of the file (the default).
+# 'batch' - commit every `every` rows.
+# 'row' - commit after every row.
+permitted_commit_modes = {'file', 'batch', 'row'}
+commit_policy = {'mode': 'file', 'every': 1000, 'rows_since_flush': 0}
+
+
+def set_commit_policy(mode, every):
+    if mode not in permitted_commit_modes:
+        print(f"Commit mode {mode} is not in {permitted_commit_modes}. Exiting.")
+        sys.exit(1)
+    if every < 1:
+        print(f"Need to commit every 1 or more rows, not {every}. Exiting.")
+        sys.exit(1)
+    commit_policy['mode'] = mode
+    commit_policy['every'] = every
+    commit_policy['rows_since_flush'] = 0
+
+
+def commit_row():
+    commit_policy['rows_since_flush'] += 1
+    if commit_policy['mode'] == 'row':
+        db.session.commit()
+        commit_policy['rows_since_flush'] = 0
+    elif commit_policy['rows_since_flush'] >= commit_policy['every']:
+        if commit_policy['mode'] == 'batch':
+            db.session.commit()
+        else:
+            db.session.flush()
+        commit_policy['rows_since_flush'] = 0
+
+
+@contextlib.contextmanager
+def file_transaction():
+    # wrap the processing of an input file in this, so that whatever hasn't been committed yet gets rolled back if
+    # anything goes wrong (including all the sys.exit(1)s) and gets committed if everything goes ok.
+    try:
+        yield
+    except BaseException:
+        db.session.rollback()
+        if commit_policy['mode'] == 'file':
+            print("Rolled back, nothing from this input file has been added to the database.")
         else:
-            pass
-            # print(f'This line not being processed - {new_info}')
-    return list_of_lines
+            print("Rolled back the rows since the last commit.")
+        raise
+    db.session.commit()
+    commit_policy['rows_since_flush'] = 0
+
+
+# in-process cache of the small, nearly static tables, keyed on their natural keys. each value is a list of the
+# matching rows, so that the get_* functions can still spot duplicates. a table is only cached once
+# warm_lookup_cache() has been called, before that (e.g. in seqbox_filehandling) the get_* functions query the db.
+lookup_cache = {'groups': None, 'projects': None, 'pcr_assays': None, 'readset_batches': None,
+                'raw_sequencing_batches': None, 'readsets': None, 'raw_sequencings': None}
+
+
+def warm_lookup_cache():
+    # one query per table.
+    lookup_cache['groups'] = {}
+    for group in Groups.query.all():
+        lookup_cache['groups'].setdefault((group.group_name, group.institution), []).append(group)
+    lookup_cache['projects'] = {}
+    for project in Project.query.options(joinedload(Project.groups)).all():
+        # a project without a group can never be matched by query_projects, so don't need to cache it.
+        if project.groups is None:
+            continue
+        key = (project.project_name, project.groups.group_name, project.groups.institution)
+        lookup_cache['projects'].setdefault(key, []).append(project)
+    lookup_cache['pcr_assays'] = {}
+    for pcr_assay in PcrAssay.query.all():
+        lookup_cache['pcr_assays'].setdefault(pcr_assay.assay_name, []).append(pcr_assay)
+    lookup_cache['readset_batches'] = {}
+    for readset_batch in ReadSetBatch.query.all():
+        lookup_cache['readset_batches'].setdefault(readset_batch.name, []).append(readset_batch)
+    lookup_cache['raw_sequencing_batches'] = {}
+    for raw_sequencing_batch in RawSequencingBatch.query.all():
+        lookup_cache['raw_sequencing_batches'].setdefault(raw_sequencing_batch.name, []).append(raw_sequencing_batch)
+
+
+def cached_lookup(table, key, run_query):
+    # run_query is only called if this table isn't cached
+    if lookup_cache[table] is None:
+        return run_query()
+    return lookup_cache[table].get(key, [])
+
+
+def add_to_lookup_cache(table, key, entity):
+    if lookup_cache[table] is not None:
+        lookup_cache[table].setdefault(key, []).append(entity)
+
+
+# index of the nanopore default run directories, (batch directory, 'fastq_pass' or 'fast5_pass') -> {barcode -> file
+# names in that barcode's directory}. each one is built the first time it's needed, with one os.scandir of the
+# subdirectory and of each barcode directory in it, and then kept for the rest of the run. this replaces a glob per
+# readset, which is slow on network filesystems when there are a lot of barcodes and fast5s.
+batch_directory_index = {}
+
+
+def index_batch_subdirectory(batch_directory, subdirectory):
+    index = {}
+    try:
+        barcode_entries = os.scandir(os.path.join(batch_directory, subdirectory))
+    except FileNotFoundError:
+        return index
+    with barcode_entries:
+        for barcode_entry in barcode_entries:
+            if barcode_entry.is_dir():
+                with os.scandir(barcode_entry.path) as file_entries:
+                    index[barcode_entry.name] = [x.name for x in file_entries]
+    return index
+
+
+def get_batch_directory_files(batch_directory, subdirectory, barcode, suffix):
+    # same result as glob.glob(os.path.join(batch_directory, subdirectory, barcode, f'*{suffix}')), from the index.
+    key = (batch_directory, subdirectory)
+    if key not in batch_directory_index:
+        batch_directory_index[key] = index_batch_subdirectory(batch_directory, subdirectory)
+    return [os.path.join(batch_directory, subdirectory, barcode, x) for x in batch_directory_index[key].get(barcode, [])
+            if x.endswith(suffix) and not x.startswith('.')]
+
+
+@functools.lru_cache(maxsize=None)
+def parse_date(value):
+    # an input file usually only has a handful of distinct dates, so each one is only parsed once per run.
+    return datetime.datetime.strptime(value, '%d/%m/%Y')
+
+
+def parse_number(value):
+    # Decimal rather than float, because the ct/pct columns are Numeric.
+    return decimal.Decimal(value)
+
+
+def parse_integer(value):
+    return int(value)
+
+
+def parse_float(value):
+    # for the Float columns (latitude and longitude)
+    return float(value)
+
+
+# the input file columns which aren't just strings, and the function which converts each of them. anything else is
+# kept as the string from the file.
+column_converters = {'date_extracted': parse_date, 'date_tiling_pcred': parse_date,
+                     'date_covid_confirmatory_pcred': parse_date, 'date_pcred': parse_date, 'date_run': parse_date,
+                     'ct': parse_number, 'covid_confirmatory_pcr_ct': parse_number, 'pct_N_bases': parse_number,
+                     'pct_covered_bases': parse_number, 'num_aligned_reads': parse_number, 'conflict': parse_number,
+                     'ambiguity_score': parse_number, 'scorpio_support': parse_number,
+                     'scorpio_conflict': parse_number, 'latitude': parse_float, 'longitude': parse_float,
+                     'extraction_identifier': parse_integer, 'tiling_pcr_identifier': parse_integer,
+                     'covid_confirmatory_pcr_identifier': parse_integer, 'pcr_identifier': parse_integer,
+                     'number_of_cycles': parse_integer, 'day_collected': parse_integer,
+                     'month_collected': parse_integer, 'year_collected': parse_integer,
+                     'day_received': parse_integer, 'month_received': parse_integer, 'year_received': parse_integer}
+# what each converter expects, for the message when a value won't convert. the same wording as the validate_* rules.
+converter_descriptions = {parse_date: 'a date in the format dd/mm/yyyy', parse_number: 'a number',
+                          parse_float: 'a number', parse_integer: 'a whole number'}
+
+
+class ConversionError(ValueError):
+    # a value in an input file which won't convert to its column's type
+    pass
+
+
+def convert_value(column, value, converter):
+    # empty values (and the None that short lines are padded with) are None.
+    if value is None or value.strip() == '':
+        return None
+    try:
+        return converter(value.strip())
+    except (ValueError, decimal.InvalidOperation):
+        raise ConversionError(f'{column} should be {converter_descriptions[converter]}, not {value}')
+
+
+def display_value(value):
+    # a converted value the way it's written in the input files, for the messages.
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%d/%m/%Y')
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def is_empty(value):
+    # for checks which cover both string and converted columns, a converted column is None when it's empty.
+    return value is None or (isinstance(value, str) and value.strip() == '')
+
+
+def iter_csv_as_dict(inhandle):
+    # the rows of the csv as they are in the file, all strings, for validate_file. streams the csv one line at a time,
+    # so that memory doesn't grow with the size of the file.
+    with open(inhandle, encoding='utf-8-sig') as fi:
+        for each_dict in csv.DictReader(fi):
+            # delete data from columns with no header, usually just empty fields
+            if None in each_dict:
+                del each_dict[None]
+            # sometimes excel saves blank lines, so only take lines where at least one of the values isn't blank.
+            # (short lines are padded with None, which counts as not blank, same as before)
+            if any(x != '' for x in each_dict.values()):
+                yield each_dict
+
+
+class InputRecord:
+    # one row of an input file, in __slots__ rather than a dict, because results files can be hundreds of thousands of
+    # rows (and with --copy are held in memory all at once). a subclass for each kind of input file lists the columns
+    # it keeps (the rest of the row is dropped) and adds properties for the derived fields, which are worked out from
+    # the columns when they're asked for rather than stored. the column_converters columns are converted once, when
+    # the row is read in, and are None if they're empty. the other columns are interned strings, because most of them
+    # (group name, lineage, version, status etc.) only have a few distinct values in a file, so each record can share
+    # them. file_info is a dict of the fields which are the same for the whole file (e.g. the readset batch name from
+    # the command line), shared by all the records from the file, and takes precedence over a derived field of the
+    # same name. record[field], field in record and record.get(field) work as they would for a dict of the row, so the
+    # get_*/read_in_* functions also take a plain dict (e.g. from a benchmark), as long as its values are converted.
+    # fields is the frozenset of the fields a record has (see get_fields), also shared by all the records from the file.
+    columns = ()
+    derived = ()
+    __slots__ = ('file_info', 'fields')
+
+    def __init__(self, row, positions, file_info, fields):
+        # row is a list from the csv reader, positions is (column, index in row, converter or None) for each of
+        # columns in the file.
+        for column, i, converter in positions:
+            # short lines are padded with None, same as the csv DictReader
+            value = row[i] if i < len(row) else None
+            if converter is not None:
+                value = convert_value(column, value, converter)
+            elif value is not None:
+                value = sys.intern(value)
+            setattr(self, column, value)
+        self.file_info = file_info
+        self.fields = fields
+
+    @classmethod
+    def get_fields(cls, file_columns, file_info):
+        # the fields of the records from a file with file_columns (the ones in columns which are in the header) and
+        # file_info, worked out once per file.
+        return frozenset(file_columns).union(cls.derived, file_info)
+
+    def keys(self):
+        return [c for c in self.columns if c in self.fields] + [d for d in self.derived if d not in self.file_info] \
+            + list(self.file_info)
+
+    def __contains__(self, field):
+        return field in self.fields
+
+    def __getitem__(self, field):
+        if field in self.file_info:
+            return self.file_info[field]
+        if field in self.fields:
+            try:
+                return getattr(self, field)
+            except AttributeError:
+                pass
+        raise KeyError(field)
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        # the same as the row would have been as a dict of the strings in the file, for the error messages
+        return repr({field: display_value(self[field]) for field in self.keys()})
+
+
+class GroupRecord(InputRecord):
+    columns = ('group_name', 'institution', 'pi')
+    __slots__ = columns
+
+
+class ProjectRecord(InputRecord):
+    columns = ('project_name', 'group_name', 'institution', 'project_details')
+    __slots__ = columns
+
+
+class PcrAssayRecord(InputRecord):
+    columns = ('assay_name',)
+    __slots__ = columns
+
+
+class SampleSourceRecord(InputRecord):
+    columns = ('sample_source_identifier', 'sample_source_type', 'township', 'city', 'country', 'latitude',
+               'longitude', 'projects', 'group_name', 'institution')
+    __slots__ = columns
+
+
+class SampleRecord(InputRecord):
+    columns = ('sample_source_identifier', 'sample_identifier', 'species', 'sample_type', 'day_collected',
+               'month_collected', 'year_collected', 'day_received', 'month_received', 'year_received', 'group_name',
+               'institution')
+    __slots__ = columns
+
+
+class PcrResultRecord(InputRecord):
+    columns = ('sample_identifier', 'date_pcred', 'pcr_identifier', 'group_name', 'assay_name', 'pcr_result', 'ct')
+    __slots__ = columns
+
+
+class ExtractionRecord(InputRecord):
+    columns = ('sample_identifier', 'extraction_identifier', 'extraction_machine', 'extraction_kit',
+               'what_was_extracted', 'date_extracted', 'extraction_processing_institution', 'group_name',
+               'extraction_from')
+    __slots__ = columns
+
+
+class TilingPcrRecord(InputRecord):
+    columns = ('sample_identifier', 'date_extracted', 'extraction_identifier', 'date_tiling_pcred',
+               'tiling_pcr_identifier', 'group_name', 'tiling_pcr_protocol', 'number_of_cycles')
+    __slots__ = columns
+
+
+class CovidConfirmatoryPcrRecord(InputRecord):
+    columns = ('sample_identifier', 'date_extracted', 'extraction_identifier', 'date_covid_confirmatory_pcred',
+               'covid_confirmatory_pcr_identifier', 'group_name', 'covid_confirmatory_pcr_protocol',
+               'covid_confirmatory_pcr_ct')
+    __slots__ = columns
+
+
+class RawSequencingBatchRecord(InputRecord):
+    columns = ('batch_directory', 'batch_name', 'date_run', 'sequencing_type', 'instrument_model', 'instrument_name',
+               'library_prep_method', 'sequencing_centre', 'flowcell_type')
+    __slots__ = columns
+
+
+class ReadsetBatchRecord(InputRecord):
+    columns = ('raw_sequencing_batch_name', 'readset_batch_name', 'readset_batch_dir', 'basecaller')
+    __slots__ = columns
+
+
+class ReadsetRecord(InputRecord):
+    # the tiling pcr columns are used for covid readsets, the extraction ones for the rest. which of the path columns
+    # are used depends on the sequencing type and whether it's a nanopore default batch.
+    columns = ('sample_identifier', 'group_name', 'readset_batch_name', 'data_storage_device', 'date_tiling_pcred',
+               'tiling_pcr_identifier', 'date_extracted', 'extraction_identifier', 'barcode', 'path_fastq',
+               'path_fast5', 'path_r1', 'path_r2')
+    __slots__ = columns
+
+
+class ArticCovidResultRecord(InputRecord):
+    # file_info has readset_batch_name, artic_workflow and artic_profile
+    columns = ('sample_name', 'pct_N_bases', 'pct_covered_bases', 'num_aligned_reads')
+    derived = ('barcode',)
+    __slots__ = columns
+
+    @property
+    def barcode(self):
+        return self.sample_name.split('_')[-1]
+
+
+class PangolinResultRecord(InputRecord):
+    # file_info has artic_workflow and artic_profile, and readset_batch_name unless it comes from the taxon (nanopore
+    # default batches).
+    columns = ('taxon', 'lineage', 'conflict', 'ambiguity_score', 'scorpio_call', 'scorpio_support', 'scorpio_conflict',
+               'version', 'pangolin_version', 'pangoLEARN_version', 'pango_version', 'status', 'qc_status', 'note')
+    derived = ('readset_batch_name', 'barcode')
+    __slots__ = columns
+
+    def __init__(self, row, positions, file_info, fields):
+        super().__init__(row, positions, file_info, fields)
+        # the name of the output column changed from status to qc_status 2022-07-04
+        if not hasattr(self, 'status') and hasattr(self, 'qc_status'):
+            self.status = self.qc_status
+
+    @classmethod
+    def get_fields(cls, file_columns, file_info):
+        fields = super().get_fields(file_columns, file_info)
+        if 'qc_status' in fields:
+            return fields | {'status'}
+        return fields
+
+    @property
+    def readset_batch_name(self):
+        return self.taxon.split('/')[0].split('_barcode')[0]
+
+    @property
+    def barcode(self):
+        return self.taxon.split('/')[0].split('_')[-1]
+
+
+def iter_csv_as_records(inhandle, record_class, file_info=None):
+    # yields a record_class record for each row of the csv, made straight from the csv reader's lists, so there's
+    # never a dict per row. streams the csv one line at a time, so that memory doesn't grow with the size of the file
+    # (e.g. big pangolin and artic results files). a value which won't convert stops the whole run, with the row and
+    # column, before anything from that row has gone to the database.
+    file_info = {} if file_info is None else file_info
+    with open(inhandle, encoding='utf-8-sig') as fi:
+        reader = csv.reader(fi)
+        header = next(reader, [])
+        positions = [(column, header.index(column), column_converters.get(column))
+                     for column in record_class.columns if column in header]
+        fields = record_class.get_fields([column for column, _, _ in positions], file_info)
+        row_number = 0
+        for row in reader:
+            # skip blank lines, same as iter_csv_as_dict (fields with no header don't count, short lines do)
+            if row and (len(row) < len(header) or any(x != '' for x in row[:len(header)])):
+                # numbered the same way as validate_file's messages
+                row_number += 1
+                try:
+                    record = record_class(row, positions, file_info, fields)
+                except ConversionError as error:
+                    print(f"{inhandle} row {row_number}: {error}. Exiting.")
+                    sys.exit(1)
+                yield record
+
+
+def read_in_as_records(inhandle, record_class):
+    # for when need the whole file in memory at once, e.g. to go through it more than once.
+    return list(iter_csv_as_records(inhandle, record_class))
+
+
+# the rules that a validation schema is made of. each one takes a value from the input file and returns what's wrong
+# with it, or None if it's fine. apart from validate_not_empty, an empty value is fine.
+def validate_not_empty(value):
+    if value.strip() == '':
+        return 'should not be empty'
+
+
+def validate_date(value):
+    if value.strip() == '':
+        return None
+    try:
+        parse_date(value)
+    except ValueError:
+        return f'should be a date in the format dd/mm/yyyy, not {value}'
+
+
+def validate_number(value):
+    if value.strip() == '':
+        return None
+    try:
+        float(value)
+    except ValueError:
+        return f'should be a number, not {value}'
+
+
+def validate_integer(value):
+    if value.strip() == '':
+        return None
+    try:
+        int(value)
+    except ValueError:
+        return f'should be a whole number, not {value}'
+
+
+def validate_name(value):
+    if ' ' in value or '/' in value:
+        return f'should not have any spaces or slashes in it, {value} does'
+
+
+def make_validate_one_of(allowed):
+    def validate_one_of(value):
+        if value not in allowed:
+            return f'should be one of {sorted(allowed)}, not {value}'
+    return validate_one_of
+
+
+def compile_schema(schema):
+    # turns a validation schema (a dictionary of rule name -> columns, see get_validation_schema in seqbox_cmd.py)
+    # into the list of (column, rule function) checks that validate_file runs on each row, so that working out which
+    # rules apply to which columns is only done once per file rather than once per row.
+    checks = [(c, validate_not_empty) for c in schema.get('required', [])]
+    checks += [(c, validate_name) for c in schema.get('names', [])]
+    checks += [(c, validate_date) for c in schema.get('dates', [])]
+    checks += [(c, validate_number) for c in schema.get('numbers', [])]
+    checks += [(c, validate_integer) for c in schema.get('integers', [])]
+    checks += [(c, make_validate_one_of(allowed)) for c, allowed in schema.get('one_of', {}).items()]
+    columns = set(schema.get('skip_if_empty', [])) | set(schema.get('optional', [])) | {c for c, _ in checks}
+    return {'columns': columns, 'skip_if_empty': schema.get('skip_if_empty', []), 'checks': checks,
+            'row_checks': schema.get('row_checks', [])}
+
+
+def validate_file(inhandle, compiled_schema):
+    # checks every row of inhandle against compiled_schema, without touching the database, and returns a list of all
+    # the problems found. rows where one of the skip_if_empty columns is empty are skipped, because the add_*
+    # function would skip them too (e.g. the tiling pcr part of a combined input file for a sample whose confirmatory
+    # pcr was negative).
+    errors = []
+    missing_columns = set()
+    for row_number, row_info in enumerate(iter_csv_as_dict(inhandle), start=1):
+        if row_number == 1:
+            missing_columns = compiled_schema['columns'] - set(row_info)
+            for column in sorted(missing_columns):
+                errors.append(f'{column} column is missing.')
+        if any((row_info.get(c) or '').strip() == '' for c in compiled_schema['skip_if_empty']):
+            continue
+        for column, rule in compiled_schema['checks']:
+            if column in missing_columns:
+                continue
+            # short lines are padded with None by the csv reader
+            error = rule(row_info[column] or '')
+            if error is not None:
+                errors.append(f'row {row_number}: {column} {error}.')
+        for row_check in compiled_schema['row_checks']:
+            error = row_check(row_info)
+            if error is not None:
+                errors.append(f'row {row_number}: {error}.')
+    return errors
 
 
 def check_sample_source_associated_with_project(sample_source, sample_source_info):
@@ -43,6 +519,8 @@ def check_sample_source_associated_with_project(sample_source, sample_source_inf
     #  relationship between an existing sample source and project
     # sample_source_info is a line from the input csv
     # sample_source is the corresponding entry from the DB
+    # returns the sample source's id if it was added to any projects, otherwise None, so that the caller can refresh
+    # the derived tables of its samples and readsets.
     # get the projects from the input file as set
     projects_from_input_file = sample_source_info['projects'].split(';')
     projects_from_input_file = set([x.strip() for x in projects_from_input_file])
@@ -69,7 +547,10 @@ def check_sample_source_associated_with_project(sample_source, sample_source_inf
                       f"add_projects function.\nExiting now.")
                 sys.exit(1)
     # and update the database.
-    db.session.commit()
+    commit_row()
+    if len(new_projects_from_file) > 0:
+        return sample_source.id
+    return None
 
 
 def get_sample_source(sample_info):
@@ -110,8 +591,7 @@ def get_sample(readset_info):
 
 def get_extraction(readset_info):
     matching_extraction = Extraction.query.filter_by(extraction_identifier=readset_info['extraction_identifier'],
-                                                     date_extracted=datetime.datetime.strptime(
-                                                         readset_info['date_extracted'], '%d/%m/%Y')) \
+                                                     date_extracted=readset_info['date_extracted']) \
         .join(Sample).filter_by(sample_identifier=readset_info['sample_identifier'])\
         .join(SampleSource)\
         .join(SampleSource.projects) \
@@ -138,7 +618,8 @@ def add_project(project_info):
     project = Project(project_name=project_info['project_name'], project_details=project_info['project_details'])
     group.projects.append(project)
     db.session.add(project)
-    db.session.commit()
+    add_to_lookup_cache('projects', (project.project_name, group.group_name, group.institution), project)
+    commit_row()
     print(f"Added project {project_info['project_name']} to group {project_info['group_name']} at "
           f"{project_info['institution']}.")
 
@@ -152,13 +633,16 @@ def add_readset_batch(readset_batch_info):
         sys.exit(1)
     readset_batch = read_in_readset_batch(readset_batch_info)
     raw_sequencing_batch.readset_batches.append(readset_batch)
-    db.session.commit()
+    add_to_lookup_cache('readset_batches', readset_batch.name, readset_batch)
+    commit_row()
     print(f"Added readset batch {readset_batch_info['raw_sequencing_batch_name']}.")
 
 
 def query_projects(info, project_name):
-    matching_projects = Project.query.filter_by(project_name=project_name).join(Groups)\
-        .filter_by(group_name=info['group_name'], institution=info['institution']).all()
+    matching_projects = cached_lookup(
+        'projects', (project_name, info['group_name'], info['institution']),
+        lambda: Project.query.filter_by(project_name=project_name).join(Groups)
+        .filter_by(group_name=info['group_name'], institution=info['institution']).all())
     if len(matching_projects) == 0:
         # need this to have the `,` so that can evaluate the return correctly for the elif section
         return False,
@@ -229,7 +713,7 @@ def get_pangolin_result(pangolin_result_info):
 
 
 def read_in_sample_info(sample_info):
-    check_samples(sample_info)
+    # sample_info has already been through check_samples
     sample = Sample(sample_identifier=sample_info['sample_identifier'])
     if sample_info['species'] != '':
         sample.species = sample_info['species']
@@ -237,17 +721,17 @@ def read_in_sample_info(sample_info):
         sample.sample_type = sample_info['sample_type']
     if sample_info['sample_source_identifier'] != '':
         sample.sample_source_id = sample_info['sample_source_identifier']
-    if sample_info['day_collected'] != '':
+    if sample_info['day_collected'] is not None:
         sample.day_collected = sample_info['day_collected']
-    if sample_info['month_collected'] != '':
+    if sample_info['month_collected'] is not None:
         sample.month_collected = sample_info['month_collected']
-    if sample_info['year_collected'] != '':
+    if sample_info['year_collected'] is not None:
         sample.year_collected = sample_info['year_collected']
-    if sample_info['day_received'] != '':
+    if sample_info['day_received'] is not None:
         sample.day_received = sample_info['day_received']
-    if sample_info['month_received'] != '':
+    if sample_info['month_received'] is not None:
         sample.month_received = sample_info['month_received']
-    if sample_info['year_received'] != '':
+    if sample_info['year_received'] is not None:
         sample.year_received = sample_info['year_received']
     return sample
 
@@ -263,9 +747,9 @@ def read_in_sample_source_info(sample_source_info):
         sample_source.location_second_level = sample_source_info['city']
     if sample_source_info['country'] != '':
         sample_source.country = sample_source_info['country']
-    if sample_source_info['latitude'] != '':
+    if sample_source_info['latitude'] is not None:
         sample_source.latitude = sample_source_info['latitude']
-    if sample_source_info['longitude'] != '':
+    if sample_source_info['longitude'] is not None:
         sample_source.longitude = sample_source_info['longitude']
     return sample_source
 
@@ -273,7 +757,7 @@ def read_in_sample_source_info(sample_source_info):
 def read_in_extraction(extraction_info):
     extraction = Extraction()
     check_extraction_fields(extraction_info)
-    if extraction_info['extraction_identifier'] != '':
+    if extraction_info['extraction_identifier'] is not None:
         extraction.extraction_identifier = extraction_info['extraction_identifier']
     if extraction_info['extraction_machine'] != '':
         extraction.extraction_machine = extraction_info['extraction_machine']
@@ -281,8 +765,8 @@ def read_in_extraction(extraction_info):
         extraction.extraction_kit = extraction_info['extraction_kit']
     if extraction_info['what_was_extracted'] != '':
         extraction.what_was_extracted = extraction_info['what_was_extracted']
-    if extraction_info['date_extracted'] != '':
-        extraction.date_extracted = datetime.datetime.strptime(extraction_info['date_extracted'], '%d/%m/%Y')
+    if extraction_info['date_extracted'] is not None:
+        extraction.date_extracted = extraction_info['date_extracted']
     if extraction_info['extraction_processing_institution'] != '':
         extraction.processing_institution = extraction_info['extraction_processing_institution']
     if extraction_info['extraction_from'] != '':
@@ -303,13 +787,13 @@ def read_in_tiling_pcr(tiling_pcr_info):
     # doing this earlier in the process now
     # check_tiling_pcr(tiling_pcr_info)
     tiling_pcr = TilingPcr()
-    if tiling_pcr_info['date_tiling_pcred'] != '':
-        tiling_pcr.date_pcred = datetime.datetime.strptime(tiling_pcr_info['date_tiling_pcred'], '%d/%m/%Y')
-    if tiling_pcr_info['tiling_pcr_identifier'] != '':
+    if tiling_pcr_info['date_tiling_pcred'] is not None:
+        tiling_pcr.date_pcred = tiling_pcr_info['date_tiling_pcred']
+    if tiling_pcr_info['tiling_pcr_identifier'] is not None:
         tiling_pcr.pcr_identifier = tiling_pcr_info['tiling_pcr_identifier']
     if tiling_pcr_info['tiling_pcr_protocol'] != '':
         tiling_pcr.protocol = tiling_pcr_info['tiling_pcr_protocol']
-    if tiling_pcr_info['number_of_cycles'] != '':
+    if tiling_pcr_info['number_of_cycles'] is not None:
         tiling_pcr.number_of_cycles = tiling_pcr_info['number_of_cycles']
     return tiling_pcr
 
@@ -335,13 +819,13 @@ def check_artic_covid_result(artic_covid_result_info):
     if artic_covid_result_info['sample_name'].strip() == '':
         print(f'sample_name column should not be empty. it is for \n{artic_covid_result_info}\nExiting.')
         sys.exit(1)
-    if artic_covid_result_info['pct_N_bases'].strip() == '':
+    if artic_covid_result_info['pct_N_bases'] is None:
         print(f'pct_N_bases column should not be empty. it is for \n{artic_covid_result_info}\nExiting.')
         sys.exit(1)
-    if artic_covid_result_info['pct_covered_bases'].strip() == '':
+    if artic_covid_result_info['pct_covered_bases'] is None:
         print(f'pct_covered_bases column should not be empty. it is for \n{artic_covid_result_info}\nExiting.')
         sys.exit(1)
-    if artic_covid_result_info['num_aligned_reads'].strip() == '':
+    if artic_covid_result_info['num_aligned_reads'] is None:
         print(f'num_aligned_reads column should not be empty. it is for \n{artic_covid_result_info}\nExiting.')
         sys.exit(1)
 
@@ -362,30 +846,15 @@ def read_in_pangolin_result(pangolin_result_info):
     check_pangolin_result(pangolin_result_info)
     pangolin_result = PangolinResult()
     pangolin_result.lineage = pangolin_result_info['lineage']
-    if pangolin_result_info['conflict'] == '':
-        pangolin_result.conflict = None
-    else:
-        pangolin_result.conflict = pangolin_result_info['conflict']
-
-    if pangolin_result_info['ambiguity_score'] == '':
-        pangolin_result.ambiguity_score = None
-    else:
-        pangolin_result.ambiguity_score = pangolin_result_info['ambiguity_score']
-
+    pangolin_result.conflict = pangolin_result_info['conflict']
+    pangolin_result.ambiguity_score = pangolin_result_info['ambiguity_score']
     if pangolin_result_info['scorpio_call'] == '':
         pangolin_result.scorpio_call = None
     else:
         pangolin_result.scorpio_call = pangolin_result_info['scorpio_call']
 
-    if pangolin_result_info['scorpio_support'] == '':
-        pangolin_result.scorpio_support = None
-    else:
-        pangolin_result.scorpio_support = pangolin_result_info['scorpio_support']
-
-    if pangolin_result_info['scorpio_conflict'] == '':
-        pangolin_result.scorpio_conflict = None
-    else:
-        pangolin_result.scorpio_conflict = pangolin_result_info['scorpio_conflict']
+    pangolin_result.scorpio_support = pangolin_result_info['scorpio_support']
+    pangolin_result.scorpio_conflict = pangolin_result_info['scorpio_conflict']
 
     pangolin_result.version = pangolin_result_info['version']
     pangolin_result.pangolin_version = pangolin_result_info['pangolin_version']
@@ -403,16 +872,13 @@ def read_in_pangolin_result(pangolin_result_info):
 def read_in_covid_confirmatory_pcr(covid_confirmatory_pcr_info):
     check_covid_confirmatory_pcr(covid_confirmatory_pcr_info)
     covid_confirmatory_pcr = CovidConfirmatoryPcr()
-    if covid_confirmatory_pcr_info['date_covid_confirmatory_pcred'] != '':
-        covid_confirmatory_pcr.date_pcred = datetime.datetime.strptime(covid_confirmatory_pcr_info['date_covid_confirmatory_pcred'], '%d/%m/%Y')
-    if covid_confirmatory_pcr_info['covid_confirmatory_pcr_identifier'] != '':
+    if covid_confirmatory_pcr_info['date_covid_confirmatory_pcred'] is not None:
+        covid_confirmatory_pcr.date_pcred = covid_confirmatory_pcr_info['date_covid_confirmatory_pcred']
+    if covid_confirmatory_pcr_info['covid_confirmatory_pcr_identifier'] is not None:
         covid_confirmatory_pcr.pcr_identifier = covid_confirmatory_pcr_info['covid_confirmatory_pcr_identifier']
     if covid_confirmatory_pcr_info['covid_confirmatory_pcr_protocol'] != '':
         covid_confirmatory_pcr.protocol = covid_confirmatory_pcr_info['covid_confirmatory_pcr_protocol']
-    if covid_confirmatory_pcr_info['covid_confirmatory_pcr_ct'] == '':
-        covid_confirmatory_pcr.ct = None
-    else:
-        covid_confirmatory_pcr.ct = covid_confirmatory_pcr_info['covid_confirmatory_pcr_ct']
+    covid_confirmatory_pcr.ct = covid_confirmatory_pcr_info['covid_confirmatory_pcr_ct']
     return covid_confirmatory_pcr
 
 
@@ -420,14 +886,11 @@ def read_in_pcr_result(pcr_result_info):
     if check_pcr_result(pcr_result_info) is False:
         sys.exit(1)
     pcr_result = PcrResult()
-    if pcr_result_info['date_pcred'] != '':
-        pcr_result.date_pcred = datetime.datetime.strptime(pcr_result_info['date_pcred'], '%d/%m/%Y')
-    if pcr_result_info['pcr_identifier'] != '':
+    if pcr_result_info['date_pcred'] is not None:
+        pcr_result.date_pcred = pcr_result_info['date_pcred']
+    if pcr_result_info['pcr_identifier'] is not None:
         pcr_result.pcr_identifier = pcr_result_info['pcr_identifier']
-    if pcr_result_info['ct'] == '':
-        pcr_result.ct = None
-    else:
-        pcr_result.ct = pcr_result_info['ct']
+    pcr_result.ct = pcr_result_info['ct']
     if pcr_result_info['pcr_result'] != '':
         pcr_result.pcr_result = pcr_result_info['pcr_result']
     return pcr_result
@@ -438,6 +901,7 @@ def add_sample(sample_info):
     # for the projects listed in the csv, check if they already exist for that group
     # if it does, return it, if it doesnt, instantiate a new Project and return it
     # print(sample_info)
+    check_samples(sample_info)
     sample_source = get_sample_source(sample_info)
     if sample_source is False:
         print(f"Adding sample. There is no matching sample_source with the sample_source_identifier "
@@ -448,10 +912,91 @@ def add_sample(sample_info):
     sample = read_in_sample_info(sample_info)
     sample_source.samples.append(sample)
     db.session.add(sample)
-    db.session.commit()
+    commit_row()
     print(f"Adding sample {sample_info['sample_identifier']}")
 
 
+def get_sample_sources_bulk(all_samples_info, rows_at_a_time=500):
+    # set based version of get_sample_source, for when adding a whole file of samples at once.
+    # returns a dict of (sample_source_identifier, group_name) -> sample_source id, from one query per rows_at_a_time
+    # sample source identifiers.
+    sample_source_identifiers = sorted({x['sample_source_identifier'] for x in all_samples_info})
+    group_names = {x['group_name'] for x in all_samples_info}
+    matching_sample_sources = []
+    for start in range(0, len(sample_source_identifiers), rows_at_a_time):
+        matching_sample_sources += SampleSource.query\
+            .with_entities(SampleSource.id, SampleSource.sample_source_identifier, Groups.group_name)\
+            .filter(SampleSource.sample_source_identifier.in_(
+                sample_source_identifiers[start:start + rows_at_a_time]))\
+            .join(SampleSource.projects)\
+            .join(Groups)\
+            .filter(Groups.group_name.in_(group_names))\
+            .distinct().all()
+    sample_sources = {}
+    for sample_source_id, sample_source_identifier, group_name in matching_sample_sources:
+        key = (sample_source_identifier, group_name)
+        if key in sample_sources and sample_sources[key] != sample_source_id:
+            print(f"Trying to get sample_source. "
+                  f"There is more than one matching sample_source with the sample_source_identifier "
+                  f"{sample_source_identifier} for group {group_name}, This shouldn't happen. Exiting.")
+            sys.exit(1)
+        sample_sources[key] = sample_source_id
+    return sample_sources
+
+
+def get_samples_bulk(all_samples_info, rows_at_a_time=500):
+    # set based version of get_sample, returns the set of (sample_identifier, group_name) which are already in the db.
+    # one query per rows_at_a_time sample identifiers.
+    sample_identifiers = sorted({x['sample_identifier'] for x in all_samples_info})
+    group_names = {x['group_name'] for x in all_samples_info}
+    matching_samples = []
+    for start in range(0, len(sample_identifiers), rows_at_a_time):
+        matching_samples += Sample.query.with_entities(Sample.sample_identifier, Groups.group_name)\
+            .filter(Sample.sample_identifier.in_(sample_identifiers[start:start + rows_at_a_time]))\
+            .join(SampleSource)\
+            .join(SampleSource.projects)\
+            .join(Groups)\
+            .filter(Groups.group_name.in_(group_names))\
+            .distinct().all()
+    return {(sample_identifier, group_name) for sample_identifier, group_name in matching_samples}
+
+
+def add_samples_bulk(all_samples_info):
+    # equivalent to calling get_sample then add_sample on every line of the input file, but resolves all the
+    # sample sources and existing samples up front and then inserts all the new samples at the end, in statements of
+    # --commit-every rows (one row with --commit row). like the other add_* functions, with --commit batch/row each
+    # statement is committed, otherwise file_transaction() commits the lot at the end of the file.
+    for sample_info in all_samples_info:
+        check_samples(sample_info)
+    sample_sources = get_sample_sources_bulk(all_samples_info)
+    existing_samples = get_samples_bulk(all_samples_info)
+    new_samples = []
+    for sample_info in all_samples_info:
+        sample_key = (sample_info['sample_identifier'], sample_info['group_name'])
+        if sample_key in existing_samples:
+            print(f"This sample ({sample_info['sample_identifier']}) already exists in the database for the group "
+                  f"{sample_info['group_name']}")
+            continue
+        sample_source_id = sample_sources.get((sample_info['sample_source_identifier'], sample_info['group_name']))
+        if sample_source_id is None:
+            print(f"Adding sample. There is no matching sample_source with the sample_source_identifier "
+                  f"{sample_info['sample_source_identifier']} for group {sample_info['group_name']}, please add using "
+                  f"python seqbox_cmd.py add_sample_source and then re-run this command. Exiting.")
+            sys.exit(1)
+        sample = read_in_sample_info(sample_info)
+        sample.sample_source_id = sample_source_id
+        new_samples.append(sample)
+        # so that a sample which is in the input file twice is only added once, same as the row by row version
+        existing_samples.add(sample_key)
+    rows_at_a_time = 1 if commit_policy['mode'] == 'row' else commit_policy['every']
+    for start in range(0, len(new_samples), rows_at_a_time):
+        db.session.bulk_save_objects(new_samples[start:start + rows_at_a_time])
+        if commit_policy['mode'] != 'file':
+            db.session.commit()
+    for sample in new_samples:
+        print(f"Adding sample {sample.sample_identifier}")
+
+
 def add_sample_source(sample_source_info):
     # sample_info is a dict of one line of the input csv (keys from col header)
     # for the projects listed in the csv, check if they already exist for that group
@@ -462,7 +1007,7 @@ def add_sample_source(sample_source_info):
     sample_source = read_in_sample_source_info(sample_source_info)
     sample_source.projects = projects
     db.session.add(sample_source)
-    db.session.commit()
+    commit_row()
     print(f'Adding sample_source {sample_source_info["sample_source_identifier"]} to project(s) {projects}')
 
 
@@ -470,15 +1015,17 @@ def add_tiling_pcr(tiling_pcr_info):
     extraction = get_extraction(tiling_pcr_info)
     if extraction is False:
         print(f"Adding tiling PCR. No Extraction match for {tiling_pcr_info['sample_identifier']}, extracted on "
-              f"{tiling_pcr_info['date_extracted']} for extraction id {tiling_pcr_info['extraction_identifier']} "
+              f"{display_value(tiling_pcr_info['date_extracted'])} for extraction id "
+              f"{tiling_pcr_info['extraction_identifier']} "
               f"need to add that extract and re-run. Exiting.")
         sys.exit(1)
     tiling_pcr = read_in_tiling_pcr(tiling_pcr_info)
     extraction.tiling_pcrs.append(tiling_pcr)
     db.session.add(tiling_pcr)
-    db.session.commit()
+    commit_row()
     print(f"Adding tiling PCR for sample {tiling_pcr_info['sample_identifier']} run on "
-          f"{tiling_pcr_info['date_tiling_pcred']} PCR id {tiling_pcr_info['tiling_pcr_identifier']} to the database.")
+          f"{display_value(tiling_pcr_info['date_tiling_pcred'])} PCR id {tiling_pcr_info['tiling_pcr_identifier']} to "
+          f"the database.")
 
 
 def add_covid_confirmatory_pcr(covid_confirmatory_pcr_info):
@@ -486,23 +1033,24 @@ def add_covid_confirmatory_pcr(covid_confirmatory_pcr_info):
     if extraction is False:
         print(f"Adding covid confirmatory PCR. "
               f"No Extraction match for {covid_confirmatory_pcr_info['sample_identifier']}, extracted on "
-              f"{covid_confirmatory_pcr_info['date_extracted']} for extraction id "
+              f"{display_value(covid_confirmatory_pcr_info['date_extracted'])} for extraction id "
               f"{covid_confirmatory_pcr_info['extraction_identifier']} "
               f"need to add that extract and re-run. Exiting.")
         sys.exit(1)
     covid_confirmatory_pcr = read_in_covid_confirmatory_pcr(covid_confirmatory_pcr_info)
     extraction.covid_confirmatory_pcrs.append(covid_confirmatory_pcr)
     db.session.add(covid_confirmatory_pcr)
-    db.session.commit()
+    commit_row()
     print(f"Adding confirmatory PCR for sample {covid_confirmatory_pcr_info['sample_identifier']} run on "
-          f"{covid_confirmatory_pcr_info['date_covid_confirmatory_pcred']} PCR id "
+          f"{display_value(covid_confirmatory_pcr_info['date_covid_confirmatory_pcred'])} PCR id "
           f"{covid_confirmatory_pcr_info['covid_confirmatory_pcr_identifier']} to the database.")
 
 
 def add_group(group_info):
     group = read_in_group(group_info)
     db.session.add(group)
-    db.session.commit()
+    add_to_lookup_cache('groups', (group.group_name, group.institution), group)
+    commit_row()
     print(f"Adding group {group_info['group_name']} from {group_info['institution']} to database.")
 
 
@@ -511,7 +1059,8 @@ def add_pcr_assay(pcr_assay_info):
     assert pcr_assay_info['assay_name'].strip() != ''
     pcr_assay.assay_name = pcr_assay_info['assay_name']
     db.session.add(pcr_assay)
-    db.session.commit()
+    add_to_lookup_cache('pcr_assays', pcr_assay.assay_name, pcr_assay)
+    commit_row()
     print(f"Adding pcr_assay {pcr_assay_info['assay_name']} to database.")
 
 
@@ -527,7 +1076,7 @@ def add_pcr_result(pcr_result_info):
         sys.exit(1)
     sample.pcr_results.append(pcr_result)
     db.session.add(pcr_result)
-    db.session.commit()
+    commit_row()
     print(f"Adding pcr_result for {pcr_result_info['sample_identifier']}, assay {pcr_result_info['assay_name']} to "
           f"database.")
 
@@ -542,15 +1091,16 @@ def add_extraction(extraction_info):
     extraction = read_in_extraction(extraction_info)
     sample.extractions.append(extraction)
     db.session.add(extraction)
-    db.session.commit()
-    print(f"Adding {extraction_info['sample_identifier']} extraction on {extraction_info['date_extracted']} to the DB")
+    commit_row()
+    print(f"Adding {extraction_info['sample_identifier']} extraction on "
+          f"{display_value(extraction_info['date_extracted'])} to the DB")
 
 
 def get_tiling_pcr(tiling_pcr_info):
     matching_tiling_pcr = TilingPcr.query\
         .filter_by(
             pcr_identifier=tiling_pcr_info['tiling_pcr_identifier'],
-            date_pcred=datetime.datetime.strptime(tiling_pcr_info['date_tiling_pcred'], '%d/%m/%Y'))\
+            date_pcred=tiling_pcr_info['date_tiling_pcred'])\
         .join(Extraction).join(Sample).filter_by(sample_identifier=tiling_pcr_info['sample_identifier']).all()
     if len(matching_tiling_pcr) == 1:
         return matching_tiling_pcr[0]
@@ -558,7 +1108,7 @@ def get_tiling_pcr(tiling_pcr_info):
         return False
     else:
         print(f"Getting tiling PCR. More than one match for {tiling_pcr_info['sample_identifier']} on date "
-              f"{tiling_pcr_info['date_tiling_pcred']} "
+              f"{display_value(tiling_pcr_info['date_tiling_pcred'])} "
               f"with pcr_identifier {tiling_pcr_info['tiling_pcr_identifier']}. Shouldn't happen, exiting.")
         sys.exit(1)
 
@@ -566,10 +1116,9 @@ def get_tiling_pcr(tiling_pcr_info):
 def get_covid_confirmatory_pcr(covid_confirmatory_pcr_info):
     matching_covid_confirmatory_pcr = CovidConfirmatoryPcr.query.filter_by(
         pcr_identifier=covid_confirmatory_pcr_info['covid_confirmatory_pcr_identifier'],
-        date_pcred=datetime.datetime.strptime(covid_confirmatory_pcr_info['date_covid_confirmatory_pcred'], '%d/%m/%Y'))\
+        date_pcred=covid_confirmatory_pcr_info['date_covid_confirmatory_pcred'])\
         .join(Extraction).filter_by(extraction_identifier=covid_confirmatory_pcr_info['extraction_identifier'],
-                                                     date_extracted=datetime.datetime.strptime(
-                                                         covid_confirmatory_pcr_info['date_extracted'], '%d/%m/%Y')) \
+                                                     date_extracted=covid_confirmatory_pcr_info['date_extracted']) \
         .join(Sample).filter_by(sample_identifier=covid_confirmatory_pcr_info['sample_identifier'])\
         .all()
     if len(matching_covid_confirmatory_pcr) == 0:
@@ -579,14 +1128,16 @@ def get_covid_confirmatory_pcr(covid_confirmatory_pcr_info):
     else:
         print(f"Getting covid confirmatory PCR. "
               f"More than one match for {covid_confirmatory_pcr_info['sample_identifier']} on date"
-              f" {covid_confirmatory_pcr_info['date_covid_confirmatory_pcred']} with covid_confirmatory_pcr_identifier "
+              f" {display_value(covid_confirmatory_pcr_info['date_covid_confirmatory_pcred'])} with "
+              f"covid_confirmatory_pcr_identifier "
               f"{covid_confirmatory_pcr_info['covid_confirmatory_pcr_identifier']}. Shouldn't happen, exiting.")
         sys.exit(1)
 
 
 def get_pcr_assay(pcr_assay_info):
     # matching_pcr_result = PcrResult
-    matching_pcr_assay = PcrAssay.query.filter_by(assay_name=pcr_assay_info['assay_name']).all()
+    matching_pcr_assay = cached_lookup('pcr_assays', pcr_assay_info['assay_name'],
+                                       lambda: PcrAssay.query.filter_by(assay_name=pcr_assay_info['assay_name']).all())
     if len(matching_pcr_assay) == 0:
         return False
     elif len(matching_pcr_assay) == 1:
@@ -615,13 +1166,15 @@ def get_pcr_result(pcr_result_info):
     else:
         print(f"Getting pcr result."
               f"More than one match in the db for {pcr_result_info['sample_identifier']}, running the "
-              f"{pcr_result_info['assay']} test, on {pcr_result_info['date_pcred']} "
+              f"{pcr_result_info['assay']} test, on {display_value(pcr_result_info['date_pcred'])} "
               f"Shouldn't happen, exiting.")
         sys.exit(1)
 
 
 def get_readset_batch(readset_batch_info):
-    matching_readset_batch = ReadSetBatch.query.filter_by(name=readset_batch_info['readset_batch_name']).all()
+    matching_readset_batch = cached_lookup(
+        'readset_batches', readset_batch_info['readset_batch_name'],
+        lambda: ReadSetBatch.query.filter_by(name=readset_batch_info['readset_batch_name']).all())
     if len(matching_readset_batch) == 0:
         return False
     elif len(matching_readset_batch) == 1:
@@ -634,8 +1187,10 @@ def get_readset_batch(readset_batch_info):
 
 
 def get_group(group_info):
-    matching_group = Groups.query.filter_by(group_name=group_info['group_name'], institution=group_info['institution'])\
-        .all()
+    matching_group = cached_lookup(
+        'groups', (group_info['group_name'], group_info['institution']),
+        lambda: Groups.query.filter_by(group_name=group_info['group_name'], institution=group_info['institution'])
+        .all())
     if len(matching_group) == 0:
         return False
     elif len(matching_group) == 1:
@@ -684,7 +1239,10 @@ def get_readset(readset_info, covid):
     #  (should spin out the get fastq path functionality from add readset to filesystem into sep func)
     # if it's nanopore, but not default, the fastq path will be in the readset_info.
     # then, if it's nanopore, then filter the read_set_nanopore by the fastq path.
-    if covid is False:
+    if lookup_cache['readsets'] is not None:
+        # inside readset_lookup_cache, the whole input file has already been looked up in one go
+        matching_readset = lookup_cache['readsets'].get(get_readset_key(readset_info, covid), [])
+    elif covid is False:
         matching_readset = readset_type.query.join(ReadSet)\
             .join(ReadSetBatch).filter_by(name=readset_info['readset_batch_name'])\
             .join(RawSequencing) \
@@ -717,11 +1275,103 @@ def get_readset(readset_info, covid):
         return matching_readset[0]
 
 
+def get_readset_key(readset_info, covid):
+    # what get_readset matches a readset on - the readset batch, sample, date and identifier of the tiling pcr (covid)
+    # or extraction (not covid), and group.
+    if covid is True:
+        date_done, identifier = readset_info['date_tiling_pcred'], readset_info['tiling_pcr_identifier']
+    else:
+        date_done, identifier = readset_info['date_extracted'], readset_info['extraction_identifier']
+    return (readset_info['readset_batch_name'], readset_info['sample_identifier'], date_done, identifier,
+            readset_info['group_name'])
+
+
+def input_rows_table(name, columns, rows):
+    # rows (tuples, in the same order as columns) as a table that can be joined against. on postgres this is
+    # (VALUES ...) AS name (columns), sqlite can't name the columns of a VALUES in a FROM, so there it's the same rows
+    # as a UNION ALL of SELECTs.
+    if db.engine.dialect.name == 'postgresql':
+        # a column can only belong to one table, so each one gets its own copies
+        return values(*[column(c.name, c.type) for c in columns], name=name).data(rows)
+    return union_all(*[select(*[literal(x, c.type).label(c.name) for x, c in zip(row, columns)]) for row in rows])\
+        .subquery(name)
+
+
+def get_readsets_bulk(all_readsets_info, covid, rows_at_a_time=500):
+    # the bulk version of get_readset and get_raw_sequencing. joins the keys (see get_readset_key) of all the readsets
+    # in the input file against the readset batch -> raw sequencing -> tiling pcr/extraction -> sample -> sample source
+    # -> project -> group chain, rows_at_a_time keys per statement (sqlite allows 500 SELECTs in a UNION ALL).
+    # returns {readset key: [readset_nanopore/readset_illumina]} and {raw sequencing key: [raw_sequencing]}, the
+    # raw sequencing key being the readset key with the raw sequencing batch name instead of the readset batch name.
+    keys = list(dict.fromkeys(get_readset_key(x, covid) for x in all_readsets_info))
+    key_columns = [column('readset_batch_name', String), column('sample_identifier', String),
+                   column('date_done', DateTime), column('identifier', Integer), column('group_name', String)]
+    matches = []
+    for start in range(0, len(keys), rows_at_a_time):
+        input_rows = input_rows_table('input_rows', key_columns, keys[start:start + rows_at_a_time])
+        query = select(*input_rows.c, RawSequencingBatch.name, RawSequencing.id, ReadSet.id).select_from(input_rows)\
+            .join(ReadSetBatch, ReadSetBatch.name == input_rows.c.readset_batch_name)\
+            .join(RawSequencingBatch, ReadSetBatch.raw_sequencing_batch_id == RawSequencingBatch.id)\
+            .join(RawSequencing, RawSequencing.raw_sequencing_batch_id == RawSequencingBatch.id)
+        if covid is True:
+            query = query.join(TilingPcr, and_(RawSequencing.tiling_pcr_id == TilingPcr.id,
+                                               TilingPcr.date_pcred == input_rows.c.date_done,
+                                               TilingPcr.pcr_identifier == input_rows.c.identifier))\
+                .join(Extraction, TilingPcr.extraction_id == Extraction.id)
+        else:
+            query = query.join(Extraction, and_(RawSequencing.extraction_id == Extraction.id,
+                                                Extraction.date_extracted == input_rows.c.date_done,
+                                                Extraction.extraction_identifier == input_rows.c.identifier))
+        query = query.join(Sample, and_(Extraction.sample_id == Sample.id,
+                                        Sample.sample_identifier == input_rows.c.sample_identifier))\
+            .join(SampleSource, Sample.sample_source_id == SampleSource.id)\
+            .join(sample_source_project, SampleSource.id == sample_source_project.c.sample_source_id)\
+            .join(Project, sample_source_project.c.project_id == Project.id)\
+            .join(Groups, and_(Project.groups_id == Groups.id, Groups.group_name == input_rows.c.group_name))\
+            .outerjoin(ReadSet, and_(ReadSet.raw_sequencing_id == RawSequencing.id,
+                                     ReadSet.readset_batch_id == ReadSetBatch.id))\
+            .distinct()
+        matches += db.session.execute(query).all()
+    # load the matching raw sequencings and readsets, there won't be any unless the file has been loaded before
+    raw_sequencing_ids = {x[6] for x in matches}
+    readset_ids = {x[7] for x in matches if x[7] is not None}
+    raw_sequencings = {x.id: x for x in RawSequencing.query.filter(RawSequencing.id.in_(raw_sequencing_ids)).all()} \
+        if raw_sequencing_ids else {}
+    readset_techs = {}
+    for readset_type in (ReadSetNanopore, ReadSetIllumina) if readset_ids else ():
+        for readset_tech in readset_type.query.filter(readset_type.readset_id.in_(readset_ids)).all():
+            readset_techs[readset_tech.readset_id] = readset_tech
+    readsets = {}
+    raw_sequencings_by_key = {}
+    for readset_batch_name, sample_identifier, date_done, identifier, group_name, raw_sequencing_batch_name, \
+            raw_sequencing_id, readset_id in matches:
+        raw_sequencing_key = (raw_sequencing_batch_name, sample_identifier, date_done, identifier, group_name)
+        if raw_sequencings[raw_sequencing_id] not in raw_sequencings_by_key.setdefault(raw_sequencing_key, []):
+            raw_sequencings_by_key[raw_sequencing_key].append(raw_sequencings[raw_sequencing_id])
+        if readset_id in readset_techs:
+            key = (readset_batch_name, sample_identifier, date_done, identifier, group_name)
+            readsets.setdefault(key, []).append(readset_techs[readset_id])
+    return readsets, raw_sequencings_by_key
+
+
+@contextlib.contextmanager
+def readset_lookup_cache(all_readsets_info, covid):
+    # for the length of the with block, get_readset and get_raw_sequencing look the readsets of all_readsets_info up
+    # in the results of one get_readsets_bulk, rather than each running a ten table join. the cache only covers the
+    # rows of all_readsets_info, so it's emptied at the end.
+    lookup_cache['readsets'], lookup_cache['raw_sequencings'] = get_readsets_bulk(all_readsets_info, covid)
+    try:
+        yield
+    finally:
+        lookup_cache['readsets'] = None
+        lookup_cache['raw_sequencings'] = None
+
+
 def read_in_raw_sequencing_batch_info(raw_sequencing_batch_info):
     check_raw_sequencing_batch(raw_sequencing_batch_info)
     raw_sequencing_batch = RawSequencingBatch()
     raw_sequencing_batch.name = raw_sequencing_batch_info['batch_name']
-    raw_sequencing_batch.date_run = datetime.datetime.strptime(raw_sequencing_batch_info['date_run'], '%d/%m/%Y')
+    raw_sequencing_batch.date_run = raw_sequencing_batch_info['date_run']
     raw_sequencing_batch.instrument_model = raw_sequencing_batch_info['instrument_model']
     raw_sequencing_batch.instrument_name = raw_sequencing_batch_info['instrument_name']
     raw_sequencing_batch.library_prep_method = raw_sequencing_batch_info['library_prep_method']
@@ -744,12 +1394,14 @@ def read_in_readset_batch(readset_batch_info):
 def add_raw_sequencing_batch(raw_sequencing_batch_info):
     raw_sequencing_batch = read_in_raw_sequencing_batch_info(raw_sequencing_batch_info)
     db.session.add(raw_sequencing_batch)
-    db.session.commit()
+    add_to_lookup_cache('raw_sequencing_batches', raw_sequencing_batch.name, raw_sequencing_batch)
+    commit_row()
     print(f"Added raw sequencing batch {raw_sequencing_batch_info['batch_name']} to the database.")
 
 
 def get_raw_sequencing_batch(batch_name):
-    matching_raw_seq_batch = RawSequencingBatch.query.filter_by(name=batch_name).all()
+    matching_raw_seq_batch = cached_lookup('raw_sequencing_batches', batch_name,
+                                           lambda: RawSequencingBatch.query.filter_by(name=batch_name).all())
     if len(matching_raw_seq_batch) == 1:
         return matching_raw_seq_batch[0]
     elif len(matching_raw_seq_batch) == 0:
@@ -760,12 +1412,15 @@ def get_raw_sequencing_batch(batch_name):
 
 
 def get_raw_sequencing(readset_info, raw_sequencing_batch, covid):
-    if covid is True:
+    if lookup_cache['raw_sequencings'] is not None:
+        # inside readset_lookup_cache, the whole input file has already been looked up in one go
+        matching_raw_sequencing = lookup_cache['raw_sequencings'].get(
+            (raw_sequencing_batch.name,) + get_readset_key(readset_info, covid)[1:], [])
+    elif covid is True:
         matching_raw_sequencing = RawSequencing.query \
             .join(RawSequencingBatch).filter_by(name=raw_sequencing_batch.name) \
             .join(TilingPcr).filter_by(pcr_identifier=readset_info['tiling_pcr_identifier'],
-                                       date_pcred=datetime.datetime \
-                                       .strptime(readset_info['date_tiling_pcred'], '%d/%m/%Y')) \
+                                       date_pcred=readset_info['date_tiling_pcred']) \
             .join(Extraction) \
             .join(Sample).filter_by(sample_identifier=readset_info['sample_identifier']) \
             .join(SampleSource) \
@@ -777,8 +1432,7 @@ def get_raw_sequencing(readset_info, raw_sequencing_batch, covid):
         matching_raw_sequencing = RawSequencing.query \
             .join(RawSequencingBatch).filter_by(name=raw_sequencing_batch.name)\
             .join(Extraction).filter_by(extraction_identifier=readset_info['extraction_identifier'],
-                                        date_extracted=datetime.datetime \
-                                        .strptime(readset_info['date_extracted'], '%d/%m/%Y')) \
+                                        date_extracted=readset_info['date_extracted']) \
             .join(Sample).filter_by(sample_identifier=readset_info['sample_identifier'])\
             .join(SampleSource) \
             .join(SampleSource.projects)\
@@ -814,7 +1468,7 @@ def read_in_raw_sequencing(readset_info, nanopore_default, sequencing_type, batc
         if nanopore_default is True:
             path = os.path.join(batch_directory, 'fast5_pass', readset_info['barcode'], '*fast5')
             raw_sequencing.raw_sequencing_nanopore.path_fast5 = path
-            fast5s = glob.glob(path)
+            fast5s = get_batch_directory_files(batch_directory, 'fast5_pass', readset_info['barcode'], 'fast5')
             if len(fast5s) == 0:
                 print(f'Warning - No fast5 found in {path}. Continuing, but check this.')
         elif nanopore_default is False:
@@ -832,7 +1486,7 @@ def check_raw_sequencing_batch(raw_sequencing_batch_info):
     if raw_sequencing_batch_info['batch_name'].strip() == '':
         print(f'batch_name column should not be empty. it is for \n{raw_sequencing_batch_info}\nExiting.')
         sys.exit(1)
-    if raw_sequencing_batch_info['date_run'].strip() == '':
+    if raw_sequencing_batch_info['date_run'] is None:
         print(f'date_run column should not be empty. it is for \n{raw_sequencing_batch_info}\nExiting.')
         sys.exit(1)
     if raw_sequencing_batch_info['sequencing_type'].strip() == '':
@@ -868,10 +1522,10 @@ def check_extraction_fields(extraction_info):
     if extraction_info['sample_identifier'].strip() == '':
         print(f'sample_identifier column should not be empty. it is for \n{extraction_info}\nExiting.')
         sys.exit(1)
-    if extraction_info['date_extracted'].strip() == '':
+    if extraction_info['date_extracted'] is None:
         print(f'date_extracted column should not be empty. it is for \n{extraction_info}\nExiting.')
         sys.exit(1)
-    if extraction_info['extraction_identifier'].strip() == '':
+    if extraction_info['extraction_identifier'] is None:
         print(f'extraction_identifier column should not be empty. it is for \n{extraction_info}\nExiting.')
         sys.exit(1)
     if extraction_info['group_name'].strip() == '':
@@ -946,17 +1600,17 @@ def check_covid_confirmatory_pcr(covid_confirmatory_pcr_info):
     if covid_confirmatory_pcr_info['sample_identifier'].strip() == '':
         print(f'sample_identifier column should not be empty. it is for \n{covid_confirmatory_pcr_info}\nExiting.')
         sys.exit(1)
-    if covid_confirmatory_pcr_info['date_extracted'].strip() == '':
+    if covid_confirmatory_pcr_info['date_extracted'] is None:
         print(f'date_extracted column should not be empty. it is for \n{covid_confirmatory_pcr_info}\nExiting.')
         sys.exit(1)
-    if covid_confirmatory_pcr_info['extraction_identifier'].strip() == '':
+    if covid_confirmatory_pcr_info['extraction_identifier'] is None:
         print(f'extraction_identifier column should not be empty. it is for \n{covid_confirmatory_pcr_info}\nExiting.')
         sys.exit(1)
-    if covid_confirmatory_pcr_info['date_covid_confirmatory_pcred'].strip() == '':
+    if covid_confirmatory_pcr_info['date_covid_confirmatory_pcred'] is None:
         print(f'date_covid_confirmatory_pcred column should not be empty. it is for '
               f'\n{covid_confirmatory_pcr_info}\nExiting.')
         sys.exit(1)
-    if covid_confirmatory_pcr_info['covid_confirmatory_pcr_identifier'].strip() == '':
+    if covid_confirmatory_pcr_info['covid_confirmatory_pcr_identifier'] is None:
         print(f'covid_confirmatory_pcr_identifier column should not be empty. it is for '
               f'\n{covid_confirmatory_pcr_info}\nExiting.')
         sys.exit(1)
@@ -972,23 +1626,25 @@ def check_tiling_pcr(tiling_pcr_info):
     to_check = ['sample_identifier', 'date_extracted', 'extraction_identifier', 'date_tiling_pcred',
                 'tiling_pcr_identifier', 'group_name', 'tiling_pcr_protocol']
     for r in to_check:
-        if tiling_pcr_info[r].strip() == '':
+        if is_empty(tiling_pcr_info[r]):
             print(f'Warning - {r} column should not be empty. it is for \n{tiling_pcr_info}. Not adding this tiling pcr record.')
             return False
     return True
 
 
+allowable_pcr_results = {'Negative', 'Negative - Followup', 'Positive - Followup', 'Positive', 'Indeterminate',
+                         'Not Done'}
+
+
 def check_pcr_result(pcr_result_info):
     to_check = ['sample_identifier', 'date_pcred', 'pcr_identifier', 'group_name', 'assay_name']
     for r in to_check:
-        if pcr_result_info[r].strip() == '':
+        if is_empty(pcr_result_info[r]):
             print(f'{r} column should not be empty. it is for \n{pcr_result_info}')
             return False
 
-    allowable_results = {'Negative', 'Negative - Followup', 'Positive - Followup', 'Positive',
-                         'Indeterminate', 'Not Done'}
-    if pcr_result_info['pcr_result'] not in allowable_results:
-        print(f'result column should contain one of these results {allowable_results}. '
+    if pcr_result_info['pcr_result'] not in allowable_pcr_results:
+        print(f'result column should contain one of these results {allowable_pcr_results}. '
               f'it doesnt for \n{pcr_result_info}\nExiting.')
         sys.exit(1)
 
@@ -1032,17 +1688,17 @@ def check_readset_fields(readset_info, nanopore_default, raw_sequencing_batch, c
             print(f'path_r2 column should not be empty. it is for \n{readset_info}\nExiting.')
             sys.exit(1)
     if covid is True:
-        if readset_info['date_tiling_pcred'].strip() == '':
+        if readset_info['date_tiling_pcred'] is None:
             print(f'date_tiling_pcred column should not be empty. it is for \n{readset_info}\nExiting.')
             sys.exit(1)
-        if readset_info['tiling_pcr_identifier'].strip() == '':
+        if readset_info['tiling_pcr_identifier'] is None:
             print(f'tiling_pcr_identifier column should not be empty. it is for \n{readset_info}\nExiting.')
             sys.exit(1)
     else:
-        if readset_info['date_extracted'].strip() == '':
+        if readset_info['date_extracted'] is None:
             print(f'date_extracted column should not be empty. it is for \n{readset_info}\nExiting.')
             sys.exit(1)
-        if readset_info['extraction_identifier'].strip() == '':
+        if readset_info['extraction_identifier'] is None:
             print(f'extraction_identifier column should not be empty. it is for \n{readset_info}\nExiting.')
             sys.exit(1)
 
@@ -1060,7 +1716,8 @@ def read_in_readset(readset_info, nanopore_default, raw_sequencing_batch, readse
         elif nanopore_default is True:
             readset.readset_nanopore.barcode = readset_info['barcode']
             path = os.path.join(readset_batch.batch_directory, 'fastq_pass', readset_info['barcode'], '*fastq.gz')
-            fastqs = glob.glob(path)
+            fastqs = get_batch_directory_files(readset_batch.batch_directory, 'fastq_pass', readset_info['barcode'],
+                                               'fastq.gz')
             if len(fastqs) == 1:
                 readset.readset_nanopore.path_fastq = fastqs[0]
             elif len(fastqs) == 0:
@@ -1099,7 +1756,7 @@ def add_artic_covid_result(artic_covid_result_info):
     artic_covid_result = read_in_artic_covid_result(artic_covid_result_info)
     readset_nanopore.readset.artic_covid_result.append(artic_covid_result)
     # db.session.add(extraction)
-    db.session.commit()
+    commit_row()
     print(f"Adding artic_covid_result {artic_covid_result_info['sample_name']} from {artic_covid_result_info['readset_batch_name']} to database.")
 
 
@@ -1112,10 +1769,157 @@ def add_pangolin_result(pangolin_result_info):
         return
     pangolin_result = read_in_pangolin_result(pangolin_result_info)
     artic_covid_result.pangolin_results.append(pangolin_result)
-    db.session.commit()
+    # the one just added is now the current one for this artic result
+    if artic_covid_result.current_pangolin_result is None:
+        artic_covid_result.current_pangolin_result = CurrentPangolinResult()
+    artic_covid_result.current_pangolin_result.pangolin_result = pangolin_result
+    commit_row()
     print(f"Adding pangolin_result {pangolin_result_info['taxon']} from {pangolin_result_info['readset_batch_name']} to database.")
 
 
+def check_database_is_postgres():
+    if db.engine.dialect.name != 'postgresql':
+        print(f"The COPY fast path needs a postgres database, DATABASE_URL is a {db.engine.dialect.name} database. "
+              f"Re-run without --copy. Exiting.")
+        sys.exit(1)
+
+
+def get_staging_columns(table):
+    # the columns of table which go in its staging table, all of them except id.
+    return [c for c in table.columns if c.name != 'id']
+
+
+def get_staging_row(entity, row_number):
+    # a tuple of the values of entity's staging columns, in order, plus row_number, for copy_to_staging_table.
+    return tuple(getattr(entity, c.key) for c in get_staging_columns(entity.__table__)) + (row_number,)
+
+
+def copy_to_staging_table(table, rows):
+    # makes an empty, unconstrained copy of table's columns (except id) plus the input file row number, and COPYs rows
+    # (tuples from get_staging_row) into it. returns the name of the staging table and its columns.
+    staging_table = f"{table.name}_staging"
+    columns = [c.name for c in get_staging_columns(table)]
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    db.session.execute(text(f'DROP TABLE IF EXISTS {staging_table}'))
+    db.session.execute(text(f'CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS SELECT {column_list} FROM '
+                            f'{table.name} WITH NO DATA'))
+    db.session.execute(text(f'ALTER TABLE {staging_table} ADD COLUMN row_number integer'))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # None is written as \N so that it can be told apart from an empty string
+        writer.writerow(['\\N' if x is None else x for x in row])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(f'COPY {staging_table} ({column_list}, row_number) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')',
+                       buffer)
+    return staging_table, column_list
+
+
+def merge_from_staging_table(table, staging_table, column_list, natural_key):
+    # inserts the staged rows whose natural_key isn't already in table, in input file order. if the natural key is in
+    # the input file more than once only the first one is added, same as loading the file row by row.
+    key_list = ', '.join(natural_key)
+    key_match = ' AND '.join(f'existing.{k} IS NOT DISTINCT FROM s.{k}' for k in natural_key)
+    merge = db.session.execute(text(
+        f'INSERT INTO {table.name} ({column_list}) '
+        f'SELECT {column_list} FROM ('
+        f'SELECT DISTINCT ON ({key_list}) * FROM {staging_table} s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {table.name} existing WHERE {key_match}) '
+        f'ORDER BY {key_list}, row_number) new_rows '
+        f'ORDER BY row_number'))
+    db.session.execute(text(f'DROP TABLE {staging_table}'))
+    return merge.rowcount
+
+
+def copy_artic_covid_results(all_artic_covid_results_info):
+    # equivalent to calling get_artic_covid_result then add_artic_covid_result on every line of the input file, but
+    # looks up all the readsets in one query, COPYs the results into a staging table and adds the new ones with one
+    # INSERT ... SELECT. postgres only.
+    check_database_is_postgres()
+    batch_names = {x['readset_batch_name'] for x in all_artic_covid_results_info}
+    readsets = ReadSetNanopore.query.with_entities(ReadSetBatch.name, ReadSetNanopore.barcode,
+                                                   ReadSetNanopore.readset_id)\
+        .select_from(ReadSetNanopore).join(ReadSet).join(ReadSetBatch)\
+        .filter(ReadSetBatch.name.in_(batch_names)).all()
+    readset_ids = {(readset_batch_name, barcode): readset_id for readset_batch_name, barcode, readset_id in readsets}
+    rows = []
+    for row_number, artic_covid_result_info in enumerate(all_artic_covid_results_info):
+        readset_id = readset_ids.get((artic_covid_result_info['readset_batch_name'],
+                                      artic_covid_result_info['barcode']))
+        if readset_id is None:
+            print(f"Warning - trying to add artic covid results. There is no readset for barcode "
+                  f"{artic_covid_result_info['barcode']} from read set batch "
+                  f"{artic_covid_result_info['readset_batch_name']}.")
+            continue
+        artic_covid_result = read_in_artic_covid_result(artic_covid_result_info)
+        artic_covid_result.readset_id = readset_id
+        rows.append(get_staging_row(artic_covid_result, row_number))
+    staging_table, column_list = copy_to_staging_table(ArticCovidResult.__table__, rows)
+    num_added = merge_from_staging_table(ArticCovidResult.__table__, staging_table, column_list,
+                                         ['readset_id', 'workflow', 'profile'])
+    print(f"Added {num_added} artic_covid_results to the database. {len(rows) - num_added} were already in the "
+          f"database or repeated in the input file, no action taken for those.")
+
+
+def copy_pangolin_results(all_pangolin_results_info):
+    # equivalent to calling get_pangolin_result then add_pangolin_result on every line of the input file, but looks up
+    # all the artic_covid_results in one query, COPYs the results into a staging table and adds the new ones with one
+    # INSERT ... SELECT. postgres only.
+    check_database_is_postgres()
+    batch_names = {x['readset_batch_name'] for x in all_pangolin_results_info}
+    artic_covid_results = ArticCovidResult.query.with_entities(ReadSetBatch.name, ReadSetNanopore.barcode,
+                                                               ArticCovidResult.workflow, ArticCovidResult.profile,
+                                                               ArticCovidResult.id)\
+        .select_from(ArticCovidResult).join(ReadSet).join(ReadSetBatch).join(ReadSetNanopore)\
+        .filter(ReadSetBatch.name.in_(batch_names)).all()
+    artic_covid_result_ids = {}
+    for readset_batch_name, barcode, workflow, profile, artic_covid_result_id in artic_covid_results:
+        key = (readset_batch_name, barcode, workflow, profile)
+        if key in artic_covid_result_ids:
+            print(f"Trying to get artic_covid_result. More than one ArticCovidResult for barcode {barcode} for readset "
+                  f"batch {readset_batch_name}, run with profile {profile} and workflow {workflow}. Shouldn't happen, "
+                  f"exiting.")
+            sys.exit(1)
+        artic_covid_result_ids[key] = artic_covid_result_id
+    rows = []
+    added_to_artic_covid_result_ids = set()
+    for row_number, pangolin_result_info in enumerate(all_pangolin_results_info):
+        artic_covid_result_id = artic_covid_result_ids.get((pangolin_result_info['readset_batch_name'],
+                                                            pangolin_result_info['barcode'],
+                                                            pangolin_result_info['artic_workflow'],
+                                                            pangolin_result_info['artic_profile']))
+        if artic_covid_result_id is None:
+            print(f"Warning - trying to add pangolin results. There is no readset for barcode "
+                  f"{pangolin_result_info['barcode']} from "
+                  f"read set batch {pangolin_result_info['readset_batch_name']}.")
+            continue
+        pangolin_result = read_in_pangolin_result(pangolin_result_info)
+        pangolin_result.artic_covid_result_id = artic_covid_result_id
+        rows.append(get_staging_row(pangolin_result, row_number))
+        added_to_artic_covid_result_ids.add(artic_covid_result_id)
+    staging_table, column_list = copy_to_staging_table(PangolinResult.__table__, rows)
+    num_added = merge_from_staging_table(PangolinResult.__table__, staging_table, column_list,
+                                         ['artic_covid_result_id', 'version'])
+    if num_added > 0:
+        refresh_current_pangolin_results(added_to_artic_covid_result_ids)
+    print(f"Added {num_added} pangolin_results to the database. {len(rows) - num_added} were already in the "
+          f"database or repeated in the input file, no action taken for those.")
+
+
+def refresh_current_pangolin_results(artic_covid_result_ids):
+    # points current_pangolin_result for each of artic_covid_result_ids at its most recently added pangolin_result,
+    # for when pangolin results have been added without going through add_pangolin_result.
+    artic_covid_result_ids = list(artic_covid_result_ids)
+    db.session.execute(CurrentPangolinResult.__table__.delete()
+                       .where(CurrentPangolinResult.artic_covid_result_id.in_(artic_covid_result_ids)))
+    latest = select(PangolinResult.artic_covid_result_id, func.max(PangolinResult.id))\
+        .where(PangolinResult.artic_covid_result_id.in_(artic_covid_result_ids))\
+        .group_by(PangolinResult.artic_covid_result_id)
+    db.session.execute(CurrentPangolinResult.__table__.insert()
+                       .from_select(['artic_covid_result_id', 'pangolin_result_id'], latest))
+
+
 def add_readset(readset_info, covid, nanopore_default):
     # this function has three main parts
     # 1. get the raw_sequencing batch
@@ -1145,12 +1949,15 @@ def add_readset(readset_info, covid, nanopore_default):
                                                 raw_sequencing_batch.batch_directory)
         # need to add raw_seq to raw seq batch
         raw_sequencing_batch.raw_sequencings.append(raw_sequencing)
+        add_to_lookup_cache('raw_sequencings', (raw_sequencing_batch.name,) + get_readset_key(readset_info, covid)[1:],
+                            raw_sequencing)
         if covid is True:
             # if the sample is covid, we need to get the tiling pcr record
             tiling_pcr = get_tiling_pcr(readset_info)
             if tiling_pcr is False:
                 print(f"Adding readset. There is no TilingPcr record for sample {readset_info['sample_identifier']} PCRed on "
-                      f"{readset_info['date_tiling_pcred']} by group {readset_info['group_name']}. You need to add this. "
+                      f"{display_value(readset_info['date_tiling_pcred'])} by group {readset_info['group_name']}. "
+                      f"You need to add this. "
                       f"Exiting.")
                 sys.exit(1)
             # add the raw_seq to the tiling pcr
@@ -1162,7 +1969,8 @@ def add_readset(readset_info, covid, nanopore_default):
             extraction = get_extraction(readset_info)
             if extraction is False:
                 print(f"Adding readset. No Extraction match for {readset_info['sample_identifier']}, extracted on "
-                      f"{readset_info['date_extracted']} for extraction id {readset_info['extraction_identifier']} need to add "
+                      f"{display_value(readset_info['date_extracted'])} for extraction id "
+                      f"{readset_info['extraction_identifier']} need to add "
                       f"that extract and re-run. Exiting.")
                 sys.exit(1)
             # and add the raw_sequencing to the extraction
@@ -1175,10 +1983,12 @@ def add_readset(readset_info, covid, nanopore_default):
     # print(dir(readset))
     readset_batch.readsets.append(readset)
     raw_sequencing.readsets.append(readset)
+    add_to_lookup_cache('readsets', get_readset_key(readset_info, covid),
+                        readset.readset_nanopore if readset.readset_nanopore is not None else readset.readset_illumina)
     # add the readset to the filestructure
 
     db.session.add(raw_sequencing)
-    db.session.commit()
+    commit_row()
     print(f"Added readset {readset_info['sample_identifier']} to the database.")
 
 
@@ -0,0 +1,92 @@
+"""
+Lightweight database bootstrap for the command line scripts.
+
+Importing `app.web` builds the whole web application (Flask, flask_bootstrap, flask_migrate, flask_login and
+app.routes), which the scripts in src/scripts don't need and which dominates their start up time. Importing this module
+instead binds app.models to a plain SQLAlchemy engine and session (see app/database.py), so that `from app.models import
+...` gives the same models.py declarations without any of the web stack. It has to be imported before app.models, e.g.
+
+from seqbox_db import db
+from app.models import Sample
+
+If the web app has already been imported (e.g. from `flask shell`), its flask_sqlalchemy `db` is used as is.
+"""
+import os
+import re
+import sqlalchemy
+import sqlalchemy.orm
+from sqlalchemy.orm import declarative_base, declared_attr, scoped_session, sessionmaker
+from config import Config
+from app import database
+
+app_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+camelcase_re = re.compile(r'([A-Z]+)(?=[a-z0-9])')
+
+
+def camel_to_snake_case(name):
+    # same table naming as flask_sqlalchemy, so that both bootstraps map onto the same tables
+    def _join(match):
+        word = match.group()
+        if len(word) > 1:
+            return ('_%s_%s' % (word[:-1], word[-1])).lower()
+        return '_' + word.lower()
+    return camelcase_re.sub(_join, name).lstrip('_')
+
+
+def get_database_url():
+    # flask_sqlalchemy resolves relative sqlite paths against the app directory, do the same here so both bootstraps
+    # use the same database file.
+    url = sqlalchemy.engine.make_url(Config.SQLALCHEMY_DATABASE_URI)
+    if url.drivername.startswith('sqlite') and url.database not in (None, '', ':memory:') \
+            and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(app_directory, url.database))
+    return url
+
+
+class Database:
+    """The parts of the flask_sqlalchemy SQLAlchemy object that models.py and the scripts use - db.Column, db.Model,
+    db.Table, db.relationship etc., db.Model.query, db.session, db.engine, db.metadata, db.create_all and db.drop_all.
+    """
+    def __init__(self, url):
+        # db.Column, db.Integer, db.relationship etc.
+        for module in (sqlalchemy, sqlalchemy.orm):
+            for key in module.__all__:
+                if not hasattr(self, key):
+                    setattr(self, key, getattr(module, key))
+        self.engine = sqlalchemy.create_engine(url)
+        self.session = scoped_session(sessionmaker(bind=self.engine))
+        self.Model = self.make_declarative_base()
+        self.metadata = self.Model.metadata
+
+    def make_declarative_base(self):
+        class Model:
+            query = self.session.query_property()
+
+            @declared_attr
+            def __tablename__(cls):
+                return camel_to_snake_case(cls.__name__)
+
+        return declarative_base(cls=Model, name='Model')
+
+    def Table(self, name, *args, **kwargs):
+        # like flask_sqlalchemy, tables are created on db.metadata, e.g. db.Table("sample_source_project", db.Column...)
+        return sqlalchemy.Table(name, self.metadata, *args, **kwargs)
+
+    def create_all(self):
+        self.metadata.create_all(bind=self.engine)
+
+    def drop_all(self):
+        self.metadata.drop_all(bind=self.engine)
+
+
+def bootstrap():
+    # the web app has already bound its flask_sqlalchemy db
+    if database.db is not None:
+        return database.db
+    db = database.bind(Database(get_database_url()))
+    # as app/web.py does, so that db.metadata knows about all the tables
+    import app.models  # noqa: F401
+    return db
+
+
+db = bootstrap()
@@ -0,0 +1,147 @@
+"""
+Counts the SQL statements seqbox_filehandling.py add_readset_to_filestructure makes for input files of different
+sizes, and exits 1 if the count grows with the number of readsets (i.e. if something in the readset -> raw_sequencing ->
+extraction -> sample -> sample_source -> projects -> groups chain has gone back to being lazy loaded one readset at a
+time). Checks nanopore default input files (batch and barcode), and the other kind (sample, extraction or tiling pcr,
+and group), covid and not. Wipes the database.
+
+python test/assert_filehandling_queries.py
+"""
+import os
+import sys
+import csv
+import argparse
+import datetime
+import tempfile
+from sqlalchemy import event
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'scripts'))
+from seqbox_db import db
+from app.models import Groups, Project, SampleSource, Sample, Extraction, TilingPcr, RawSequencing, \
+    RawSequencingBatch, ReadSetBatch, ReadSet, ReadSetNanopore, sample_source_project
+from seqbox_filehandling import run_add_readset_to_filestructure
+
+
+barcodes_per_batch = 96
+
+
+def batch_name(i):
+    return f"test_batch_{i // barcodes_per_batch}"
+
+
+def barcode(i):
+    return f"barcode{(i % barcodes_per_batch) + 1:02d}"
+
+
+def date_done(i):
+    return datetime.datetime(2021, 1, 1) + datetime.timedelta(days=i)
+
+
+def populate(num_readsets, fastq):
+    # one sample source, sample, extraction, tiling pcr, raw sequencing and nanopore readset per readset, all linking
+    # to the same fastq.
+    db.drop_all()
+    db.create_all()
+    ids = range(num_readsets)
+    num_batches = (num_readsets // barcodes_per_batch) + 1
+    db.session.execute(Groups.__table__.insert(), [{'id': 1, 'group_name': 'Core', 'institution': 'MLW'}])
+    db.session.execute(Project.__table__.insert(), [{'id': 1, 'groups_id': 1, 'project_name': 'test'}])
+    db.session.execute(RawSequencingBatch.__table__.insert(),
+                       [{'id': b + 1, 'name': batch_name(b * barcodes_per_batch), 'sequencing_type': 'nanopore'}
+                        for b in range(num_batches)])
+    db.session.execute(ReadSetBatch.__table__.insert(),
+                       [{'id': b + 1, 'name': batch_name(b * barcodes_per_batch), 'raw_sequencing_batch_id': b + 1}
+                        for b in range(num_batches)])
+    db.session.execute(SampleSource.__table__.insert(), [{'id': i + 1, 'sample_source_identifier': f"SS{i}"} for i in ids])
+    db.session.execute(sample_source_project.insert(), [{'sample_source_id': i + 1, 'project_id': 1} for i in ids])
+    db.session.execute(Sample.__table__.insert(),
+                       [{'id': i + 1, 'sample_identifier': f"S{i}", 'sample_source_id': i + 1} for i in ids])
+    db.session.execute(Extraction.__table__.insert(),
+                       [{'id': i + 1, 'sample_id': i + 1, 'extraction_identifier': 1, 'date_extracted': date_done(i)}
+                        for i in ids])
+    db.session.execute(TilingPcr.__table__.insert(),
+                       [{'id': i + 1, 'extraction_id': i + 1, 'pcr_identifier': 1, 'date_pcred': date_done(i)}
+                        for i in ids])
+    db.session.execute(RawSequencing.__table__.insert(),
+                       [{'id': i + 1, 'extraction_id': i + 1, 'tiling_pcr_id': i + 1,
+                         'raw_sequencing_batch_id': (i // barcodes_per_batch) + 1} for i in ids])
+    db.session.execute(ReadSet.__table__.insert(),
+                       [{'id': i + 1, 'raw_sequencing_id': i + 1, 'readset_batch_id': (i // barcodes_per_batch) + 1,
+                         'readset_identifier': i + 1, 'data_storage_device': 'local'} for i in ids])
+    db.session.execute(ReadSetNanopore.__table__.insert(),
+                       [{'id': i + 1, 'readset_id': i + 1, 'barcode': barcode(i), 'path_fastq': fastq} for i in ids])
+    db.session.commit()
+
+
+def write_readsets(readsets_inhandle, num_readsets, nanopore_default, covid):
+    with open(readsets_inhandle, 'w', newline='') as fo:
+        writer = csv.writer(fo)
+        if nanopore_default is True:
+            writer.writerow(['readset_batch_name', 'barcode', 'data_storage_device'])
+            for i in range(num_readsets):
+                writer.writerow([batch_name(i), barcode(i), 'local'])
+            return
+        writer.writerow(['readset_batch_name', 'sample_identifier', 'date_extracted', 'extraction_identifier',
+                         'date_tiling_pcred', 'tiling_pcr_identifier', 'group_name', 'data_storage_device'])
+        for i in range(num_readsets):
+            date = date_done(i).strftime('%d/%m/%Y')
+            writer.writerow([batch_name(i), f"S{i}", date, 1, date if covid is True else '',
+                             1 if covid is True else '', 'Core', 'local'])
+
+
+def count_statements(num_readsets, nanopore_default, covid, working_dir):
+    name = f"{num_readsets}_{nanopore_default}_{covid}"
+    seqbox_directory = os.path.join(working_dir, f"seqbox_{name}")
+    os.mkdir(seqbox_directory)
+    config_inhandle = os.path.join(working_dir, f"config_{name}.yaml")
+    with open(config_inhandle, 'w') as fo:
+        fo.write(f"seqbox_directory: '{seqbox_directory}'\n")
+    readsets_inhandle = os.path.join(working_dir, f"readsets_{name}.csv")
+    write_readsets(readsets_inhandle, num_readsets, nanopore_default, covid)
+    args = argparse.Namespace(seqbox_config=config_inhandle, readsets_inhandle=readsets_inhandle, covid=covid, jobs=1,
+                              plan_format=None, plan_outhandle=None, nanopore_default=nanopore_default)
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # start from an empty session, so that nothing is already loaded
+    db.session.expunge_all()
+    event.listen(db.engine, 'before_cursor_execute', record_statement)
+    try:
+        run_add_readset_to_filestructure(args)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record_statement)
+    return len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='assert_filehandling_queries')
+    # the input file keys of the non nanopore default files are looked up 500 at a time, so keep this to 500 or less
+    parser.add_argument('-n', dest='num_readsets', type=int, default=200,
+                        help='Number of readsets in the bigger input file, the smaller one is a tenth of this.')
+    args = parser.parse_args()
+    # putting this assertion here to stop me from wiping the non-test database
+    assert os.environ['DATABASE_URL'].split('/')[-1].startswith('test')
+    wrong = []
+    with tempfile.TemporaryDirectory() as working_dir:
+        # every readset can point at the same fastq, only the links are made
+        fastq = os.path.join(working_dir, 'reads.fastq.gz')
+        open(fastq, 'w').close()
+        populate(args.num_readsets, fastq)
+        for nanopore_default, covid in ((True, False), (False, False), (False, True)):
+            counts = {n: count_statements(n, nanopore_default, covid, working_dir)
+                      for n in (args.num_readsets // 10, args.num_readsets)}
+            for num_readsets, num_statements in counts.items():
+                print(f"nanopore_default {nanopore_default}, covid {covid}, {num_readsets} readsets - "
+                      f"{num_statements} SQL statements")
+            if len(set(counts.values())) != 1:
+                wrong.append(f"nanopore_default {nanopore_default}, covid {covid}")
+    for each in wrong:
+        print(f"The number of SQL statements for {each} goes up with the number of readsets.")
+    if wrong:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+Checks how many rows there are in database tables, e.g. that loading the same input files again hasn't added anything.
+Exits 1 if any of them are different.
+
+python test/assert_row_counts.py pcr_result=5 read_set=9
+"""
+import sys
+from sqlalchemy import text
+from seqbox_db import db
+
+
+def main():
+    wrong = []
+    for expected in sys.argv[1:]:
+        table, num_rows = expected.split('=')
+        actual = db.session.execute(text(f'SELECT count(*) FROM {table}')).scalar()
+        if actual != int(num_rows):
+            wrong.append(f"{table} has {actual} rows, should have {num_rows}")
+    for each in wrong:
+        print(each)
+    if wrong:
+        sys.exit(1)
+    print(f"Row counts OK: {' '.join(sys.argv[1:])}")
+
+
+if __name__ == '__main__':
+    main()
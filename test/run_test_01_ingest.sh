@@ -0,0 +1,7 @@
+set -e
+set -o pipefail
+
+# same as run_test_01.sh, but loading everything with a single seqbox_cmd.py ingest
+python test/test_no_web.py # creates db
+python src/scripts/seqbox_cmd.py ingest -m test/01.test_todo_list_query/manifest.yaml
+python src/scripts/seqbox_filehandling.py add_readset_to_filestructure -i test/01.test_todo_list_query/nanopore_default_readsets.csv -c test/test_seqbox_config.yaml -s -n
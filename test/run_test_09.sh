@@ -0,0 +1,15 @@
+set -e
+set -o pipefail
+
+# loading the same pcr results twice should only add them once. the dates include days after the 12th and ones
+# which are a different date if read month first, to check that they're matched as dd/mm/yyyy.
+python test/test_no_web.py # creates db
+for i in 1 2; do
+    python src/scripts/seqbox_cmd.py add_groups -i test/09.test/groups.csv
+    python src/scripts/seqbox_cmd.py add_projects -i test/09.test/projects.csv
+    python src/scripts/seqbox_cmd.py add_pcr_assays -i test/09.test/pcr_assay.csv
+    python src/scripts/seqbox_cmd.py add_sample_sources -i test/09.test/sample_sources.csv
+    python src/scripts/seqbox_cmd.py add_samples -i test/09.test/samples.csv
+    python src/scripts/seqbox_cmd.py add_pcr_results -i test/09.test/pcr_results.csv
+done
+python test/assert_row_counts.py pcr_result=5
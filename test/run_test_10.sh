@@ -0,0 +1,51 @@
+set -e
+set -o pipefail
+
+# an ingest which fails part way should still refresh covid_sample_status for the stages (or rows, with --commit row)
+# that were committed before it failed, so the cached todo list is the same as the live one.
+python test/test_no_web.py # creates db
+if python src/scripts/seqbox_cmd.py ingest -m test/10.test/manifest.yaml; then
+    echo "The ingest should have failed on the last extraction."
+    exit 1
+fi
+python src/scripts/seqbox_queries.py get_covid_todo_list -o /tmp/seqbox_test_10_live.csv
+python src/scripts/seqbox_queries.py get_covid_todo_list --cached -o /tmp/seqbox_test_10_cached.csv
+diff /tmp/seqbox_test_10_live.csv /tmp/seqbox_test_10_cached.csv
+if python src/scripts/seqbox_cmd.py --commit row add_extractions -i test/10.test/extraction.csv; then
+    echo "add_extractions should have failed on the last extraction."
+    exit 1
+fi
+python test/assert_row_counts.py extraction=2
+python src/scripts/seqbox_queries.py get_covid_todo_list -o /tmp/seqbox_test_10_live.csv
+python src/scripts/seqbox_queries.py get_covid_todo_list --cached -o /tmp/seqbox_test_10_cached.csv
+diff /tmp/seqbox_test_10_live.csv /tmp/seqbox_test_10_cached.csv
+
+# adding an existing sample source to another project doesn't add a sample or anything under it, but its samples are
+# now on the todo list for that project too, and its readsets have that project in readset_summary. the readsets need
+# their fast5s to exist, so the readset file is copied to a temporary directory with the paths pointing there.
+input_dir=$(mktemp -d)
+trap 'rm -rf "$input_dir"' EXIT
+sed "s#/Users/flashton/Dropbox/non-project/test_input_data#$input_dir#g" test/12.test/covid_nanopore_readsets.csv \
+    > $input_dir/covid_nanopore_readsets.csv
+for fast5 in $(tail -n +2 $input_dir/covid_nanopore_readsets.csv | cut -d, -f8); do
+    mkdir -p $(dirname $fast5)
+    touch $fast5
+done
+python src/scripts/seqbox_cmd.py add_extractions -i test/01.test_todo_list_query/extraction.csv
+python src/scripts/seqbox_cmd.py add_tiling_pcrs -i test/01.test_todo_list_query/tiling_pcr.csv
+python src/scripts/seqbox_cmd.py add_raw_sequencing_batches -i test/01.test_todo_list_query/raw_sequencing_batch.csv
+python src/scripts/seqbox_cmd.py add_readset_batches -i test/01.test_todo_list_query/readset_batches.csv
+python src/scripts/seqbox_cmd.py add_readsets -i $input_dir/covid_nanopore_readsets.csv -s
+python src/scripts/seqbox_cmd.py add_projects -i test/10.test/projects.csv
+python src/scripts/seqbox_cmd.py add_sample_sources -i test/10.test/sample_sources.csv
+python src/scripts/seqbox_queries.py get_covid_todo_list -o /tmp/seqbox_test_10_live.csv
+python src/scripts/seqbox_queries.py get_covid_todo_list --cached -o /tmp/seqbox_test_10_cached.csv
+grep -q COVIDseq2 /tmp/seqbox_test_10_live.csv
+diff /tmp/seqbox_test_10_live.csv /tmp/seqbox_test_10_cached.csv
+# readset_summary as the ingests left it vs rebuilt from scratch
+python src/scripts/seqbox_queries.py get_readset_summary -o /tmp/seqbox_test_10_summary.csv
+python src/scripts/seqbox_queries.py refresh_readset_summary
+python src/scripts/seqbox_queries.py get_readset_summary -o /tmp/seqbox_test_10_summary_rebuilt.csv
+grep -q COVIDseq2 /tmp/seqbox_test_10_summary_rebuilt.csv
+diff /tmp/seqbox_test_10_summary.csv /tmp/seqbox_test_10_summary_rebuilt.csv
+echo "Cached todo list matches the live one, and readset_summary matches a rebuilt one."
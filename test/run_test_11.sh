@@ -0,0 +1,6 @@
+set -e
+set -o pipefail
+
+# add_readset_to_filestructure should make the same number of SQL statements for 20 readsets as for 200, for nanopore
+# default input files and the other kind, covid and not.
+python test/assert_filehandling_queries.py
@@ -0,0 +1,48 @@
+set -e
+set -o pipefail
+
+# loading a readset file again shouldn't add any readsets or raw sequencings, for covid (readsets matched on the tiling
+# pcr) and not covid (matched on the extraction). a second readset batch from the same raw sequencing batch, i.e. the
+# same run basecalled again, adds a readset for each barcode but re-uses the raw sequencings.
+# the fast5s have to exist, so the readset files are copied to a temporary directory with the paths pointing there.
+input_dir=$(mktemp -d)
+trap 'rm -rf "$input_dir"' EXIT
+for readsets in test/12.test/covid_nanopore_readsets.csv test/12.test/covid_nanopore_readsets_rebasecalled.csv \
+        test/05.test/nanopore_readsets.csv; do
+    sed "s#/Users/flashton/Dropbox/non-project/test_input_data#$input_dir#g" $readsets > $input_dir/$(basename $readsets)
+    for fast5 in $(tail -n +2 $input_dir/$(basename $readsets) | cut -d, -f8); do
+        mkdir -p $(dirname $fast5)
+        touch $fast5
+    done
+done
+python test/test_no_web.py # creates db
+python src/scripts/seqbox_cmd.py add_groups -i test/01.test_todo_list_query/groups.csv
+python src/scripts/seqbox_cmd.py add_projects -i test/01.test_todo_list_query/projects.csv
+python src/scripts/seqbox_cmd.py add_sample_sources -i test/01.test_todo_list_query/sample_sources.csv
+python src/scripts/seqbox_cmd.py add_samples -i test/01.test_todo_list_query/samples.csv
+python src/scripts/seqbox_cmd.py add_extractions -i test/01.test_todo_list_query/extraction.csv
+python src/scripts/seqbox_cmd.py add_tiling_pcrs -i test/01.test_todo_list_query/tiling_pcr.csv
+python src/scripts/seqbox_cmd.py add_raw_sequencing_batches -i test/01.test_todo_list_query/raw_sequencing_batch.csv
+python src/scripts/seqbox_cmd.py add_readset_batches -i test/01.test_todo_list_query/readset_batches.csv
+for i in 1 2; do
+    python src/scripts/seqbox_cmd.py add_readsets -i $input_dir/covid_nanopore_readsets.csv -s
+done
+python test/assert_row_counts.py read_set=9 raw_sequencing=9
+python src/scripts/seqbox_cmd.py add_readset_batches -i test/12.test/readset_batches_rebasecalled.csv
+for i in 1 2; do
+    python src/scripts/seqbox_cmd.py add_readsets -i $input_dir/covid_nanopore_readsets_rebasecalled.csv -s
+done
+python test/assert_row_counts.py read_set=18 raw_sequencing=9
+
+python test/test_no_web.py # creates db
+python src/scripts/seqbox_cmd.py add_groups -i test/05.test/groups.csv
+python src/scripts/seqbox_cmd.py add_projects -i test/05.test/projects.csv
+python src/scripts/seqbox_cmd.py add_sample_sources -i test/05.test/sample_sources.csv
+python src/scripts/seqbox_cmd.py add_samples -i test/05.test/samples.csv
+python src/scripts/seqbox_cmd.py add_extractions -i test/05.test/extraction.csv
+python src/scripts/seqbox_cmd.py add_raw_sequencing_batches -i test/05.test/raw_sequencing_batch.csv
+python src/scripts/seqbox_cmd.py add_readset_batches -i test/05.test/readset_batches.csv
+for i in 1 2; do
+    python src/scripts/seqbox_cmd.py add_readsets -i $input_dir/nanopore_readsets.csv
+done
+python test/assert_row_counts.py read_set=8 raw_sequencing=8
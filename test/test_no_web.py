@@ -1,5 +1,5 @@
 import os
-from app import db
+from seqbox_db import db
 
 
 def create_it():